@@ -0,0 +1,66 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+from app.core.config import settings
+from app.core.sampling_profiler import ProfilerBusy, is_admin, sampling_profiler
+import asyncio
+
+router = APIRouter()
+
+# Shorter intervals would have the sampler thread hold the GIL almost continuously
+MIN_INTERVAL_MS = 1.0
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Reject callers without the configured admin token"""
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+def _collapsed_response(session) -> PlainTextResponse:
+    return PlainTextResponse(session.collapsed(), headers={
+        "X-Profile-Samples": str(session.samples),
+        "X-Profile-Duration": f"{session.duration:.3f}",
+    })
+
+@router.post("/profile", dependencies=[Depends(require_admin)])
+async def profile_worker(seconds: float = 10.0, interval_ms: Optional[float] = None, include_idle: bool = False):
+    """
+    Sample every thread of this worker for a while and return the stacks
+
+    Args:
+        seconds: How long to sample, up to `profiler_max_seconds`
+        interval_ms: Time between samples, at least 1 ms (defaults to `profiler_interval`)
+        include_idle: Keep samples of threads waiting on locks, selectors or queues
+
+    Returns:
+        Collapsed stacks (`frame;frame;frame count` per line) for flamegraph tools
+    """
+    if not 0 < seconds <= settings.profiler_max_seconds:
+        raise HTTPException(status_code=400, detail=f"seconds must be in (0, {settings.profiler_max_seconds}]")
+    if interval_ms is not None and not interval_ms >= MIN_INTERVAL_MS:
+        raise HTTPException(status_code=400, detail=f"interval_ms must be at least {MIN_INTERVAL_MS:g}")
+    interval = interval_ms / 1000 if interval_ms is not None else None
+    try:
+        session = sampling_profiler.start(interval, include_idle)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        sampling_profiler.stop(session)
+    return _collapsed_response(session)
+
+@router.get("/profile/requests/{request_id}", dependencies=[Depends(require_admin)])
+async def request_profile(request_id: str):
+    """
+    Get the profile of a request sent with `X-Profile: 1`
+
+    Args:
+        request_id: The request's X-Request-ID
+
+    Returns:
+        Collapsed stacks sampled while the request ran
+    """
+    session = sampling_profiler.request_profile(request_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="No profile for this request (it may have expired)")
+    return _collapsed_response(session)
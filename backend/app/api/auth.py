@@ -1,17 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from pydantic import BaseModel, EmailStr
 from typing import List, Optional
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from passlib.context import CryptContext
-from app.db.session import get_db
+from app.core.metrics import CACHE_REQUESTS
+from app.db.session import get_db, get_read_db, get_async_db
 from app.models import User, Interest, user_interests, UserInterestWeight, UserBehaviorScore
 from app.data.interests_data import get_all_interests
+from app.services.interest_catalog import CatalogDocument
+from app.services.password_hasher import PasswordHasherOverloaded
+from app.services.user_import import interest_inserts
+from app.services.registry import registry
 import uuid
 import json
 
+# Routes that still use the synchronous session are plain `def` handlers that
+# FastAPI runs in its threadpool instead of on the event loop
 router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 class UserCreate(BaseModel):
     username: str
@@ -42,37 +48,32 @@ class OnboardingCompleteRequest(BaseModel):
     selected_interests: List[int]
 
 @router.get("/interests", response_model=List[InterestResponse])
-async def get_interests(db: Session = Depends(get_db)):
+async def get_interests(request: Request):
     """Get all available interests for user onboarding"""
-    interests = db.query(Interest).all()
-    return [InterestResponse(
-        id=interest.id,
-        name=interest.name,
-        category=interest.category,
-        subcategory=interest.subcategory,
-        description=interest.description
-    ) for interest in interests]
+    catalog = (await registry.aget("interest_catalog")).catalog
+    return _catalog_response(catalog.interests, request)
 
 @router.get("/interests/categories", response_model=List[InterestCategoryResponse])
-async def get_interests_by_category(db: Session = Depends(get_db)):
+async def get_interests_by_category(request: Request):
     """Get all interests organized by category and subcategory"""
-    from app.data.interests_data import get_interests_by_category
-    categories_data = get_interests_by_category()
-    
-    response = []
-    for category, data in categories_data.items():
-        response.append(InterestCategoryResponse(
-            category=category,
-            subcategories=data["subcategories"]
-        ))
-    return response
+    catalog = (await registry.aget("interest_catalog")).catalog
+    return _catalog_response(catalog.categories, request)
+
+def _catalog_response(document: CatalogDocument, request: Request) -> Response:
+    """Serve a pre-serialized catalog document, or 304 if the client's copy is current"""
+    headers = {"ETag": document.etag, "Cache-Control": "no-cache"}
+    if document.matches(request.headers.get("if-none-match")):
+        CACHE_REQUESTS.labels("interest_catalog_etag", "hit").inc()
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    CACHE_REQUESTS.labels("interest_catalog_etag", "miss").inc()
+    return Response(content=document.body, media_type="application/json", headers=headers)
 
 @router.post("/register", response_model=UserResponse)
-async def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register a new user with selected interests"""
     
     # Check if username already exists
-    db_user = db.query(User).filter(User.username == user.username).first()
+    db_user = (await db.execute(select(User.id).where(User.username == user.username))).first()
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -80,7 +81,7 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Check if email already exists
-    db_user = db.query(User).filter(User.email == user.email).first()
+    db_user = (await db.execute(select(User.id).where(User.email == user.email))).first()
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -96,8 +97,7 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
     
     # Check if all interests exist
     interest_ids = set(user.interests)
-    existing_interests = db.query(Interest).filter(Interest.id.in_(interest_ids)).all()
-    existing_ids = {interest.id for interest in existing_interests}
+    existing_ids = set((await db.execute(select(Interest.id).where(Interest.id.in_(interest_ids)))).scalars().all())
     
     if len(existing_ids) != len(interest_ids):
         missing_ids = interest_ids - existing_ids
@@ -106,8 +106,8 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
             detail=f"Invalid interest IDs: {missing_ids}"
         )
     
-    # Hash password
-    hashed_password = pwd_context.hash(user.password)
+    # Hash password on the bounded hasher pool, off the event loop
+    hashed_password = await get_password_hash(user.password)
     
     # Create user
     db_user = User(
@@ -117,37 +117,13 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
         has_completed_onboarding=True
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    
-    # Add user interests with initial weights
-    for interest_id in user.interests:
-        # Add to user_interests table
-        stmt = user_interests.insert().values(
-            user_id=db_user.id,
-            interest_id=interest_id,
-            initial_weight=1.0
-        )
-        db.execute(stmt)
-        
-        # Add to user_interest_weights table for behavior tracking
-        interest_weight = UserInterestWeight(
-            user_id=db_user.id,
-            interest_id=interest_id,
-            weight=1.0
-        )
-        db.add(interest_weight)
-        
-        # Initialize behavior score
-        behavior_score = UserBehaviorScore(
-            user_id=db_user.id,
-            interest_id=interest_id,
-            score=0.0,
-            interaction_count=0
-        )
-        db.add(behavior_score)
+    await db.flush()
     
-    db.commit()
+    # Add user interests with initial weights and behavior scores, in the same transaction
+    for stmt, rows in interest_inserts([(db_user.id, user.interests)]):
+        await db.execute(stmt, rows)
+    
+    await db.commit()
     
     return UserResponse(
         id=db_user.id,
@@ -158,7 +134,7 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
     )
 
 @router.post("/onboarding/complete")
-async def complete_onboarding(request: OnboardingCompleteRequest, db: Session = Depends(get_db)):
+def complete_onboarding(request: OnboardingCompleteRequest, db: Session = Depends(get_db)):
     """Complete user onboarding with selected interests"""
     
     user = db.query(User).filter(User.id == request.user_id).first()
@@ -180,31 +156,8 @@ async def complete_onboarding(request: OnboardingCompleteRequest, db: Session =
     db.query(UserBehaviorScore).filter(UserBehaviorScore.user_id == user.id).delete()
     
     # Add new interests
-    for interest_id in request.selected_interests:
-        # Add to user_interests table
-        stmt = user_interests.insert().values(
-            user_id=user.id,
-            interest_id=interest_id,
-            initial_weight=1.0
-        )
-        db.execute(stmt)
-        
-        # Add to user_interest_weights table
-        interest_weight = UserInterestWeight(
-            user_id=user.id,
-            interest_id=interest_id,
-            weight=1.0
-        )
-        db.add(interest_weight)
-        
-        # Initialize behavior score
-        behavior_score = UserBehaviorScore(
-            user_id=user.id,
-            interest_id=interest_id,
-            score=0.0,
-            interaction_count=0
-        )
-        db.add(behavior_score)
+    for stmt, rows in interest_inserts([(user.id, request.selected_interests)]):
+        db.execute(stmt, rows)
     
     user.has_completed_onboarding = True
     db.commit()
@@ -212,7 +165,7 @@ async def complete_onboarding(request: OnboardingCompleteRequest, db: Session =
     return {"message": "Onboarding completed successfully"}
 
 @router.get("/user/{user_id}/interests", response_model=List[InterestResponse])
-async def get_user_interests(user_id: int, db: Session = Depends(get_db)):
+def get_user_interests(user_id: int, db: Session = Depends(get_read_db)):
     """Get interests for a specific user"""
     
     user = db.query(User).filter(User.id == user_id).first()
@@ -232,10 +185,23 @@ async def get_user_interests(user_id: int, db: Session = Depends(get_db)):
         description=interest.description
     ) for interest in interests]
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify password against hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify password against hash on the bounded hasher pool"""
+    try:
+        return await (await registry.aget("password_hasher")).verify(plain_password, hashed_password)
+    except PasswordHasherOverloaded:
+        raise _hasher_overloaded()
 
-def get_password_hash(password: str) -> str:
-    """Generate password hash"""
-    return pwd_context.hash(password)
\ No newline at end of file
+async def get_password_hash(password: str) -> str:
+    """Generate password hash on the bounded hasher pool"""
+    try:
+        return await (await registry.aget("password_hasher")).hash(password)
+    except PasswordHasherOverloaded:
+        raise _hasher_overloaded()
+
+def _hasher_overloaded() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many concurrent password operations, please retry",
+        headers={"Retry-After": "1"}
+    )
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, HTTPException
+from app.core.sql_profiler import sql_profiler
+
+router = APIRouter()
+
+@router.get("/sql")
+async def recent_sql_profiles(limit: int = 50):
+    """
+    Summarize the SQL statements of recent requests, newest first
+
+    Args:
+        limit: Number of requests to include
+
+    Returns:
+        Per-request statement counts, total duration and N+1 patterns
+    """
+    return [profile.summary() for profile in sql_profiler.recent(limit)]
+
+@router.get("/sql/{request_id}")
+async def sql_profile(request_id: str):
+    """
+    Get every SQL statement a request executed
+
+    Args:
+        request_id: The request's X-Request-ID
+
+    Returns:
+        The summary plus each normalized statement with its duration and row count
+    """
+    profile = sql_profiler.get(request_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="No SQL profile for this request (it may have expired)")
+    return profile.to_dict()
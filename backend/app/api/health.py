@@ -0,0 +1,40 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.core.config import settings
+from app.services.registry import registry, get_model_pool, get_password_hasher
+
+router = APIRouter()
+
+@router.get("/live")
+async def liveness():
+    """Report that the worker process is up and serving requests"""
+    return {"status": "ok"}
+
+@router.get("/ready")
+async def readiness():
+    """
+    Report whether shared services (models, vector index) are initialized
+    
+    Returns 503 until every registered service is ready, along with
+    per-service status and initialization timings. With lazy warmup,
+    services are built on first use, so only failed ones return 503.
+    """
+    report = registry.readiness(lazy=settings.service_warmup == "lazy")
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
+
+@router.get("/model-pool")
+async def model_pool_stats():
+    """Report out-of-process inference pool throughput and queue latency"""
+    if not registry.is_ready("model_pool"):
+        return {"enabled": None}
+    pool = get_model_pool()
+    if pool is None:
+        return {"enabled": False}
+    return {"enabled": True, **pool.stats()}
+
+@router.get("/password-hasher")
+async def password_hasher_stats():
+    """Report password hashing pool queue depth, rejections and latency"""
+    if not registry.is_ready("password_hasher"):
+        return {"ready": False}
+    return {"ready": True, **get_password_hasher().stats()}
@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+from app.core.metrics import metrics
+
+router = APIRouter()
+
+# Version 0.0.4 of the Prometheus text exposition format (Starlette appends the charset)
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Expose this worker's metrics for Prometheus to scrape"""
+    return Response(content=metrics.render(), media_type=CONTENT_TYPE)
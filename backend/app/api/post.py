@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db
 from sqlalchemy.orm import Session
 from app.models import Post
 
+# These routes still use the synchronous session, so they are plain `def`
+# handlers that FastAPI runs in its threadpool instead of on the event loop
 router = APIRouter()
 
 class PostCreate(BaseModel):
@@ -20,9 +22,9 @@ class PostResponse(BaseModel):
     created_at: str
 
 @router.get("/{post_id}", response_model=PostResponse)
-async def get_post(
+def get_post(
     post_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get a specific post by ID
@@ -51,7 +53,7 @@ async def get_post(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/", response_model=PostResponse)
-async def create_post(
+def create_post(
     post: PostCreate,
     db: Session = Depends(get_db)
 ):
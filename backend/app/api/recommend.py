@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from typing import AsyncIterator, Dict, List, Optional
 from pydantic import BaseModel
-from app.services import recall_service, rank_service
+from app.core.admission import FULL, POPULAR, Ticket, home_admission
+from app.core.config import settings
+from app.core.serialization import dumps, json_response
+from app.core.single_flight import SingleFlight
 from app.services.interest_based_recommender import interest_recommender
-from app.db.session import get_db
-from sqlalchemy.orm import Session
+from app.db.session import get_async_read_db
+from app.models import User
+from sqlalchemy.ext.asyncio import AsyncSession
 
 router = APIRouter()
 
@@ -27,77 +32,127 @@ class RecommendationResponse(BaseModel):
     posts: List[PostResponse]
     user_id: int
     recommendation_type: str
+    # /home only: 0 is full service, higher levels shed work under load (see app.core.admission)
+    degradation_level: Optional[int] = None
+
+# The recommender builds every post with `_format_post`, so the response is
+# encoded directly instead of being re-validated into the models above (which
+# stay as the documented schema)
+def _feed_card(post: Dict) -> Dict:
+    interest = post['primary_interest']
+    return {
+        'id': post['id'],
+        'title': post['title'],
+        'content': post['content'],
+        'author': post['author'],
+        'timestamp': post['timestamp'],
+        'primary_interest': interest if interest['id'] is not None else None,
+        'relevance_score': post['relevance_score'],
+    }
+
+def _feed_response(request: Request, posts: List[Dict], user_id: int, recommendation_type: str,
+                   degradation_level: Optional[int] = None) -> Response:
+    payload = {
+        'posts': [_feed_card(post) for post in posts],
+        'user_id': user_id,
+        'recommendation_type': recommendation_type,
+    }
+    if degradation_level is not None:
+        payload['degradation_level'] = degradation_level
+    return json_response(payload, request.headers.get('accept-encoding'))
+
+# Identical concurrent feed computations in this worker share one result
+feed_flights = SingleFlight(reuse_seconds=settings.feed_reuse_seconds, max_results=settings.feed_reuse_max_results)
+
+async def _popular_posts(db: AsyncSession, limit: int) -> List[Dict]:
+    return await feed_flights.do(("popular", limit), lambda: interest_recommender._get_popular_posts(db, limit))
+
+async def _home_posts(db: AsyncSession, user_id: int, limit: int, degradation: int = FULL):
+    # Check if user has completed onboarding
+    user = await db.get(User, user_id)
+    
+    if not user:
+        # User doesn't exist, return popular posts
+        return await _popular_posts(db, limit), "popular", degradation
+    
+    if not user.has_completed_onboarding:
+        # User hasn't completed onboarding, return popular posts
+        return await _popular_posts(db, limit), "popular", degradation
+    
+    # Get personalized recommendations
+    posts = await interest_recommender.get_personalized_recommendations(user_id, db, limit, degradation)
+    return posts, "personalized", degradation
+
+def _admit_home() -> Ticket:
+    # Reject beyond the in-flight limit rather than queueing
+    ticket = home_admission.admit()
+    if ticket is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many requests in flight, retry shortly",
+            headers={"Retry-After": str(settings.home_retry_after)}
+        )
+    return ticket
 
 @router.get("/home", response_model=RecommendationResponse)
 async def get_home_recommendations(
+    request: Request,
     user_id: Optional[str] = None,
     limit: int = 20,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Get home page recommendations for a user using interest-based and behavior-based system.
     
     Args:
+        request: Incoming request, used to negotiate response compression
         user_id: ID of the user to get recommendations for
         limit: Maximum number of recommendations to return
         db: Database session dependency
         
     Returns:
-        List of recommended posts with interest information
+        List of recommended posts with interest information, and the
+        degradation level they were served at
     """
-    try:
-        # If no user_id provided, use a default
-        if not user_id:
-            user_id = "1"
-        
-        # Convert to int
-        user_id_int = int(user_id)
-        
-        # Check if user has completed onboarding
-        from app.models import User
-        user = db.query(User).filter(User.id == user_id_int).first()
-        
-        if not user:
-            # User doesn't exist, return popular posts
-            posts = interest_recommender._get_popular_posts(db, limit)
-            return RecommendationResponse(
-                posts=posts,
-                user_id=user_id_int,
-                recommendation_type="popular"
-            )
-        
-        if not user.has_completed_onboarding:
-            # User hasn't completed onboarding, return popular posts
-            posts = interest_recommender._get_popular_posts(db, limit)
-            return RecommendationResponse(
-                posts=posts,
-                user_id=user_id_int,
-                recommendation_type="popular"
+    ticket = _admit_home()
+    
+    with ticket:
+        try:
+            # If no user_id provided, use a default
+            if not user_id:
+                user_id = "1"
+            
+            # Convert to int
+            user_id_int = int(user_id)
+            
+            if ticket.level >= POPULAR:
+                # Heaviest shedding: the shared popular feed, without even a user lookup
+                posts = await _popular_posts(db, limit)
+                return _feed_response(request, posts, user_id_int, "popular", ticket.level)
+            
+            # Callers joining a flight get the level it was computed at
+            posts, recommendation_type, level = await feed_flights.do(
+                ("home", user_id_int, limit), lambda: _home_posts(db, user_id_int, limit, ticket.level)
             )
-        
-        # Get personalized recommendations
-        posts = interest_recommender.get_personalized_recommendations(user_id_int, db, limit)
-        
-        return RecommendationResponse(
-            posts=posts,
-            user_id=user_id_int,
-            recommendation_type="personalized"
-        )
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+            
+            return _feed_response(request, posts, user_id_int, recommendation_type, level)
+            
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/initial", response_model=RecommendationResponse)
 async def get_initial_recommendations(
+    request: Request,
     user_id: int,
     limit: int = 20,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Get initial recommendations for a user based on their selected interests.
     This is used for new users who just completed onboarding.
     
     Args:
+        request: Incoming request, used to negotiate response compression
         user_id: ID of the user
         limit: Maximum number of recommendations to return
         db: Database session dependency
@@ -106,26 +161,26 @@ async def get_initial_recommendations(
         List of recommended posts based on initial interests
     """
     try:
-        posts = interest_recommender.get_initial_recommendations(user_id, db, limit)
-        
-        return RecommendationResponse(
-            posts=posts,
-            user_id=user_id,
-            recommendation_type="initial"
+        posts = await feed_flights.do(
+            ("initial", user_id, limit), lambda: interest_recommender.get_initial_recommendations(user_id, db, limit)
         )
         
+        return _feed_response(request, posts, user_id, "initial")
+        
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/popular", response_model=RecommendationResponse)
 async def get_popular_recommendations(
+    request: Request,
     limit: int = 20,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Get popular posts as fallback recommendations.
     
     Args:
+        request: Incoming request, used to negotiate response compression
         limit: Maximum number of recommendations to return
         db: Database session dependency
         
@@ -133,13 +188,117 @@ async def get_popular_recommendations(
         List of popular posts
     """
     try:
-        posts = interest_recommender._get_popular_posts(db, limit)
+        posts = await _popular_posts(db, limit)
         
-        return RecommendationResponse(
-            posts=posts,
-            user_id=0,
-            recommendation_type="popular"
-        )
+        return _feed_response(request, posts, 0, "popular")
         
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Streaming /home: one JSON event per line (NDJSON), or server-sent events
+# when the client asks for text/event-stream
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SSE_MEDIA_TYPE = "text/event-stream"
+
+def _stream_event(event: str, payload: Dict, sse: bool) -> bytes:
+    data = dumps({'type': event, **payload})
+    if sse:
+        return b"event: " + event.encode() + b"\ndata: " + data + b"\n\n"
+    return data + b"\n"
+
+async def _single_batch(posts: List[Dict]) -> AsyncIterator[List[Dict]]:
+    yield posts
+
+async def _home_stream(db: AsyncSession, user_id: int, limit: int, level: int, sse: bool) -> AsyncIterator[bytes]:
+    try:
+        recommendation_type = "popular"
+        if level >= POPULAR:
+            batches = _single_batch(await _popular_posts(db, limit))
+        else:
+            user = await db.get(User, user_id)
+            if user and user.has_completed_onboarding:
+                recommendation_type = "personalized"
+                batches = interest_recommender.stream_personalized_recommendations(
+                    user_id, db, limit,
+                    first_batch=settings.home_stream_first_batch,
+                    batch_size=settings.home_stream_batch_size,
+                    degradation=level
+                )
+            else:
+                # Popular posts come hydrated from the cache, so there is nothing to stream early
+                batches = _single_batch(await _popular_posts(db, limit))
+        
+        yield _stream_event("meta", {
+            'user_id': user_id,
+            'recommendation_type': recommendation_type,
+            'degradation_level': level,
+        }, sse)
+        count = 0
+        async for posts in batches:
+            if posts:
+                count += len(posts)
+                yield _stream_event("posts", {'posts': [_feed_card(post) for post in posts]}, sse)
+        yield _stream_event("end", {'count': count}, sse)
+    except Exception as e:
+        # The status line is already sent, so failures are reported in the stream
+        yield _stream_event("error", {'detail': str(e)}, sse)
+
+class AdmittedStreamingResponse(StreamingResponse):
+    """
+    A StreamingResponse that releases its admission ticket when the response
+    ends. A client that disconnects before the first chunk cancels the
+    response before the body generator ever runs, so the generator cannot
+    be the one to release it.
+    """
+
+    def __init__(self, content, ticket: Ticket, **kwargs):
+        super().__init__(content, **kwargs)
+        self.ticket = ticket
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.ticket.controller.release(self.ticket)
+
+@router.get("/home/stream")
+async def stream_home_recommendations(
+    request: Request,
+    user_id: Optional[str] = None,
+    limit: int = 20,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Home page recommendations, streamed so that the first posts arrive early.
+    
+    Events are a `meta` event (user_id, recommendation_type,
+    degradation_level), one `posts` event per batch and a final `end` event
+    with the post count, or an `error` event if the feed fails midway. The
+    first batch comes from the user's primary interests before the other
+    candidate sources and ranking finish; later batches follow the ranked
+    order, and no post is sent twice.
+    
+    Args:
+        request: Incoming request; `Accept: text/event-stream` selects server-sent events over NDJSON
+        user_id: ID of the user to get recommendations for
+        limit: Maximum number of recommendations to return
+        db: Database session dependency
+        
+    Returns:
+        A streaming NDJSON or server-sent event response
+    """
+    ticket = _admit_home()
+    try:
+        user_id_int = int(user_id) if user_id else 1
+    except ValueError:
+        ticket.controller.release(ticket)
+        raise HTTPException(status_code=422, detail="user_id must be an integer")
+    
+    sse = SSE_MEDIA_TYPE in request.headers.get('accept', '')
+    return AdmittedStreamingResponse(
+        _home_stream(db, user_id_int, limit, ticket.level, sse),
+        ticket,
+        media_type=SSE_MEDIA_TYPE if sse else NDJSON_MEDIA_TYPE,
+        # Proxies must pass each event through as it is written
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
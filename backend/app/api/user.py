@@ -1,8 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from typing import Optional
-from app.db.session import get_db
-from sqlalchemy.orm import Session
+from app.db.session import get_async_db
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models import UserEvent, Post, Interest
 from app.services.interest_based_recommender import interest_recommender
 import json
@@ -26,7 +26,7 @@ class UserEventResponse(BaseModel):
 @router.post("/event", response_model=UserEventResponse)
 async def record_user_event(
     event: UserEventCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Record a user event (click, view, upvote, etc.) and update interest weights
@@ -49,9 +49,9 @@ async def record_user_event(
         db.add(db_event)
         
         # Update user interest weights based on post's primary interest
-        post = db.query(Post).filter(Post.id == int(event.post_id)).first()
+        post = await db.get(Post, int(event.post_id))
         if post and post.primary_interest_id:
-            interest_recommender.update_user_interest_weights(
+            await interest_recommender.update_user_interest_weights(
                 user_id=int(event.user_id),
                 interest_id=post.primary_interest_id,
                 interaction_type=event.event_type,
@@ -63,7 +63,7 @@ async def record_user_event(
             try:
                 secondary_interests = json.loads(post.secondary_interest_ids)
                 for interest_id in secondary_interests:
-                    interest_recommender.update_user_interest_weights(
+                    await interest_recommender.update_user_interest_weights(
                         user_id=int(event.user_id),
                         interest_id=interest_id,
                         interaction_type=event.event_type,
@@ -72,8 +72,8 @@ async def record_user_event(
             except json.JSONDecodeError:
                 pass  # Ignore if secondary interests are not valid JSON
         
-        db.commit()
-        db.refresh(db_event)
+        await db.commit()
+        await db.refresh(db_event)
         return UserEventResponse(
             id=db_event.id,
             user_id=db_event.user_id,
@@ -83,5 +83,5 @@ async def record_user_event(
             timestamp=db_event.timestamp.isoformat()
         )
     except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
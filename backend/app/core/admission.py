@@ -0,0 +1,146 @@
+"""
+Admission control and graceful degradation for /api/recommend/home.
+
+Under overload, every /home request used to do the full personalized work
+and they all timed out together. The controller instead tracks the
+requests in flight and recent stage latencies, and picks a degradation
+level for each request it admits:
+
+0 (full): the full pipeline
+1 (no_rerank): candidates are served in relevance order, without the Wide &
+  Deep pass
+2 (no_recall): also skips Two-Tower vector recall, leaving the database
+  candidate sources
+3 (popular): the cached popular feed, shared through single-flight and the
+  shared feed cache
+
+The level is the higher of two signals:
+
+- In flight: above `home_degrade_in_flight` requests, levels 1 to 3 are
+  spread evenly up to `home_max_in_flight`. At that limit, requests are
+  rejected at once (503 with Retry-After) instead of queueing.
+- Latency: an EWMA per stage. Rerank over its budget means level 1, vector
+  recall over its budget level 2, whole requests over theirs level 3.
+
+The level rises as soon as a signal calls for it, but falls by only one step
+every `home_recovery_seconds`. A shed stage is not measured, so estimates
+older than that stop counting, which lets the level come down and probe
+the stage again; its estimate then starts over from new measurements.
+
+Counts are per worker. All calls are made on the event loop, so no locking.
+"""
+from typing import Dict, Optional
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import ADMISSION_DECISIONS
+import time
+
+FULL, NO_RERANK, NO_RECALL, POPULAR = range(4)
+LEVEL_NAMES = ("full", "no_rerank", "no_recall", "popular")
+
+# The level each stage's latency pushes to when over budget
+STAGE_LEVELS = {"rerank": NO_RERANK, "vector_recall": NO_RECALL, "request": POPULAR}
+
+class Ticket:
+    """An admitted request; leaving the `with` block releases it and records its latency"""
+
+    __slots__ = ("controller", "level", "started")
+
+    def __init__(self, controller: "AdmissionController", level: int):
+        self.controller = controller
+        self.level = level
+        self.started = time.perf_counter()
+
+    def __enter__(self) -> "Ticket":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.controller.release(self)
+
+class AdmissionController:
+    def __init__(self, enabled: bool, degrade_in_flight: int, max_in_flight: int,
+                 budgets: Dict[str, float], recovery_seconds: float, alpha: float = 0.2):
+        self.enabled = enabled
+        self.degrade_in_flight = degrade_in_flight
+        self.max_in_flight = max_in_flight
+        # A budget of 0 leaves that stage out of the decision
+        self.budgets = {stage: budget for stage, budget in budgets.items() if budget > 0}
+        self.recovery_seconds = recovery_seconds
+        self.alpha = alpha
+        self.in_flight = 0
+        self.level = FULL
+        self._changed_at = time.monotonic()
+        self._latency: Dict[str, float] = {}
+        self._observed_at: Dict[str, float] = {}
+
+    def admit(self) -> Optional[Ticket]:
+        """A ticket carrying the degradation level to serve at, or None to reject the request"""
+        if not self.enabled:
+            return Ticket(self, FULL)
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            ADMISSION_DECISIONS.labels("rejected").inc()
+            return None
+        self.in_flight += 1
+        level = self._update_level()
+        ADMISSION_DECISIONS.labels(LEVEL_NAMES[level]).inc()
+        return Ticket(self, level)
+
+    def release(self, ticket: Ticket):
+        if not self.enabled:
+            return
+        self.in_flight -= 1
+        self.observe("request", time.perf_counter() - ticket.started)
+
+    def observe(self, stage: str, seconds: float):
+        """Feed a stage latency into its moving average; stages without a budget are ignored"""
+        if not self.enabled or stage not in self.budgets:
+            return
+        previous = self._latency.get(stage)
+        self._latency[stage] = seconds if previous is None else previous + self.alpha * (seconds - previous)
+        self._observed_at[stage] = time.monotonic()
+
+    def _target(self, now: float) -> int:
+        target = FULL
+        if self.degrade_in_flight and self.in_flight > self.degrade_in_flight:
+            span = max(1, (self.max_in_flight or 2 * self.degrade_in_flight) - self.degrade_in_flight)
+            target = min(POPULAR, 1 + (self.in_flight - self.degrade_in_flight - 1) * POPULAR // span)
+        for stage, level in STAGE_LEVELS.items():
+            estimate = self._latency.get(stage)
+            if estimate is None or now - self._observed_at[stage] >= self.recovery_seconds:
+                continue
+            if estimate > self.budgets[stage]:
+                target = max(target, level)
+        return target
+
+    def _update_level(self) -> int:
+        now = time.monotonic()
+        target = self._target(now)
+        if target > self.level:
+            logger.warning(f"/home degraded to level {target} ({LEVEL_NAMES[target]}): "
+                           f"{self.in_flight} in flight, latency {self._estimates()}")
+            self.level = target
+            self._changed_at = now
+        elif target < self.level and now - self._changed_at >= self.recovery_seconds:
+            self.level -= 1
+            self._changed_at = now
+            for stage, level in STAGE_LEVELS.items():
+                if level > self.level:
+                    self._latency.pop(stage, None)
+            logger.info(f"/home recovered to level {self.level} ({LEVEL_NAMES[self.level]})")
+        return self.level
+
+    def _estimates(self) -> str:
+        return ", ".join(f"{stage}={seconds * 1000:.0f}ms" for stage, seconds in self._latency.items()) or "n/a"
+
+# Create singleton instance
+home_admission = AdmissionController(
+    enabled=settings.home_admission_enabled,
+    degrade_in_flight=settings.home_degrade_in_flight,
+    max_in_flight=settings.home_max_in_flight,
+    budgets={
+        "rerank": settings.home_rerank_budget,
+        "vector_recall": settings.home_recall_budget,
+        "request": settings.home_latency_budget,
+    },
+    recovery_seconds=settings.home_recovery_seconds
+)
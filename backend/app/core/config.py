@@ -1,15 +1,140 @@
 import os
+from typing import Optional
 from pydantic import BaseSettings
 
 class Settings(BaseSettings):
     # Database settings
     database_url: str = "sqlite:///./raddit.db"
+    # Derived from database_url (aiosqlite / asyncpg) when not set
+    async_database_url: Optional[str] = None
+    # Read replica for recommendation/catalog/post reads; defaults to database_url
+    database_read_url: Optional[str] = None
+    async_database_read_url: Optional[str] = None
+    
+    # Connection pools, sized separately for the writer and reader engines
+    db_write_pool_size: int = 5
+    db_write_max_overflow: int = 10
+    db_write_pool_pre_ping: bool = True
+    db_write_pool_recycle: int = 1800  # seconds
+    db_read_pool_size: int = 20
+    db_read_max_overflow: int = 20
+    db_read_pool_pre_ping: bool = True
+    db_read_pool_recycle: int = 1800  # seconds
+    
+    # SQLite connection profile, applied on every new connection
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_mmap_size: int = 256 * 1024 * 1024  # bytes
+    sqlite_cache_size: int = -64 * 1024  # negative values are KiB
+    sqlite_busy_timeout: int = 5000  # milliseconds
     
     # Milvus settings
     milvus_host: str = "localhost"
     milvus_port: str = "19530"
     milvus_collection_name: str = "item_embeddings"
     
+    # Vector index settings (see scripts/tune_recall.py)
+    milvus_metric_type: str = "IP"
+    milvus_index_type: str = "IVF_FLAT"
+    milvus_nlist: int = 128
+    milvus_nprobe: int = 10
+    milvus_hnsw_m: int = 16
+    milvus_hnsw_ef_construction: int = 200
+    milvus_hnsw_ef: int = 64
+    
+    # Service startup: "blocking" warms models before serving, "background"
+    # serves lightweight routes while models load, "lazy" builds on first use
+    # (and reports ready before anything is built, so the first requests pay for it)
+    service_warmup: str = "background"
+    
+    # Candidate generation settings
+    candidate_source_timeout: float = 0.5  # seconds, per database-backed source
+    vector_recall_timeout: float = 0.3  # seconds, for the Milvus recall source
+    popular_window_days: int = 7
+    
+    # User event storage: raw events older than this are compacted into daily aggregates
+    event_retention_days: int = 90
+    event_layout_ttl: float = 60.0  # seconds readers cache the partition layout
+    
+    # Password hashing runs on its own bounded pool so sign-up bursts cannot starve feed requests
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 2
+    password_hash_max_pending: int = 64  # running plus queued; more are rejected with 503
+    
+    # Interest catalog responses are built at startup; a positive interval also rebuilds them in the background
+    interest_catalog_refresh_seconds: float = 0.0
+
+    # Cross-worker cache: one worker refreshes the popular feed, per-interest recency lists and
+    # interest catalog into memory-mapped files that every worker on the host reads
+    shared_cache_enabled: bool = False
+    shared_cache_dir: str = ""  # defaults to a per-database directory under /dev/shm
+    shared_cache_refresh_seconds: float = 15.0
+    shared_cache_max_age: float = 120.0  # older data is ignored in favor of the database
+    shared_cache_check_interval: float = 0.5  # seconds between checks for a newer version
+    shared_cache_popular_size: int = 200  # popular feed cards kept
+    shared_cache_recency_size: int = 100  # newest posts kept per interest
+    
+    # Identical concurrent feed requests share one computation; a finished result is reused
+    # for this long (0 only coalesces calls that overlap)
+    feed_reuse_seconds: float = 1.0
+    feed_reuse_max_results: int = 10000
+    
+    # /home admission control: degrade (skip rerank, then vector recall, then serve the popular
+    # feed) as requests pile up or stages slow down, and reject with 503 at the hard limit
+    home_admission_enabled: bool = True
+    home_degrade_in_flight: int = 32  # in-flight requests before degrading
+    home_max_in_flight: int = 128  # 0 never rejects
+    home_rerank_budget: float = 0.15  # seconds, moving average; 0 ignores the stage
+    home_recall_budget: float = 0.25
+    home_latency_budget: float = 1.0
+    home_recovery_seconds: float = 5.0  # between steps back towards full service
+    home_retry_after: int = 1  # seconds, sent with 503 responses
+    # /home/stream: posts in the early batch (from the primary interest source), then per batch
+    home_stream_first_batch: int = 5
+    home_stream_batch_size: int = 10
+    
+    # Out-of-process model inference (0 workers runs inference in the API process)
+    model_worker_processes: int = 0
+    model_worker_torch_threads: int = 1
+    model_worker_slots: int = 0  # defaults to two per worker
+    model_worker_slot_bytes: int = 8 * 1024 * 1024
+    model_worker_timeout: float = 2.0  # seconds before a request falls back to in-process inference
+    
+    # Preload-and-fork serving (backend/gunicorn.conf.py): torch threads per API worker,
+    # 0 splits the cores evenly between the workers
+    worker_torch_threads: int = 0
+    
+    # Prometheus-format /metrics endpoint and per-request instrumentation
+    metrics_enabled: bool = True
+
+    # Logging: records are written by a background thread to stderr and a rotated file
+    log_level: str = "INFO"
+    log_format: str = "json"  # "json" or "text"
+    log_file: str = "raddit.log"  # empty disables the file
+    log_max_bytes: int = 10 * 1024 * 1024  # rotate the file at this size
+    log_backup_count: int = 5
+    log_requests: bool = False  # one access line per request
+    # Per call site, at most this many records per interval; 0 disables the limit
+    log_rate_limit_burst: int = 10
+    log_rate_limit_interval: float = 60.0  # seconds
+
+    # Debug mode: per-request SQL profiling (X-SQL-Profile header, /debug/sql); not for production
+    debug: bool = False
+    sql_profile_history: int = 500  # recent request profiles kept for /debug/sql
+    sql_n_plus_one_threshold: int = 3  # runs of one statement shape per request flagged as N+1
+
+    # Admin endpoints (sampling profiler) are mounted only when a token is set; send it as X-Admin-Token
+    admin_token: str = ""
+    profiler_interval: float = 0.005  # seconds between samples for /admin/profile
+    profiler_request_interval: float = 0.001  # seconds between samples for X-Profile requests
+    profiler_max_seconds: float = 60.0
+    profiler_request_history: int = 20  # per-request profiles kept
+    
+    # Feed responses: compress bodies at least this large (brotli if installed, else gzip)
+    response_compression_min_bytes: int = 1024
+    response_gzip_level: int = 5
+    response_brotli_quality: int = 4
+
     # Model paths
     wide_deep_model_path: str = "../wide-deep/models/wide_deep_model.pth"
     two_tower_model_path: str = "../wide-deep/models/two_tower_model.pth"
@@ -17,4 +142,4 @@ class Settings(BaseSettings):
     class Config:
         env_file = ".env"
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
@@ -1,18 +1,216 @@
+"""
+Application logging.
+
+Log calls only enqueue the record; a QueueListener thread formats and writes
+it, so request handlers never wait on disk or terminal I/O. Records are
+written as one JSON object per line (LOG_FORMAT=text for plain lines) to
+stderr and a size-rotated log file, and carry the ID of the request that
+emitted them.
+
+Repetitive records are rate limited per call site: after LOG_RATE_LIMIT_BURST
+records from the same line within LOG_RATE_LIMIT_INTERVAL seconds, further
+ones are dropped and the next record let through reports how many were
+suppressed.
+"""
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional, Tuple
+from app.core.config import settings
+import atexit
+import copy
+import json
 import logging
+import queue
+import threading
+import time
+import uuid
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("raddit_request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with any `extra` fields included"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and value is not None:
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+    def formatTime(self, record, datefmt=None):
+        return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z"
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s')
+
+    def format(self, record):
+        if getattr(record, "request_id", None) is None:
+            record.request_id = "-"
+        return super().format(record)
+
+class CallSiteRateLimit(logging.Filter):
+    """Let at most `burst` records per call site through in each `interval` seconds"""
+
+    def __init__(self, burst: int, interval: float):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        # (path, line) -> [window start, records in window, suppressed]
+        self._sites: Dict[Tuple[str, int], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.burst <= 0 or record.levelno >= logging.CRITICAL:
+            return True
+        key = (record.pathname, record.lineno)
+        now = record.created
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.interval:
+                suppressed = site[2] if site else 0
+                self._sites[key] = [now, 1, 0]
+            elif site[1] < self.burst:
+                site[1] += 1
+                suppressed = 0
+            else:
+                site[2] += 1
+                return False
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+class RequestQueueHandler(QueueHandler):
+    """Tags records with the current request ID and enqueues them without formatting"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.request_id = request_id_var.get()
+        # Merge args now, while they still hold the caller's values
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+def _build_formatter():
+    return TextFormatter() if settings.log_format == "text" else JsonFormatter()
+
+def _build_handlers():
+    formatter = _build_formatter()
+    handlers = [logging.StreamHandler()]
+    if settings.log_file:
+        handlers.append(RotatingFileHandler(
+            settings.log_file, maxBytes=settings.log_max_bytes, backupCount=settings.log_backup_count
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
 
 # Create a custom logger
 logger = logging.getLogger("raddit")
-logger.setLevel(logging.INFO)
+logger.setLevel(settings.log_level.upper())
+logger.propagate = False
+
+log_queue = queue.SimpleQueue()
+queue_handler = RequestQueueHandler(log_queue)
+queue_handler.addFilter(CallSiteRateLimit(settings.log_rate_limit_burst, settings.log_rate_limit_interval))
+logger.addHandler(queue_handler)
+
+# Access lines come from a single call site, so they bypass the rate limit
+access_logger = logging.getLogger("raddit.access")
+access_logger.setLevel(logging.INFO)
+access_logger.propagate = False
+access_queue_handler = RequestQueueHandler(log_queue)
+access_logger.addHandler(access_queue_handler)
+
+# Written by a background thread
+listener: Optional[QueueListener] = None
+
+def start_logging():
+    """Start the writer thread if it is not running"""
+    global listener
+    if listener is None:
+        listener = QueueListener(log_queue, *_build_handlers(), respect_handler_level=True)
+        listener.start()
+
+def stop_logging():
+    """Flush queued records and stop the writer thread"""
+    global listener
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+        listener = None
+
+def restart_logging_after_fork():
+    """
+    Give a forked child its own queue and writer thread. The parent's writer
+    did not survive the fork, and records still queued in the inherited copy
+    are the parent's to write.
+    """
+    global log_queue, listener
+    log_queue = queue.SimpleQueue()
+    queue_handler.queue = log_queue
+    access_queue_handler.queue = log_queue
+    listener = None
+    start_logging()
+
+start_logging()
+atexit.register(stop_logging)
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware that gives each request an ID (from X-Request-ID, or a
+    new one), makes it available to log records, and echoes it back.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-# Create handlers
-console_handler = logging.StreamHandler()
-file_handler = logging.FileHandler("raddit.log")
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                # Cap what we accept from clients before it reaches the logs
+                request_id = value.decode("latin-1")[:64]
+                break
+        if not request_id:
+            request_id = uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+        status = 500
 
-# Create formatters and add to handlers
-log_format = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-console_handler.setFormatter(log_format)
-file_handler.setFormatter(log_format)
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
 
-# Add handlers to the logger
-logger.addHandler(console_handler)
-logger.addHandler(file_handler)
\ No newline at end of file
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            if settings.log_requests:
+                access_logger.info("request", extra={
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status,
+                    "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+                })
+            request_id_var.reset(token)
@@ -0,0 +1,305 @@
+"""
+Process-local metrics, exposed in the Prometheus text format on /metrics.
+
+Counters and histograms are plain objects updated under a per-series lock,
+so recording a value costs a dict lookup, a bisect and two additions. Each
+API worker process keeps its own values, so Prometheus should scrape every
+worker (the series carry no worker label of their own).
+
+MetricsMiddleware times every request by route template and counts the SQL
+statements it issues; `instrument_engine` feeds the statement count from
+SQLAlchemy cursor events into the current request's context.
+"""
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import threading
+import time
+
+# Seconds; from cache hits to a slow model call
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+class _CounterSeries:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+class _Timer:
+    __slots__ = ("_series", "_start")
+
+    def __init__(self, series):
+        self._series = series
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._series.observe(time.perf_counter() - self._start)
+        return False
+
+class _HistogramSeries:
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self) -> _Timer:
+        """Observe the duration of a `with` block"""
+        return _Timer(self)
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """The series for these label values, in `labelnames` order"""
+        series = self._series.get(values)
+        if series is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                series = self._series.setdefault(tuple(str(v) for v in values), self._new_series())
+                self._series[values] = series
+        return series
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def _unique_series(self) -> List[Tuple[Tuple[str, ...], object]]:
+        # Lookups may be cached under non-string label values too; render each series once
+        seen = {}
+        for values, series in list(self._series.items()):
+            if id(series) not in seen:
+                seen[id(series)] = (tuple(str(v) for v in values), series)
+        return sorted(seen.values(), key=lambda item: item[0])
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._render_series())
+        return lines
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_series(self):
+        return _CounterSeries()
+
+    def inc(self, amount: float = 1.0):
+        """Increment the unlabelled series"""
+        self.labels().inc(amount)
+
+    def _render_series(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(series.value)}"
+                for values, series in self._unique_series()]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_series(self):
+        return _HistogramSeries(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self) -> _Timer:
+        return self.labels().time()
+
+    def _render_series(self) -> List[str]:
+        lines = []
+        for values, series in self._unique_series():
+            with series._lock:
+                counts = list(series.counts)
+                total = series.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """The metrics of this process, rendered together for /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# Create singleton instance
+metrics = MetricsRegistry()
+
+# Application metrics
+
+REQUEST_LATENCY = metrics.histogram(
+    "raddit_request_duration_seconds", "HTTP request latency by route template",
+    ["method", "route", "status"]
+)
+STAGE_LATENCY = metrics.histogram(
+    "raddit_stage_duration_seconds",
+    "Recommendation pipeline stage latency (interest_load, candidates, recall, rerank, hydrate)",
+    ["stage"]
+)
+CANDIDATE_SOURCE_LATENCY = metrics.histogram(
+    "raddit_candidate_source_duration_seconds", "Latency of each candidate source, including failures",
+    ["source"]
+)
+CANDIDATE_SOURCE_OUTCOMES = metrics.counter(
+    "raddit_candidate_source_total", "Candidate source runs by outcome (ok, timeout, error)",
+    ["source", "outcome"]
+)
+FALLBACKS = metrics.counter(
+    "raddit_fallbacks_total", "Degraded results served instead of failing the request",
+    ["reason"]
+)
+CACHE_REQUESTS = metrics.counter(
+    "raddit_cache_requests_total", "Cache lookups by result (hit, miss)",
+    ["cache", "result"]
+)
+ADMISSION_DECISIONS = metrics.counter(
+    "raddit_admission_total",
+    "/home requests by admission decision (full, no_rerank, no_recall, popular, rejected)",
+    ["decision"]
+)
+SINGLE_FLIGHT_CALLS = metrics.counter(
+    "raddit_single_flight_total",
+    "Coalescable calls by outcome (executed, coalesced onto one in flight, reused a recent result)",
+    ["flight", "outcome"]
+)
+SQL_STATEMENTS = metrics.counter(
+    "raddit_sql_statements_total", "SQL statements executed, in and out of requests"
+)
+SQL_STATEMENTS_PER_REQUEST = metrics.histogram(
+    "raddit_sql_statements_per_request", "SQL statements executed per HTTP request",
+    ["route"], buckets=(0, 1, 2, 4, 8, 16, 32, 64, 128)
+)
+
+# Per-request accounting
+
+class RequestStats:
+    """Counters for the request being served, shared by its tasks and threadpool calls"""
+
+    __slots__ = ("sql_statements",)
+
+    def __init__(self):
+        self.sql_statements = 0
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("raddit_request_stats", default=None)
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+def instrument_engine(sync_engine):
+    """Count statements run on an engine (pass `.sync_engine` for async engines)"""
+    from sqlalchemy import event
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        SQL_STATEMENTS.inc()
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.sql_statements += 1
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and SQL statement counts per route template"""
+
+    def __init__(self, app):
+        self.app = app
+        self._route_paths: Optional[Dict] = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_stats.reset(token)
+            route = self._route(scope)
+            REQUEST_LATENCY.labels(scope["method"], route, status).observe(elapsed)
+            SQL_STATEMENTS_PER_REQUEST.labels(route).observe(stats.sql_statements)
+
+    def _route(self, scope) -> str:
+        # The router leaves the matched endpoint in the scope; label by its path template
+        # so that /api/post/1 and /api/post/2 share a series
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._route_paths is None:
+            self._route_paths = {
+                getattr(route, "endpoint", None): route.path for route in scope["app"].routes
+            }
+        return self._route_paths.get(endpoint, "unmatched")
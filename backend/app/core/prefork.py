@@ -0,0 +1,76 @@
+"""
+Preload-and-fork serving: load the models once and share them between workers.
+
+Under `uvicorn --workers N` every worker is a fresh interpreter that imports
+torch and loads its own copy of the Two-Tower and Wide & Deep weights. With
+gunicorn and `preload_app` (backend/gunicorn.conf.py), the master process
+builds the model services once and then forks the workers:
+
+- Weights are moved into shared memory with gradients off, so every worker
+  maps the same physical pages and nothing ever writes to them.
+- `gc.freeze()` moves every object the master created into the permanent
+  generation. Collections in the workers then never touch those objects'
+  headers, which would copy the pages holding them.
+- Each worker sets its own torch thread count (the cores divided between
+  the workers by default) instead of each starting one thread per core.
+
+Nothing that owns a thread or a connection may be created before the fork.
+The master loads the models with Milvus disconnected and runs no inference,
+which would start torch's thread pool; each worker restarts the log writer
+and connects to Milvus itself.
+"""
+from app.core.config import settings
+from app.core.logger import logger, restart_logging_after_fork
+from app.services.registry import registry
+import gc
+import os
+
+# Services whose models are loaded in the master
+PRELOADED_SERVICES = ("recall", "rank")
+
+def preload_models():
+    """Load the model services in the master and freeze them for sharing; call once before forking"""
+    import torch
+
+    # torch only starts its OpenMP pool for multi-threaded ops, and a forked child cannot use the parent's
+    torch.set_num_threads(1)
+    registry.preload(PRELOADED_SERVICES)
+
+    shared_bytes = 0
+    for name in PRELOADED_SERVICES:
+        if not registry.is_ready(name):
+            continue
+        for model in registry.get(name).models():
+            model.requires_grad_(False)
+            model.share_memory()
+            shared_bytes += sum(tensor.numel() * tensor.element_size() for tensor in model.state_dict().values())
+
+    # Collect first so the frozen generation holds only live objects
+    gc.collect()
+    gc.freeze()
+    gc.enable()
+    logger.info(f"Preloaded {', '.join(PRELOADED_SERVICES)} with {shared_bytes / 2**20:.1f} MiB of shared weights; "
+                f"froze {gc.get_freeze_count()} objects")
+
+def worker_torch_threads(workers: int) -> int:
+    if settings.worker_torch_threads > 0:
+        return settings.worker_torch_threads
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+def configure_torch_threads(threads: int):
+    import torch
+
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Only settable once per process, before any inter-op work
+        pass
+
+def init_worker(workers: int):
+    """Set up a worker right after it is forked from a preloading master"""
+    restart_logging_after_fork()
+    threads = worker_torch_threads(workers)
+    configure_torch_threads(threads)
+    registry.after_fork()
+    logger.info(f"Worker {os.getpid()} started with {threads} torch threads")
@@ -0,0 +1,200 @@
+"""
+On-demand statistical profiler for a live worker.
+
+While a session runs, a background thread wakes every `interval` seconds,
+reads every thread's current stack with sys._current_frames() and counts
+identical stacks. The result is in the collapsed-stack format that
+flamegraph.pl, speedscope and inferno read: one `frame;frame;frame count`
+line per distinct stack, root first, with the thread name as the root.
+
+Nothing runs between sessions: no thread, no hooks, no per-request work
+beyond the header check in RequestProfilerMiddleware (which is only
+installed when an admin token is configured).
+
+The sampler needs the GIL to read stacks, so a thread holding the GIL in
+C code (a long torch op, a big json.dumps) delays samples rather than
+appearing in them more; stacks blocked on the GIL are sampled where they
+wait. Threads sitting idle (in a lock wait, selector or queue get) are
+left out unless `include_idle` is set.
+"""
+from collections import Counter, OrderedDict
+from typing import Dict, Optional
+from app.core.config import settings
+from app.core.logger import logger, request_id_var
+import os
+import secrets
+import sys
+import threading
+import time
+
+# Leaf frames of threads with nothing to do
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("handlers.py", "dequeue"),  # the logging QueueListener
+    ("thread.py", "_worker"),
+}
+
+class ProfilerBusy(Exception):
+    pass
+
+class ProfileSession:
+    """One sampling run: counts of distinct stacks across all threads"""
+
+    def __init__(self, interval: float, include_idle: bool = False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at = time.time()
+        self.duration = 0.0
+        self._labels: Dict = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="raddit-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        start = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = self._stack(frame)
+                if stack is None:
+                    continue
+                self.stacks[(names.get(ident, str(ident)),) + stack] += 1
+            self.samples += 1
+        self.duration = time.perf_counter() - start
+
+    def _stack(self, frame) -> Optional[tuple]:
+        if not self.include_idle:
+            code = frame.f_code
+            if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                return None
+        frames = []
+        while frame is not None:
+            frames.append(self._label(frame.f_code))
+            frame = frame.f_back
+        frames.reverse()
+        return tuple(frames)
+
+    def _label(self, code) -> str:
+        # Keyed by code object so each function is formatted once per session
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def collapsed(self) -> str:
+        """Stacks in collapsed format, heaviest first"""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+def _short_path(path: str) -> str:
+    # Trim installation prefixes so frames read as package/module.py
+    for marker in ("site-packages" + os.sep, "dist-packages" + os.sep, os.sep + "backend" + os.sep):
+        index = path.rfind(marker)
+        if index != -1:
+            return path[index + len(marker):]
+    return os.path.basename(path)
+
+class SamplingProfiler:
+    """Runs at most one sampling session per worker and keeps recent per-request profiles"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._session: Optional[ProfileSession] = None
+        self._request_profiles: "OrderedDict[str, ProfileSession]" = OrderedDict()
+
+    @property
+    def active(self) -> bool:
+        return self._session is not None
+
+    def start(self, interval: Optional[float] = None, include_idle: bool = False) -> ProfileSession:
+        with self._lock:
+            if self._session is not None:
+                raise ProfilerBusy("A profile is already running on this worker")
+            self._session = ProfileSession(interval or settings.profiler_interval, include_idle)
+        self._session.start()
+        return self._session
+
+    def stop(self, session: ProfileSession) -> ProfileSession:
+        session.stop()
+        with self._lock:
+            if self._session is session:
+                self._session = None
+        logger.info(f"Sampling profile: {session.samples} samples over {session.duration:.1f}s, "
+                    f"{len(session.stacks)} distinct stacks")
+        return session
+
+    def keep_request_profile(self, request_id: str, session: ProfileSession):
+        with self._lock:
+            self._request_profiles[request_id] = session
+            while len(self._request_profiles) > settings.profiler_request_history:
+                self._request_profiles.popitem(last=False)
+
+    def request_profile(self, request_id: str) -> Optional[ProfileSession]:
+        with self._lock:
+            return self._request_profiles.get(request_id)
+
+# Create singleton instance
+sampling_profiler = SamplingProfiler()
+
+def is_admin(token: Optional[str]) -> bool:
+    """Whether a request presented the configured admin token"""
+    return bool(settings.admin_token) and token is not None and secrets.compare_digest(
+        token.encode(), settings.admin_token.encode()
+    )
+
+class RequestProfilerMiddleware:
+    """
+    Profile a single /api/recommend/* request when an admin sends X-Profile: 1.
+
+    The profile is kept under the request ID and its location returned in the
+    X-Profile response header. Other requests running at the same time are
+    sampled too, since the worker's threads are shared.
+    """
+
+    PATH_PREFIX = "/api/recommend/"
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.PATH_PREFIX):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        if headers.get(b"x-profile") != b"1" or not is_admin(headers.get(b"x-admin-token", b"").decode("latin-1")):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            session = sampling_profiler.start(settings.profiler_request_interval)
+        except ProfilerBusy:
+            await self.app(scope, receive, send)
+            return
+        request_id = request_id_var.get() or "unknown"
+
+        async def send_with_location(message):
+            if message["type"] == "http.response.start":
+                location = f"/admin/profile/requests/{request_id}"
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile", location.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_location)
+        finally:
+            sampling_profiler.stop(session)
+            sampling_profiler.keep_request_profile(request_id, session)
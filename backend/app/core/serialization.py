@@ -0,0 +1,92 @@
+"""
+Fast JSON responses for hot endpoints.
+
+Routes that already hold plain, schema-shaped dicts can skip FastAPI's
+response_model round trip (validate into pydantic models, jsonable_encoder,
+stdlib json.dumps) and encode straight to bytes with orjson, falling back to
+the stdlib encoder when orjson is not installed.
+
+Bodies at or above `response_compression_min_bytes` are compressed with
+brotli (when the `brotli` package is installed) or gzip, whichever the
+client's Accept-Encoding prefers; smaller ones cost more to compress than
+they save on the wire.
+"""
+from typing import Optional
+from starlette.responses import Response
+from app.core.config import settings
+import gzip
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON_MEDIA_TYPE = "application/json"
+
+def _default(value):
+    # numpy scalars (model scores) behave like the Python numbers they hold
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(payload) -> bytes:
+    """Encode a payload of plain JSON types as compact UTF-8 JSON"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default)
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=_default).encode("utf-8")
+
+def loads(data):
+    """Decode JSON from bytes or a memoryview (e.g. a shared memory mapping)"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(bytes(data) if isinstance(data, memoryview) else data)
+
+def _quality(params: str) -> float:
+    for param in params.split(";"):
+        name, _, value = param.strip().partition("=")
+        if name == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """The content coding to use for an Accept-Encoding header: "br", "gzip" or None"""
+    if not accept_encoding:
+        return None
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        qualities[coding.strip().lower()] = _quality(params)
+    wildcard = qualities.get("*", 0.0)
+    supported = ["br", "gzip"] if brotli is not None else ["gzip"]
+    # Ties go to brotli, which compresses JSON better at similar speed
+    best, best_quality = None, 0.0
+    for coding in supported:
+        quality = qualities.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.response_brotli_quality)
+    return gzip.compress(body, compresslevel=settings.response_gzip_level)
+
+def json_response(payload, accept_encoding: Optional[str] = None, status_code: int = 200) -> Response:
+    """A JSON response from pre-shaped data, compressed when large and the client accepts it"""
+    body = dumps(payload)
+    headers = {"Vary": "Accept-Encoding"}
+    if len(body) >= settings.response_compression_min_bytes:
+        encoding = negotiate_encoding(accept_encoding)
+        if encoding is not None:
+            body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+    return Response(content=body, status_code=status_code, media_type=JSON_MEDIA_TYPE, headers=headers)
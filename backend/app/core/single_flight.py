@@ -0,0 +1,87 @@
+"""
+Single-flight coalescing of identical concurrent computations.
+
+A burst of identical requests (a push notification sending everyone to
+/popular, a double-tapped /home) would each run the same queries and model
+passes. With a SingleFlight, the first caller for a key runs the
+computation and every caller arriving while it is in flight awaits the same
+future instead. A finished result can also be reused for `reuse_seconds`, so
+callers arriving just after it completes skip the work too.
+
+The first caller computes inline, with its own request's resources (e.g. its
+database session). If it is cancelled before finishing (the client went
+away), the callers waiting on it start over and one of them computes. Errors
+are shared with the callers that were waiting, but never reused.
+
+Flights are per process and per event loop; results are shared objects, so
+callers must not mutate them.
+"""
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Tuple
+from app.core.metrics import SINGLE_FLIGHT_CALLS
+import asyncio
+import time
+
+class SingleFlight:
+    """Coalesces concurrent calls by key; keys are tuples whose first item names the flight in metrics"""
+
+    def __init__(self, reuse_seconds: float = 0.0, max_results: int = 10000):
+        self.reuse_seconds = reuse_seconds
+        self.max_results = max_results
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self._results: "OrderedDict[Hashable, Tuple[float, object]]" = OrderedDict()
+
+    async def do(self, key: Tuple, compute: Callable[[], Awaitable]):
+        """Return `await compute()`, or the result of an identical call in flight or just finished"""
+        flight = key[0]
+        while True:
+            reused = self._reusable(key)
+            if reused is not None:
+                SINGLE_FLIGHT_CALLS.labels(flight, "reused").inc()
+                return reused[1]
+
+            future = self._in_flight.get(key)
+            if future is None or future.get_loop() is not asyncio.get_running_loop():
+                break
+            SINGLE_FLIGHT_CALLS.labels(flight, "coalesced").inc()
+            try:
+                # Shielded so that one waiter going away does not cancel the flight for the others
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The caller computing it was cancelled; try again
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        SINGLE_FLIGHT_CALLS.labels(flight, "executed").inc()
+        try:
+            result = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Retrieved here so that a flight nobody else waited on does not log "never retrieved"
+            future.exception()
+            raise
+        finally:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+        future.set_result(result)
+        if self.reuse_seconds > 0:
+            self._results[key] = (time.monotonic() + self.reuse_seconds, result)
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+        return result
+
+    def _reusable(self, key: Hashable):
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._results[key]
+            return None
+        return entry
@@ -0,0 +1,244 @@
+"""
+Per-request SQL profiling for debug mode.
+
+With DEBUG=true, every statement a request executes is recorded with its
+normalized text (literals and bind parameters replaced by `?`), duration and
+the row count reported by the driver. A statement shape that runs
+`sql_n_plus_one_threshold` or more times in one request is reported as a
+likely N+1 pattern.
+
+The summary goes out in the X-SQL-Profile response header, and the full
+profile of recent requests is served on /debug/sql/{request_id}. Tests can
+assert a statement budget with `query_budget`:
+
+    with query_budget(6):
+        client.get("/api/recommend/home?user_id=1")
+"""
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.core.logger import logger, request_id_var
+import re
+import threading
+import time
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+# Bind parameters as the drivers spell them: ?, $1 (asyncpg), %(name)s / %s (psycopg), :name
+_PARAMETER = re.compile(r"\$\d+|%\(\w+\)s|%s|(?<![:\w]):\w+")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_VALUES_LIST = re.compile(r"(\(\s*\?(?:\s*,\s*\?)*\s*\))(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+@lru_cache(maxsize=2048)
+def normalize_statement(statement: str) -> str:
+    """The shape of a statement: literals and parameters become `?`, lists collapse"""
+    shape = _STRING_LITERAL.sub("?", statement)
+    shape = _PARAMETER.sub("?", shape)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _VALUES_LIST.sub(r"\1, ...", shape)
+    shape = _IN_LIST.sub("(?, ...)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+class StatementRecord:
+    __slots__ = ("statement", "duration", "rows")
+
+    def __init__(self, statement: str, duration: float, rows: Optional[int]):
+        self.statement = statement
+        self.duration = duration
+        self.rows = rows
+
+class SqlProfile:
+    """Statements executed on behalf of one request (or one `query_budget` block)"""
+
+    def __init__(self, request_id: Optional[str] = None, method: Optional[str] = None,
+                 path: Optional[str] = None):
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.statements: List[StatementRecord] = []
+
+    def record(self, statement: str, duration: float, rows: Optional[int]):
+        # list.append is atomic, so threadpool calls of the same request can share the profile
+        self.statements.append(StatementRecord(normalize_statement(statement), duration, rows))
+
+    @property
+    def duration(self) -> float:
+        return sum(record.duration for record in self.statements)
+
+    def n_plus_one(self, threshold: Optional[int] = None) -> List[Dict]:
+        """Statement shapes repeated at least `threshold` times, most frequent first"""
+        threshold = threshold or settings.sql_n_plus_one_threshold
+        counts = Counter(record.statement for record in self.statements)
+        repeated = []
+        for statement, count in counts.most_common():
+            if count < threshold:
+                break
+            duration = sum(r.duration for r in self.statements if r.statement == statement)
+            repeated.append({"statement": statement, "count": count, "duration_ms": round(duration * 1000, 3)})
+        return repeated
+
+    def header(self) -> str:
+        return (f"statements={len(self.statements)};duration_ms={self.duration * 1000:.2f};"
+                f"n_plus_one={len(self.n_plus_one())}")
+
+    def summary(self) -> Dict:
+        return {
+            "request_id": self.request_id,
+            "method": self.method,
+            "path": self.path,
+            "statements": len(self.statements),
+            "duration_ms": round(self.duration * 1000, 3),
+            "n_plus_one": self.n_plus_one(),
+        }
+
+    def to_dict(self) -> Dict:
+        return {
+            **self.summary(),
+            "queries": [
+                {"statement": r.statement, "duration_ms": round(r.duration * 1000, 3), "rows": r.rows}
+                for r in self.statements
+            ],
+        }
+
+_current_profile: ContextVar[Optional[SqlProfile]] = ContextVar("raddit_sql_profile", default=None)
+
+class SqlProfiler:
+    """Engine hooks, the recent-request history and any active query budgets"""
+
+    def __init__(self):
+        self._history: "OrderedDict[str, SqlProfile]" = OrderedDict()
+        self._watchers: List[List[SqlProfile]] = []
+        self._lock = threading.Lock()
+
+    def instrument_engine(self, sync_engine):
+        """Record statements run on an engine (pass `.sync_engine` for async engines)"""
+        from sqlalchemy import event
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def start_statement(conn, cursor, statement, parameters, context, executemany):
+            if _current_profile.get() is not None:
+                conn.info.setdefault("raddit_sql_started", []).append(time.perf_counter())
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def end_statement(conn, cursor, statement, parameters, context, executemany):
+            profile = _current_profile.get()
+            started = conn.info.get("raddit_sql_started")
+            if profile is None or not started:
+                return
+            duration = time.perf_counter() - started.pop()
+            # SELECTs report -1 on most drivers until fetched
+            rows = cursor.rowcount if cursor.rowcount >= 0 else None
+            profile.record(statement, duration, rows)
+
+        @event.listens_for(sync_engine, "handle_error")
+        def drop_failed_statement(exception_context):
+            # Failed statements never reach after_cursor_execute
+            connection = exception_context.connection
+            started = connection.info.get("raddit_sql_started") if connection is not None else None
+            if started:
+                started.pop()
+
+    def begin(self, profile: SqlProfile):
+        return _current_profile.set(profile)
+
+    def finish(self, profile: SqlProfile, token):
+        _current_profile.reset(token)
+        with self._lock:
+            if profile.request_id is not None:
+                self._history[profile.request_id] = profile
+                while len(self._history) > settings.sql_profile_history:
+                    self._history.popitem(last=False)
+            for watcher in self._watchers:
+                watcher.append(profile)
+
+        repeated = profile.n_plus_one()
+        if repeated:
+            top = repeated[0]
+            logger.warning(f"Possible N+1 in {profile.method} {profile.path}: "
+                           f"{top['count']}x {top['statement'][:200]}")
+
+    def get(self, request_id: str) -> Optional[SqlProfile]:
+        with self._lock:
+            return self._history.get(request_id)
+
+    def recent(self, limit: int = 50) -> List[SqlProfile]:
+        with self._lock:
+            return list(self._history.values())[-limit:][::-1]
+
+    @contextmanager
+    def watch(self):
+        """Collect the profiles of requests that finish inside the block"""
+        finished: List[SqlProfile] = []
+        with self._lock:
+            self._watchers.append(finished)
+        try:
+            yield finished
+        finally:
+            with self._lock:
+                self._watchers.remove(finished)
+
+# Create singleton instance
+sql_profiler = SqlProfiler()
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+@contextmanager
+def query_budget(max_statements: int, allow_n_plus_one: bool = False):
+    """
+    Fail if any request finishing inside the block, or code called directly
+    in it, runs more than `max_statements` statements or an N+1 pattern.
+
+    Needs DEBUG=true before the app is imported, so the engines are hooked.
+    """
+    if not settings.debug:
+        raise RuntimeError("query_budget needs the SQL profiler; set DEBUG=true before importing the app")
+    direct = SqlProfile(method="direct", path="query_budget")
+    token = sql_profiler.begin(direct)
+    try:
+        with sql_profiler.watch() as finished:
+            yield finished
+    finally:
+        _current_profile.reset(token)
+
+    problems = []
+    for profile in [direct] + finished:
+        label = f"{profile.method} {profile.path}"
+        if len(profile.statements) > max_statements:
+            problems.append(f"{label} ran {len(profile.statements)} statements (budget {max_statements})")
+        if not allow_n_plus_one:
+            for repeated in profile.n_plus_one():
+                problems.append(f"{label} repeated {repeated['count']}x: {repeated['statement']}")
+    if problems:
+        raise QueryBudgetExceeded("\n".join(problems))
+
+class SqlProfilerMiddleware:
+    """ASGI middleware profiling each request's statements and adding the X-SQL-Profile header"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = SqlProfile(request_id_var.get(), scope["method"], scope["path"])
+        token = sql_profiler.begin(profile)
+
+        async def send_with_profile(message):
+            if message["type"] == "http.response.start":
+                # Statements run after this point (streamed bodies) still reach /debug/sql
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-sql-profile", profile.header().encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            sql_profiler.finish(profile, token)
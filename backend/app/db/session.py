@@ -1,13 +1,130 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.core.config import settings
+from app.core.metrics import instrument_engine
+from app.core.sql_profiler import sql_profiler
 
-# Create the database engine
-engine = create_engine(settings.database_url, connect_args={"check_same_thread": False})
+# Async drivers used when the configured URL names a plain backend
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
 
-# Create a SessionLocal class
+def get_async_database_url(url: str) -> str:
+    """Map a sync database URL onto its async driver (aiosqlite locally, asyncpg for Postgres)"""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        return url
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+def _is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+def _is_sqlite_memory(url: str) -> bool:
+    return _is_sqlite(url) and make_url(url).database in (None, "", ":memory:")
+
+def _apply_sqlite_profile(sync_engine: Engine, read_only: bool):
+    """Set WAL and cache pragmas on every new SQLite connection"""
+    @event.listens_for(sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+        cursor.execute(f"PRAGMA mmap_size={settings.sqlite_mmap_size}")
+        cursor.execute(f"PRAGMA cache_size={settings.sqlite_cache_size}")
+        cursor.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout}")
+        if read_only:
+            # Reader connections must never take the write lock
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+def _engine_options(url: str, pool_size: int, max_overflow: int,
+                    pool_pre_ping: bool, pool_recycle: int, is_async: bool) -> dict:
+    options = {}
+    if _is_sqlite(url):
+        # SQLite connections are handed between threads by the pool
+        options["connect_args"] = {"check_same_thread": False}
+        if _is_sqlite_memory(url):
+            # In-memory databases live on a single connection; leave pooling to SQLAlchemy
+            return options
+        if is_async:
+            # aiosqlite defaults to NullPool, which reconnects (and re-runs pragmas) per checkout
+            options["poolclass"] = AsyncAdaptedQueuePool
+    options.update(
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_pre_ping=pool_pre_ping,
+        pool_recycle=pool_recycle
+    )
+    return options
+
+def create_db_engine(url: str, pool_size: int = 5, max_overflow: int = 10,
+                     pool_pre_ping: bool = True, pool_recycle: int = 1800,
+                     read_only: bool = False):
+    """Create a pooled sync engine, applying the SQLite profile when relevant"""
+    engine = create_engine(url, **_engine_options(url, pool_size, max_overflow,
+                                                  pool_pre_ping, pool_recycle, is_async=False))
+    if _is_sqlite(url) and not _is_sqlite_memory(url):
+        _apply_sqlite_profile(engine, read_only)
+    return engine
+
+def create_async_db_engine(url: str, pool_size: int = 5, max_overflow: int = 10,
+                           pool_pre_ping: bool = True, pool_recycle: int = 1800,
+                           read_only: bool = False):
+    """Create a pooled async engine, applying the SQLite profile when relevant"""
+    engine = create_async_engine(url, **_engine_options(url, pool_size, max_overflow,
+                                                        pool_pre_ping, pool_recycle, is_async=True))
+    if _is_sqlite(url) and not _is_sqlite_memory(url):
+        _apply_sqlite_profile(engine.sync_engine, read_only)
+    return engine
+
+_read_url = settings.database_read_url or settings.database_url
+_write_pool = dict(
+    pool_size=settings.db_write_pool_size,
+    max_overflow=settings.db_write_max_overflow,
+    pool_pre_ping=settings.db_write_pool_pre_ping,
+    pool_recycle=settings.db_write_pool_recycle
+)
+_read_pool = dict(
+    pool_size=settings.db_read_pool_size,
+    max_overflow=settings.db_read_max_overflow,
+    pool_pre_ping=settings.db_read_pool_pre_ping,
+    pool_recycle=settings.db_read_pool_recycle,
+    read_only=True
+)
+
+# Create the writer and reader database engines
+engine = create_db_engine(settings.database_url, **_write_pool)
+read_engine = create_db_engine(_read_url, **_read_pool)
+
+# Create session classes for each engine
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# Create the async engines for routes that run on the event loop
+async_engine = create_async_db_engine(
+    settings.async_database_url or get_async_database_url(settings.database_url), **_write_pool
+)
+async_read_engine = create_async_db_engine(
+    settings.async_database_read_url or get_async_database_url(_read_url), **_read_pool
+)
+
+# Objects stay usable after commit, since async sessions cannot lazy-load
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, expire_on_commit=False, autoflush=False)
+
+# Count statements per request for /metrics
+for _engine in (engine, read_engine, async_engine.sync_engine, async_read_engine.sync_engine):
+    instrument_engine(_engine)
+    # Record every statement per request in debug mode
+    if settings.debug:
+        sql_profiler.instrument_engine(_engine)
 
 # Create a Base class
 Base = declarative_base()
@@ -18,4 +135,22 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Dependency to get a DB session for read-only paths (may be a replica)
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Dependency to get an async DB session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Dependency to get an async DB session for read-only paths (may be a replica)
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
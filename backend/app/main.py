@@ -1,8 +1,27 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import recommend, user, post, auth
+from fastapi.concurrency import run_in_threadpool
+from app.api import recommend, user, post, auth, health, metrics, debug, admin
+from app.core.config import settings
+from app.core.logger import RequestIdMiddleware, logger
+from app.core.metrics import MetricsMiddleware
+from app.core.sampling_profiler import RequestProfilerMiddleware
+from app.core.sql_profiler import SqlProfilerMiddleware
+from app.services.registry import registry
 
-app = FastAPI(title="Raddit Recommendation System")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm shared services explicitly instead of at import time
+    if settings.service_warmup == "blocking":
+        timings = await run_in_threadpool(registry.warmup)
+        logger.info(f"Startup warmup timings: {timings}")
+    elif settings.service_warmup == "background":
+        registry.start_warmup()
+    yield
+    registry.close()
+
+app = FastAPI(title="Raddit Recommendation System", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -13,12 +32,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency and SQL statement counts, exposed on /metrics
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
+# Statement profiles per request (debug mode only)
+if settings.debug:
+    app.add_middleware(SqlProfilerMiddleware)
+
+# Per-request sampling profiles for admins (X-Profile: 1); not installed without a token
+if settings.admin_token:
+    app.add_middleware(RequestProfilerMiddleware)
+
+# Outermost, so every log record of a request carries its ID
+app.add_middleware(RequestIdMiddleware)
+
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(recommend.router, prefix="/api/recommend", tags=["recommend"])
 app.include_router(user.router, prefix="/api/user", tags=["user"])
 app.include_router(post.router, prefix="/api/post", tags=["post"])
+app.include_router(health.router, prefix="/health", tags=["health"])
+if settings.metrics_enabled:
+    app.include_router(metrics.router)
+if settings.debug:
+    app.include_router(debug.router, prefix="/debug", tags=["debug"])
+if settings.admin_token:
+    app.include_router(admin.router, prefix="/admin", tags=["admin"])
 
 @app.get("/")
 async def root():
-    return {"message": "Welcome to Raddit Recommendation System"}
\ No newline at end of file
+    return {"message": "Welcome to Raddit Recommendation System"}
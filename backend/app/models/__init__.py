@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, Table, Float
+from sqlalchemy import Column, Integer, String, DateTime, Date, Text, Boolean, ForeignKey, Table, Float, Index
 from sqlalchemy.orm import declarative_base, relationship
 from datetime import datetime
 
@@ -50,21 +50,6 @@ class Interest(Base):
     # Relationship with users
     users = relationship("User", secondary=user_interests, back_populates="interests")
 
-class Post(Base):
-    __tablename__ = "posts"
-    
-    id = Column(Integer, primary_key=True, index=True)
-    title = Column(String, index=True)
-    content = Column(Text)
-    author_id = Column(Integer, ForeignKey("users.id"))
-    created_at = Column(DateTime, default=datetime.utcnow)
-    is_deleted = Column(Boolean, default=False)
-    
-    # Relationship with users
-    author = relationship("User", back_populates="posts")
-    # Relationship with user events
-    events = relationship("UserEvent", back_populates="post")
-
 class UserInterestWeight(Base):
     __tablename__ = "user_interest_weights"
     
@@ -78,6 +63,11 @@ class UserInterestWeight(Base):
     # Relationships
     user = relationship("User", back_populates="interest_weights")
     interest = relationship("Interest")
+    
+    __table_args__ = (
+        # One row per (user, interest); lookups and upserts go through this index
+        Index("uq_user_interest_weights_user_interest", "user_id", "interest_id", unique=True),
+    )
 
 class UserBehaviorScore(Base):
     __tablename__ = "user_behavior_scores"
@@ -94,6 +84,10 @@ class UserBehaviorScore(Base):
     # Relationships
     user = relationship("User", back_populates="behavior_scores")
     interest = relationship("Interest")
+    
+    __table_args__ = (
+        Index("uq_user_behavior_scores_user_interest", "user_id", "interest_id", unique=True),
+    )
 
 class Post(Base):
     __tablename__ = "posts"
@@ -116,6 +110,13 @@ class Post(Base):
     events = relationship("UserEvent", back_populates="post")
     # Relationship with interests
     primary_interest = relationship("Interest")
+    
+    __table_args__ = (
+        # Interest feeds: filter by primary interest, newest first
+        Index("ix_posts_interest_feed", "primary_interest_id", "is_deleted", "created_at"),
+        # Fresh/secondary-interest feeds: all live posts, newest first
+        Index("ix_posts_feed", "is_deleted", "created_at"),
+    )
 
 class UserEvent(Base):
     __tablename__ = "user_events"
@@ -129,4 +130,36 @@ class UserEvent(Base):
     
     # Relationship with users and posts
     user = relationship("User", back_populates="events")
-    post = relationship("Post", back_populates="events")
\ No newline at end of file
+    post = relationship("Post", back_populates="events")
+    
+    __table_args__ = (
+        # Popularity: recent events grouped by post
+        Index("ix_user_events_timestamp_post", "timestamp", "post_id"),
+    )
+
+class EventDailyAggregate(Base):
+    """Per-day event counts that raw user events are compacted into"""
+    __tablename__ = "event_daily_aggregates"
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    post_id = Column(Integer, ForeignKey("posts.id"), nullable=False)
+    event_type = Column(String, nullable=False)
+    day = Column(Date, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        Index("uq_event_daily_aggregates_key", "user_id", "post_id", "event_type", "day", unique=True),
+        # Popularity: counts per post over a range of days
+        Index("ix_event_daily_aggregates_day_post", "day", "post_id", "count"),
+    )
+
+class EventPartition(Base):
+    """Catalog of the monthly tables that closed months of user events are moved into"""
+    __tablename__ = "event_partitions"
+    
+    table_name = Column(String, primary_key=True)
+    start = Column(DateTime, nullable=False)  # inclusive
+    end = Column(DateTime, nullable=False)  # exclusive
+    row_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,114 @@
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.admission import home_admission
+from app.core.logger import logger
+from app.core.metrics import CANDIDATE_SOURCE_LATENCY, CANDIDATE_SOURCE_OUTCOMES, FALLBACKS
+from app.db.session import AsyncReadSessionLocal
+import asyncio
+import time
+
+class CandidateSource:
+    """
+    A named candidate source with its own quota and timeout.
+
+    `fetch(db, quota)` is a coroutine returning a list of candidate dicts that
+    carry at least an `id` (post ID) and a `relevance_score`.
+    """
+
+    def __init__(self, name: str, fetch: Callable[[AsyncSession, int], Awaitable[List[Dict]]],
+                 quota: int, timeout: float):
+        self.name = name
+        self.fetch = fetch
+        self.quota = quota
+        self.timeout = timeout
+
+class CandidateGenerator:
+    """
+    Runs candidate sources concurrently and merges their results.
+
+    Every source gets its own database session, since a session cannot run
+    concurrent statements. Sources that fail or exceed their timeout are
+    cancelled and dropped, so overall latency is bounded by the slowest
+    source rather than the sum.
+    """
+
+    def __init__(self, session_factory=AsyncReadSessionLocal):
+        self._session_factory = session_factory
+
+    async def generate(self, sources: List[CandidateSource], limit: Optional[int] = None) -> List[Dict]:
+        """Fan out to all sources, then merge and dedupe their candidates by post ID"""
+        results = {source.name: candidates async for source, candidates in self.stream(sources)}
+        return self.merge(sources, results, limit)
+
+    async def stream(self, sources: List[CandidateSource]) -> AsyncIterator[Tuple[CandidateSource, List[Dict]]]:
+        """
+        Fan out to all sources and yield each one's candidates as soon as it
+        finishes. Failed and timed-out sources are logged and skipped; sources
+        still running when the caller stops iterating are cancelled.
+        """
+        pending = {
+            asyncio.ensure_future(asyncio.wait_for(self._run_source(source), timeout=source.timeout)): source
+            for source in sources
+        }
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # Report finished sources in priority order
+                for task in sorted(done, key=lambda task: sources.index(pending[task])):
+                    source = pending.pop(task)
+                    if self._record_outcome(source, task):
+                        yield source, task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    @staticmethod
+    def _record_outcome(source: CandidateSource, task: asyncio.Future) -> bool:
+        error = task.exception()
+        if isinstance(error, asyncio.TimeoutError):
+            CANDIDATE_SOURCE_OUTCOMES.labels(source.name, "timeout").inc()
+            FALLBACKS.labels(f"{source.name}_timeout").inc()
+            logger.warning(f"Candidate source '{source.name}' timed out after {source.timeout:.3f}s")
+        elif error is not None:
+            CANDIDATE_SOURCE_OUTCOMES.labels(source.name, "error").inc()
+            FALLBACKS.labels(f"{source.name}_error").inc()
+            logger.error(f"Candidate source '{source.name}' failed: {error}")
+        else:
+            CANDIDATE_SOURCE_OUTCOMES.labels(source.name, "ok").inc()
+            return True
+        return False
+
+    async def _run_source(self, source: CandidateSource) -> List[Dict]:
+        start = time.perf_counter()
+        try:
+            async with self._session_factory() as db:
+                return (await source.fetch(db, source.quota))[:source.quota]
+        finally:
+            # Also runs on cancellation, so timed-out sources show their full wait
+            elapsed = time.perf_counter() - start
+            CANDIDATE_SOURCE_LATENCY.labels(source.name).observe(elapsed)
+            home_admission.observe(source.name, elapsed)
+
+    @staticmethod
+    def merge(sources: List[CandidateSource], results: Dict[str, List[Dict]],
+              limit: Optional[int] = None) -> List[Dict]:
+        """
+        Merge per-source candidates in source priority order.
+
+        A post returned by several sources is kept once, at the position of
+        its highest-priority source, with the best relevance score and every
+        contributing source listed in `sources`.
+        """
+        merged = {}
+        for source in sources:
+            for candidate in results.get(source.name, []):
+                existing = merged.get(candidate['id'])
+                if existing is None:
+                    merged[candidate['id']] = dict(candidate, source=source.name, sources=[source.name])
+                    continue
+                if source.name not in existing['sources']:
+                    existing['sources'].append(source.name)
+                existing['relevance_score'] = max(existing['relevance_score'], candidate['relevance_score'])
+
+        candidates = list(merged.values())
+        return candidates[:limit] if limit is not None else candidates
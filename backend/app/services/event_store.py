@@ -0,0 +1,306 @@
+"""
+Time-partitioned storage for user events.
+
+New events are always written to `user_events` (the head table). The
+compaction job moves three things along:
+
+1. Rollup: complete days after the rollup watermark are counted into
+   `event_daily_aggregates` as (user_id, post_id, event_type, day) -> count.
+   The watermark is the latest aggregated day.
+2. Partitioning: events from closed months are moved out of the head table
+   into monthly `user_events_YYYYMM` tables, recorded in `event_partitions`.
+3. Retention: raw events older than the retention window (and already
+   aggregated) are deleted, and monthly tables that fall entirely outside it
+   are dropped.
+
+Readers combine aggregates up to the watermark with raw events after it.
+Raw rows are only deleted once aggregated and past retention, so a reader
+working from a slightly stale layout still counts every event exactly once.
+"""
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import (Column, Date, DateTime, Float, Index, Integer, MetaData, String, Table,
+                        and_, cast, delete, func, insert, select, union_all)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import CACHE_REQUESTS
+from app.models import EventDailyAggregate, EventPartition, UserEvent
+import re
+import threading
+import time
+
+PARTITION_PATTERN = re.compile(r"^user_events_\d{6}$")
+
+EVENT_COLUMNS = ("id", "user_id", "post_id", "event_type", "engagement_score", "timestamp")
+
+def is_partition_table(name: str) -> bool:
+    """Whether a table name is one of the monthly event partitions"""
+    return bool(PARTITION_PATTERN.match(name))
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+def next_month(value: datetime) -> datetime:
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+def day_start(value: date) -> datetime:
+    return datetime.combine(value, dt_time.min)
+
+def day_of(column, dialect: str):
+    """Truncate a timestamp column to its date; SQLite has no DATE type to CAST to"""
+    if dialect == 'sqlite':
+        return func.date(column, type_=Date)
+    return cast(column, Date)
+
+class EventLayout:
+    """Snapshot of where events live: the rollup watermark and the monthly partitions"""
+
+    def __init__(self, watermark: Optional[date], partitions: List[Tuple[str, datetime, datetime]]):
+        self.watermark = watermark
+        self.partitions = partitions
+
+    @property
+    def raw_since(self) -> Optional[datetime]:
+        """First instant not covered by the aggregates"""
+        return day_start(self.watermark + timedelta(days=1)) if self.watermark else None
+
+class EventStore:
+    """Partition-aware reads over user events, plus the compaction job"""
+
+    def __init__(self):
+        self._metadata = MetaData()
+        self._tables_lock = threading.Lock()
+        self._layout: Optional[EventLayout] = None
+        self._layout_loaded_at = 0.0
+
+    def partition_table(self, name: str) -> Table:
+        """The Table object for a monthly partition (same columns as user_events, no foreign keys)"""
+        with self._tables_lock:
+            table = self._metadata.tables.get(name)
+            if table is None:
+                table = Table(
+                    name, self._metadata,
+                    Column("id", Integer, primary_key=True),
+                    Column("user_id", Integer),
+                    Column("post_id", Integer),
+                    Column("event_type", String),
+                    Column("engagement_score", Float),
+                    Column("timestamp", DateTime),
+                    Index(f"ix_{name}_timestamp_post", "timestamp", "post_id"),
+                )
+            return table
+
+    # Layout
+
+    def load_layout(self, db: Session) -> EventLayout:
+        """Read the rollup watermark and partition catalog from the database"""
+        watermark = db.execute(select(func.max(EventDailyAggregate.day))).scalar()
+        partitions = db.execute(
+            select(EventPartition.table_name, EventPartition.start, EventPartition.end)
+            .order_by(EventPartition.start)
+        ).all()
+        return EventLayout(watermark, [tuple(row) for row in partitions])
+
+    def layout(self, db: Session) -> EventLayout:
+        """The cached layout, reloaded after `event_layout_ttl` seconds"""
+        if self._layout is None or time.monotonic() - self._layout_loaded_at > settings.event_layout_ttl:
+            CACHE_REQUESTS.labels("event_layout", "miss").inc()
+            self._layout = self.load_layout(db)
+            self._layout_loaded_at = time.monotonic()
+        else:
+            CACHE_REQUESTS.labels("event_layout", "hit").inc()
+        return self._layout
+
+    async def alayout(self, db: AsyncSession) -> EventLayout:
+        if self._layout is not None and time.monotonic() - self._layout_loaded_at <= settings.event_layout_ttl:
+            CACHE_REQUESTS.labels("event_layout", "hit").inc()
+            return self._layout
+        return await db.run_sync(self.layout)
+
+    def invalidate(self):
+        self._layout = None
+
+    # Queries
+
+    def raw_events(self, layout: EventLayout, since: Optional[datetime] = None,
+                   until: Optional[datetime] = None):
+        """
+        Raw events in [since, until) across the head table and every monthly
+        partition that overlaps the range, as one selectable.
+        """
+        tables = [UserEvent.__table__]
+        for name, start, end in layout.partitions:
+            if (since is None or end > since) and (until is None or start < until):
+                tables.append(self.partition_table(name))
+
+        selects = []
+        for table in tables:
+            conditions = []
+            if since is not None:
+                conditions.append(table.c.timestamp >= since)
+            if until is not None:
+                conditions.append(table.c.timestamp < until)
+            selects.append(select(*(table.c[name] for name in EVENT_COLUMNS)).where(*conditions))
+
+        if len(selects) == 1:
+            return selects[0].subquery("events")
+        return union_all(*selects).subquery("events")
+
+    def engagement_counts(self, layout: EventLayout, since: datetime):
+        """
+        Per-post event counts since `since`, as (post_id, engagement) rows.
+
+        Aggregated days are counted whole, so the window starts at midnight
+        of `since`'s day for the aggregated part. A post can appear in more
+        than one row; callers sum by post_id.
+        """
+        branches = []
+        raw_since = since
+        if layout.watermark is not None and layout.watermark >= since.date():
+            branches.append(
+                select(EventDailyAggregate.post_id, func.sum(EventDailyAggregate.count).label('engagement'))
+                .where(EventDailyAggregate.day >= since.date(), EventDailyAggregate.day <= layout.watermark)
+                .group_by(EventDailyAggregate.post_id)
+            )
+            raw_since = layout.raw_since
+
+        raw = self.raw_events(layout, since=raw_since)
+        branches.append(
+            select(raw.c.post_id, func.count().label('engagement')).group_by(raw.c.post_id)
+        )
+
+        if len(branches) == 1:
+            return branches[0].subquery("engagement_counts")
+        return union_all(*branches).subquery("engagement_counts")
+
+    def daily_counts(self, layout: EventLayout, dialect: str, since: Optional[date] = None):
+        """
+        (user_id, post_id, event_type, day, count) rows for every day since
+        `since`: aggregates up to the watermark, raw events rolled up on the
+        fly after it. Each key appears once.
+        """
+        branches = []
+        raw_since = day_start(since) if since else None
+        if layout.watermark is not None:
+            aggregates = select(
+                EventDailyAggregate.user_id, EventDailyAggregate.post_id, EventDailyAggregate.event_type,
+                EventDailyAggregate.day, EventDailyAggregate.count
+            ).where(EventDailyAggregate.day <= layout.watermark)
+            if since is not None:
+                aggregates = aggregates.where(EventDailyAggregate.day >= since)
+            branches.append(aggregates)
+            raw_since = max(raw_since, layout.raw_since) if raw_since else layout.raw_since
+
+        branches.append(self._rollup_select(self.raw_events(layout, since=raw_since), dialect))
+        if len(branches) == 1:
+            return branches[0].subquery("daily_counts")
+        return union_all(*branches).subquery("daily_counts")
+
+    def _rollup_select(self, raw, dialect: str):
+        day = day_of(raw.c.timestamp, dialect).label('day')
+        return select(
+            raw.c.user_id, raw.c.post_id, raw.c.event_type, day, func.count().label('count')
+        ).where(
+            raw.c.user_id.isnot(None),
+            raw.c.post_id.isnot(None),
+            raw.c.event_type.isnot(None)
+        ).group_by(raw.c.user_id, raw.c.post_id, raw.c.event_type, day)
+
+    # Compaction
+
+    def compact(self, db: Session, now: Optional[datetime] = None,
+                retention_days: Optional[int] = None) -> Dict[str, int]:
+        """Run rollup, partitioning and retention in order; each step commits on its own"""
+        now = now or datetime.utcnow()
+        retention_days = settings.event_retention_days if retention_days is None else retention_days
+        try:
+            stats = {
+                "aggregated_rows": self.rollup(db, now),
+                "partitioned_events": self.partition_closed_months(db, now),
+                "dropped_events": self.drop_expired(db, now, retention_days),
+            }
+        finally:
+            self.invalidate()
+        logger.info(f"Event compaction: {stats}")
+        return stats
+
+    def rollup(self, db: Session, now: datetime) -> int:
+        """Aggregate every complete day after the watermark; returns the number of aggregate rows written"""
+        layout = self.load_layout(db)
+        today = day_start(now.date())
+        if layout.raw_since is not None and layout.raw_since >= today:
+            return 0
+
+        raw = self.raw_events(layout, since=layout.raw_since, until=today)
+        counts = self._rollup_select(raw, db.get_bind().dialect.name)
+        # A plain INSERT: each day is aggregated exactly once, so a key collision means a concurrent run
+        result = db.execute(insert(EventDailyAggregate).from_select(
+            ["user_id", "post_id", "event_type", "day", "count"], counts
+        ))
+        db.commit()
+        return result.rowcount
+
+    def partition_closed_months(self, db: Session, now: datetime) -> int:
+        """Move events from months before the current one into monthly tables"""
+        head = UserEvent.__table__
+        current = month_start(now)
+        moved = 0
+        while True:
+            oldest = db.execute(select(func.min(head.c.timestamp))).scalar()
+            if oldest is None or oldest >= current:
+                return moved
+            moved += self._move_month(db, month_start(oldest))
+
+    def _move_month(self, db: Session, start: datetime) -> int:
+        head = UserEvent.__table__
+        end = next_month(start)
+        name = f"user_events_{start:%Y%m}"
+        table = self.partition_table(name)
+        table.create(db.connection(), checkfirst=True)
+
+        in_month = and_(head.c.timestamp >= start, head.c.timestamp < end)
+        db.execute(insert(table).from_select(
+            list(EVENT_COLUMNS), select(*(head.c[column] for column in EVENT_COLUMNS)).where(in_month)
+        ))
+        moved = db.execute(delete(head).where(in_month)).rowcount
+
+        partition = db.get(EventPartition, name)
+        if partition is None:
+            db.add(EventPartition(table_name=name, start=start, end=end, row_count=moved))
+        else:
+            partition.row_count += moved
+        db.commit()
+        logger.info(f"Moved {moved} events into {name}")
+        return moved
+
+    def drop_expired(self, db: Session, now: datetime, retention_days: int) -> int:
+        """Delete raw events that are past retention and already aggregated"""
+        layout = self.load_layout(db)
+        if layout.watermark is None:
+            return 0
+        cutoff = min(day_start((now - timedelta(days=retention_days)).date()), layout.raw_since)
+
+        dropped = 0
+        for name, start, end in layout.partitions:
+            if start >= cutoff:
+                continue
+            table = self.partition_table(name)
+            partition = db.get(EventPartition, name)
+            if end <= cutoff:
+                dropped += partition.row_count
+                table.drop(db.connection(), checkfirst=True)
+                db.delete(partition)
+            else:
+                deleted = db.execute(delete(table).where(table.c.timestamp < cutoff)).rowcount
+                partition.row_count -= deleted
+                dropped += deleted
+
+        head = UserEvent.__table__
+        dropped += db.execute(delete(head).where(head.c.timestamp < cutoff)).rowcount
+        db.commit()
+        return dropped
+
+# Create singleton instance
+event_store = EventStore()
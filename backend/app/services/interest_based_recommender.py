@@ -1,11 +1,30 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
-from typing import List, Dict, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, func, desc
+from sqlalchemy.sql import Select
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+from datetime import datetime, timedelta
 import numpy as np
+from app.core.admission import FULL, NO_RECALL, NO_RERANK, home_admission
+from app.core.config import settings
+from app.core.metrics import STAGE_LATENCY
 from app.models import User, Post, Interest, UserInterestWeight, UserBehaviorScore, user_interests
-from app.services.recall_service import RecallService
-from app.services.rank_service import RankService
+from app.services.candidate_generator import CandidateGenerator, CandidateSource
+from app.services.event_store import EventLayout, event_store
+from app.services.registry import registry
+from fastapi.concurrency import run_in_threadpool
 import json
+import time
+
+# How much each interaction type moves a user's interest weight
+INTERACTION_WEIGHTS = {
+    'view': 0.1,
+    'click': 0.3,
+    'upvote': 0.5,
+    'downvote': -0.3,
+    'save': 0.7,
+    'comment': 0.8,
+    'share': 1.0
+}
 
 class InterestBasedRecommender:
     """
@@ -14,48 +33,89 @@ class InterestBasedRecommender:
     """
     
     def __init__(self):
-        self.recall_service = RecallService()
-        self.rank_service = RankService()
+        self.candidate_generator = CandidateGenerator()
     
-    def get_initial_recommendations(self, user_id: int, db: Session, limit: int = 20) -> List[Dict]:
+    async def get_initial_recommendations(self, user_id: int, db: AsyncSession, limit: int = 20) -> List[Dict]:
         """
         Get initial recommendations for a new user based on their selected interests.
         """
         # Get user's interests
-        user_interests = self._get_user_interests(user_id, db)
+        with STAGE_LATENCY.labels("interest_load").time():
+            user_interests = await self._get_user_interests(user_id, db)
         
         if not user_interests:
             # Fallback to popular posts if no interests selected
-            return self._get_popular_posts(db, limit)
+            return await self._get_popular_posts(db, limit)
         
         # Get posts matching user interests with initial weighting
-        posts = self._get_interest_based_posts(user_id, user_interests, db, limit)
+        posts = await self._get_interest_based_posts(user_id, user_interests, db, limit)
         
         return posts
     
-    def get_personalized_recommendations(self, user_id: int, db: Session, limit: int = 20) -> List[Dict]:
+    async def get_personalized_recommendations(self, user_id: int, db: AsyncSession, limit: int = 20,
+                                               degradation: int = FULL) -> List[Dict]:
         """
         Get personalized recommendations based on user behavior and interests.
+        A `degradation` level from admission control sheds rerank (NO_RERANK)
+        and vector recall (NO_RECALL).
         """
-        # Get user's interests with weights
-        user_interests = self._get_user_interests_with_weights(user_id, db)
-        
-        # Get behavior scores
-        behavior_scores = self._get_user_behavior_scores(user_id, db)
-        
-        # Combine interest weights with behavior scores
-        combined_scores = self._combine_interest_behavior_scores(user_interests, behavior_scores)
+        combined_scores, top_interest = await self._get_combined_scores(user_id, db)
         
         # Get posts based on combined scores
-        posts = self._get_personalized_posts(user_id, combined_scores, db, limit)
+        posts = await self._get_personalized_posts(user_id, combined_scores, db, limit, degradation, top_interest)
         
         return posts
     
-    def _get_user_interests(self, user_id: int, db: Session) -> List[Dict]:
+    async def stream_personalized_recommendations(self, user_id: int, db: AsyncSession, limit: int = 20,
+                                                  first_batch: int = 5, batch_size: int = 10,
+                                                  degradation: int = FULL) -> AsyncIterator[List[Dict]]:
+        """
+        Personalized recommendations as batches of posts, the first as early as possible.
+        
+        As soon as the primary interest source returns, its best `first_batch`
+        candidates are hydrated and yielded, while the other sources are still
+        running. The rest of the feed follows once every source has finished
+        and the pool is ranked, hydrated `batch_size` posts at a time. Posts
+        already sent are not repeated.
+        """
+        combined_scores, top_interest = await self._get_combined_scores(user_id, db)
+        sources = self._personalized_sources(user_id, combined_scores, limit, degradation, top_interest)
+        
+        results = {}
+        sent = set()
+        async for source, candidates in self.candidate_generator.stream(sources):
+            results[source.name] = candidates
+            if sent or source.name != 'primary_interest' or not candidates:
+                continue
+            early = sorted(candidates, key=lambda x: x['relevance_score'], reverse=True)[:min(first_batch, limit)]
+            posts = await self._hydrate_posts(early, db)
+            sent.update(post['id'] for post in posts)
+            yield posts
+        
+        candidates = [c for c in self.candidate_generator.merge(sources, results) if c['id'] not in sent]
+        ranked = (await self._rank_candidates(user_id, candidates, db, degradation, top_interest))[:limit - len(sent)]
+        for start in range(0, len(ranked), batch_size):
+            yield await self._hydrate_posts(ranked[start:start + batch_size], db)
+    
+    async def _get_combined_scores(self, user_id: int, db: AsyncSession) -> Tuple[Dict[int, float], int]:
+        """
+        Per-interest scores from the user's interest weights and behavior, and
+        the highest-weighted interest (0 if none) the models take as a feature
+        """
+        with STAGE_LATENCY.labels("interest_load").time():
+            # Get user's interests with weights
+            user_interests = await self._get_user_interests_with_weights(user_id, db)
+            
+            # Get behavior scores
+            behavior_scores = await self._get_user_behavior_scores(user_id, db)
+        
+        # Combine interest weights with behavior scores
+        top_interest = user_interests[0]['id'] if user_interests else 0
+        return self._combine_interest_behavior_scores(user_interests, behavior_scores), top_interest
+    
+    async def _get_user_interests(self, user_id: int, db: AsyncSession) -> List[Dict]:
         """Get user's interests with categories"""
-        interests = db.query(Interest).join(user_interests).filter(
-            user_interests.c.user_id == user_id
-        ).all()
+        interests = (await db.execute(self._user_interests_stmt(user_id))).scalars().all()
         
         return [
             {
@@ -68,19 +128,9 @@ class InterestBasedRecommender:
             for interest in interests
         ]
     
-    def _get_user_interests_with_weights(self, user_id: int, db: Session) -> List[Dict]:
+    async def _get_user_interests_with_weights(self, user_id: int, db: AsyncSession) -> List[Dict]:
         """Get user's interests with learned weights"""
-        query = db.query(
-            Interest,
-            UserInterestWeight.weight,
-            UserInterestWeight.updated_at
-        ).join(
-            UserInterestWeight, Interest.id == UserInterestWeight.interest_id
-        ).filter(
-            UserInterestWeight.user_id == user_id
-        ).order_by(
-            desc(UserInterestWeight.weight)
-        ).all()
+        rows = (await db.execute(self._user_interest_weights_stmt(user_id))).all()
         
         return [
             {
@@ -91,14 +141,12 @@ class InterestBasedRecommender:
                 'weight': weight,
                 'updated_at': updated_at
             }
-            for interest, weight, updated_at in query
+            for interest, weight, updated_at in rows
         ]
     
-    def _get_user_behavior_scores(self, user_id: int, db: Session) -> Dict[int, Dict]:
+    async def _get_user_behavior_scores(self, user_id: int, db: AsyncSession) -> Dict[int, Dict]:
         """Get user's behavior scores for interests"""
-        scores = db.query(UserBehaviorScore).filter(
-            UserBehaviorScore.user_id == user_id
-        ).all()
+        scores = (await db.execute(self._user_behavior_scores_stmt(user_id))).scalars().all()
         
         return {
             score.interest_id: {
@@ -133,196 +181,386 @@ class InterestBasedRecommender:
         
         return combined_scores
     
-    def _get_interest_based_posts(self, user_id: int, interests: List[Dict], 
-                                db: Session, limit: int) -> List[Dict]:
+    async def _get_interest_based_posts(self, user_id: int, interests: List[Dict], 
+                                      db: AsyncSession, limit: int) -> List[Dict]:
         """Get posts that match user's interests"""
         interest_ids = [interest['id'] for interest in interests]
         
-        # Get posts that have primary or secondary interests matching user's interests
-        posts = db.query(Post, Interest).join(
-            Interest, Post.primary_interest_id == Interest.id
-        ).filter(
-            Post.primary_interest_id.in_(interest_ids),
-            Post.is_deleted == False
-        ).order_by(
-            desc(Post.created_at)
-        ).limit(limit * 2).all()  # Get more to allow for ranking
-        
-        # Format results
-        formatted_posts = []
-        for post, interest in posts:
-            formatted_posts.append({
-                'id': post.id,
-                'title': post.title,
-                'content': post.content[:200] + '...' if len(post.content) > 200 else post.content,
-                'author': post.author.username,
-                'created_at': post.created_at.isoformat(),
-                'primary_interest': {
-                    'id': interest.id,
-                    'name': interest.name,
-                    'category': interest.category
-                },
-                'relevance_score': 1.0  # Initial score
-            })
-        
-        # If we don't have enough posts, add secondary interest matches
-        if len(formatted_posts) < limit:
-            secondary_posts = self._get_secondary_interest_posts(interest_ids, db, 
-                                                               limit - len(formatted_posts))
-            formatted_posts.extend(secondary_posts)
-        
-        return formatted_posts[:limit]
-    
-    def _get_secondary_interest_posts(self, interest_ids: List[int], db: Session, 
-                                    limit: int) -> List[Dict]:
+        # Primary and secondary interest matches are fetched concurrently, with
+        # popular posts as filler when the user's interests are sparse
+        sources = [
+            CandidateSource(
+                'primary_interest',
+                lambda session, quota: self._get_primary_interest_candidates(
+                    interest_ids, session, quota),
+                quota=limit * 2,
+                timeout=settings.candidate_source_timeout
+            ),
+            CandidateSource(
+                'secondary_interest',
+                lambda session, quota: self._get_secondary_interest_candidates(
+                    interest_ids, session, quota),
+                quota=limit,
+                timeout=settings.candidate_source_timeout
+            ),
+            CandidateSource(
+                'popular',
+                self._get_popular_candidates,
+                quota=limit,
+                timeout=settings.candidate_source_timeout
+            ),
+        ]
+        
+        with STAGE_LATENCY.labels("candidates").time():
+            candidates = await self.candidate_generator.generate(sources, limit)
+        return await self._hydrate_posts(candidates, db)
+    
+    async def _get_personalized_posts(self, user_id: int, combined_scores: Dict[int, float], 
+                                    db: AsyncSession, limit: int, degradation: int = FULL,
+                                    top_interest: int = 0) -> List[Dict]:
+        """Get personalized posts based on combined interest and behavior scores"""
+        sources = self._personalized_sources(user_id, combined_scores, limit, degradation, top_interest)
+        
+        with STAGE_LATENCY.labels("candidates").time():
+            candidates = await self.candidate_generator.generate(sources)
+        if not candidates:
+            return []
+        
+        ranked = await self._rank_candidates(user_id, candidates, db, degradation, top_interest)
+        return await self._hydrate_posts(ranked[:limit], db)
+    
+    def _personalized_sources(self, user_id: int, combined_scores: Dict[int, float], limit: int,
+                              degradation: int = FULL, top_interest: int = 0) -> List[CandidateSource]:
+        interest_ids = list(combined_scores.keys())
+        
+        sources = [
+            CandidateSource(
+                'primary_interest',
+                lambda session, quota: self._get_primary_interest_candidates(
+                    interest_ids, session, quota, combined_scores),
+                quota=limit * 2,
+                timeout=settings.candidate_source_timeout
+            ),
+            CandidateSource(
+                'secondary_interest',
+                lambda session, quota: self._get_secondary_interest_candidates(
+                    interest_ids, session, quota),
+                quota=limit,
+                timeout=settings.candidate_source_timeout
+            ),
+            CandidateSource(
+                'vector_recall',
+                lambda session, quota: self._get_vector_recall_candidates(
+                    user_id, session, quota, top_interest),
+                quota=limit,
+                timeout=settings.vector_recall_timeout
+            ),
+            CandidateSource(
+                'popular',
+                self._get_popular_candidates,
+                quota=max(1, limit // 2),
+                timeout=settings.candidate_source_timeout
+            ),
+            CandidateSource(
+                'fresh',
+                self._get_fresh_candidates,
+                quota=max(1, limit // 2),
+                timeout=settings.candidate_source_timeout
+            ),
+        ]
+        if degradation >= NO_RECALL:
+            sources = [source for source in sources if source.name != 'vector_recall']
+        return sources
+    
+    async def _rank_candidates(self, user_id: int, candidates: List[Dict], db: AsyncSession,
+                               degradation: int = FULL, top_interest: int = 0) -> List[Dict]:
+        """Order candidates by relevance, then let the ranking model re-rank the pool"""
+        if not candidates:
+            return []
+        candidates = sorted(candidates, key=lambda x: x['relevance_score'], reverse=True)
+        if degradation >= NO_RERANK:
+            return candidates
+        
+        start = time.perf_counter()
+        with STAGE_LATENCY.labels("rerank").time():
+            # The post features the ranking model was trained on
+            post_ids = [c['id'] for c in candidates]
+            rows = (await db.execute(self._rank_features_stmt(post_ids))).all()
+            post_features = {post_id: (interest_id or 0, author_id or 0) for post_id, interest_id, author_id in rows}
+            rank_service = await registry.aget("rank")
+            ranked_ids = await rank_service.rerank_async(str(user_id), post_ids, top_interest, post_features)
+        home_admission.observe("rerank", time.perf_counter() - start)
+        by_id = {c['id']: c for c in candidates}
+        return [by_id[post_id] for post_id in ranked_ids if post_id in by_id]
+    
+    async def _get_primary_interest_candidates(self, interest_ids: List[int], db: AsyncSession, limit: int,
+                                               interest_scores: Optional[Dict[int, float]] = None) -> List[Dict]:
+        """Get newest posts whose primary interest matches the user's interests"""
+        shared = await registry.aget("shared_cache")
+        rows = shared.recent_post_ids(interest_ids, limit) if shared is not None else None
+        if rows is None:
+            rows = (await db.execute(self._primary_interest_stmt(interest_ids, limit))).all()
+        
+        return [
+            {
+                'id': post_id,
+                'relevance_score': interest_scores.get(interest_id, 0.0) if interest_scores else 1.0
+            }
+            for post_id, interest_id in rows
+        ]
+    
+    async def _get_secondary_interest_candidates(self, interest_ids: List[int], db: AsyncSession, 
+                                               limit: int) -> List[Dict]:
         """Get posts with secondary interests matching user's interests"""
-        posts = db.query(Post, Interest).join(
-            Interest, Post.primary_interest_id == Interest.id
-        ).filter(
-            Post.is_deleted == False
-        ).order_by(
-            desc(Post.created_at)
-        ).limit(limit * 2).all()
+        rows = (await db.execute(self._secondary_interest_stmt(limit * 2))).all()
         
-        filtered_posts = []
-        for post, interest in posts:
+        wanted = set(interest_ids)
+        candidates = []
+        for post_id, secondary_interest_ids in rows:
             # Check if any secondary interests match
-            secondary_interests = []
-            if post.secondary_interest_ids:
-                try:
-                    secondary_interests = json.loads(post.secondary_interest_ids)
-                except json.JSONDecodeError:
-                    secondary_interests = []
+            try:
+                secondary_interests = json.loads(secondary_interest_ids)
+            except json.JSONDecodeError:
+                continue
             
             # Check for overlap with user's interests
-            overlap = set(interest_ids) & set(secondary_interests)
+            overlap = wanted & set(secondary_interests)
             if overlap:
-                filtered_posts.append({
-                    'id': post.id,
-                    'title': post.title,
-                    'content': post.content[:200] + '...' if len(post.content) > 200 else post.content,
-                    'author': post.author.username,
-                    'created_at': post.created_at.isoformat(),
-                    'primary_interest': {
-                        'id': interest.id,
-                        'name': interest.name,
-                        'category': interest.category
-                    },
+                candidates.append({
+                    'id': post_id,
                     'relevance_score': len(overlap) / len(interest_ids)  # Score based on overlap
                 })
         
-        return filtered_posts[:limit]
+        return candidates[:limit]
     
-    def _get_personalized_posts(self, user_id: int, combined_scores: Dict[int, float], 
-                              db: Session, limit: int) -> List[Dict]:
-        """Get personalized posts based on combined interest and behavior scores"""
-        interest_ids = list(combined_scores.keys())
+    async def _get_vector_recall_candidates(self, user_id: int, db: AsyncSession, limit: int,
+                                            user_interest: int = 0) -> List[Dict]:
+        """Get candidates from Two-Tower vector recall"""
+        with STAGE_LATENCY.labels("recall").time():
+            recall_service = await registry.aget("recall")
+            # Model inference and the Milvus client are blocking, so keep them off the event loop
+            post_ids = await run_in_threadpool(recall_service.get_candidates, str(user_id), limit, user_interest)
+        
+        # Recall results are already ordered by similarity
+        return [
+            {'id': int(post_id), 'relevance_score': 1.0 - rank / max(len(post_ids), 1)}
+            for rank, post_id in enumerate(post_ids)
+        ]
+    
+    async def _get_popular_candidates(self, db: AsyncSession, limit: int) -> List[Dict]:
+        """Get the most engaged-with posts over the recent popularity window"""
+        shared = await registry.aget("shared_cache")
+        cards = shared.popular_cards(limit) if shared is not None else None
+        if cards is not None:
+            return [{'id': card['id'], 'relevance_score': 0.5} for card in cards]
+        
+        since = datetime.utcnow() - timedelta(days=settings.popular_window_days)
+        layout = await event_store.alayout(db)
+        rows = (await db.execute(self._popular_stmt(since, limit, layout))).all()
+        
+        candidates = [{'id': post_id, 'relevance_score': 0.5} for post_id, _ in rows]
         
-        # Get posts ordered by relevance score
-        posts = db.query(Post, Interest).join(
-            Interest, Post.primary_interest_id == Interest.id
-        ).filter(
+        # Top up with fresh posts when there is not enough recent engagement
+        if len(candidates) < limit:
+            seen = {c['id'] for c in candidates}
+            for candidate in await self._get_fresh_candidates(db, limit):
+                if candidate['id'] not in seen:
+                    candidates.append(dict(candidate, relevance_score=0.5))
+        
+        return candidates[:limit]
+    
+    async def _get_fresh_candidates(self, db: AsyncSession, limit: int) -> List[Dict]:
+        """Get the newest posts regardless of interest"""
+        post_ids = (await db.execute(self._fresh_stmt(limit))).scalars().all()
+        
+        return [{'id': post_id, 'relevance_score': 0.3} for post_id in post_ids]
+    
+    async def _get_popular_posts(self, db: AsyncSession, limit: int) -> List[Dict]:
+        """Get popular posts as fallback"""
+        shared = await registry.aget("shared_cache")
+        cards = shared.popular_cards(limit) if shared is not None else None
+        if cards is not None:
+            # Hydrated by the shared cache leader
+            return cards
+        return await self._hydrate_posts(await self._get_popular_candidates(db, limit), db)
+    
+    async def _hydrate_posts(self, candidates: List[Dict], db: AsyncSession) -> List[Dict]:
+        """Load and format posts for candidates, keeping candidate order"""
+        if not candidates:
+            return []
+        
+        with STAGE_LATENCY.labels("hydrate").time():
+            post_ids = [candidate['id'] for candidate in candidates]
+            rows = (await db.execute(self._hydrate_stmt(post_ids))).all()
+            by_id = {post.id: (post, interest, username) for post, interest, username in rows}
+            
+            posts = []
+            for candidate in candidates:
+                if candidate['id'] not in by_id:
+                    continue
+                post, interest, username = by_id[candidate['id']]
+                formatted = self._format_post(post, interest, username, candidate['relevance_score'])
+                if 'sources' in candidate:
+                    formatted['sources'] = candidate['sources']
+                posts.append(formatted)
+        
+        return posts
+    
+    def _format_post(self, post: Post, interest: Optional[Interest], author: Optional[str],
+                     relevance_score: float) -> Dict:
+        """Format a post for API responses"""
+        return {
+            'id': post.id,
+            'title': post.title,
+            'content': post.content[:200] + '...' if len(post.content) > 200 else post.content,
+            'author': author,
+            'timestamp': post.created_at.isoformat(),
+            'primary_interest': {
+                'id': interest.id if interest else None,
+                'name': interest.name if interest else 'General',
+                'category': interest.category if interest else 'General'
+            },
+            'relevance_score': relevance_score
+        }
+    
+    # Statements for the hot read paths, kept separate from execution so they
+    # can be inspected (e.g. with EXPLAIN) without running the recommender
+    
+    def _user_interests_stmt(self, user_id: int) -> Select:
+        return select(Interest).join(
+            user_interests, Interest.id == user_interests.c.interest_id
+        ).where(
+            user_interests.c.user_id == user_id
+        )
+    
+    def _user_interest_weights_stmt(self, user_id: int) -> Select:
+        return select(
+            Interest,
+            UserInterestWeight.weight,
+            UserInterestWeight.updated_at
+        ).join(
+            UserInterestWeight, Interest.id == UserInterestWeight.interest_id
+        ).where(
+            UserInterestWeight.user_id == user_id
+        ).order_by(
+            # Ties broken by ID, as in training, so the top interest is the same one
+            desc(UserInterestWeight.weight), Interest.id
+        )
+    
+    def _user_behavior_scores_stmt(self, user_id: int) -> Select:
+        return select(UserBehaviorScore).where(UserBehaviorScore.user_id == user_id)
+    
+    def _primary_interest_stmt(self, interest_ids: List[int], limit: int) -> Select:
+        return select(Post.id, Post.primary_interest_id).where(
             Post.primary_interest_id.in_(interest_ids),
             Post.is_deleted == False
         ).order_by(
             desc(Post.created_at)
-        ).limit(limit * 2).all()
-        
-        # Calculate relevance scores for each post
-        scored_posts = []
-        for post, interest in posts:
-            interest_id = interest.id
-            relevance_score = combined_scores.get(interest_id, 0.0)
-            
-            scored_posts.append({
-                'id': post.id,
-                'title': post.title,
-                'content': post.content[:200] + '...' if len(post.content) > 200 else post.content,
-                'author': post.author.username,
-                'created_at': post.created_at.isoformat(),
-                'primary_interest': {
-                    'id': interest.id,
-                    'name': interest.name,
-                    'category': interest.category
-                },
-                'relevance_score': relevance_score
-            })
-        
-        # Sort by relevance score and return top posts
-        scored_posts.sort(key=lambda x: x['relevance_score'], reverse=True)
-        return scored_posts[:limit]
-    
-    def _get_popular_posts(self, db: Session, limit: int) -> List[Dict]:
-        """Get popular posts as fallback"""
-        posts = db.query(Post, Interest).join(
-            Interest, Post.primary_interest_id == Interest.id, isouter=True
-        ).filter(
+        ).limit(limit)
+    
+    def _secondary_interest_stmt(self, limit: int) -> Select:
+        return select(Post.id, Post.secondary_interest_ids).where(
+            Post.is_deleted == False,
+            Post.secondary_interest_ids.isnot(None)
+        ).order_by(
+            desc(Post.created_at)
+        ).limit(limit)
+    
+    def _popular_stmt(self, since: datetime, limit: int, layout: EventLayout) -> Select:
+        # Daily aggregates for compacted days, raw events (across partitions) after them
+        counts = event_store.engagement_counts(layout, since)
+        engagement = func.sum(counts.c.engagement).label('engagement')
+        return select(counts.c.post_id, engagement).join(
+            Post, Post.id == counts.c.post_id
+        ).where(
+            Post.is_deleted == False
+        ).group_by(
+            counts.c.post_id
+        ).order_by(
+            desc(engagement)
+        ).limit(limit)
+    
+    def _fresh_stmt(self, limit: int) -> Select:
+        return select(Post.id).where(
             Post.is_deleted == False
         ).order_by(
             desc(Post.created_at)
-        ).limit(limit).all()
-        
-        return [
-            {
-                'id': post.id,
-                'title': post.title,
-                'content': post.content[:200] + '...' if len(post.content) > 200 else post.content,
-                'author': post.author.username,
-                'created_at': post.created_at.isoformat(),
-                'primary_interest': {
-                    'id': interest.id if interest else None,
-                    'name': interest.name if interest else 'General',
-                    'category': interest.category if interest else 'General'
-                },
-                'relevance_score': 0.5  # Default score for popular posts
-            }
-            for post, interest in posts
-        ]
+        ).limit(limit)
+    
+    def _rank_features_stmt(self, post_ids: List[int]) -> Select:
+        return select(Post.id, Post.primary_interest_id, Post.author_id).where(
+            Post.id.in_(post_ids)
+        )
     
-    def update_user_interest_weights(self, user_id: int, interest_id: int, 
-                                   interaction_type: str, db: Session):
-        """Update user interest weights based on interactions"""
-        # Get current weight
-        weight_entry = db.query(UserInterestWeight).filter(
-            UserInterestWeight.user_id == user_id,
-            UserInterestWeight.interest_id == interest_id
-        ).first()
-        
-        if not weight_entry:
-            weight_entry = UserInterestWeight(
-                user_id=user_id,
-                interest_id=interest_id,
-                weight=1.0
-            )
-            db.add(weight_entry)
+    def _hydrate_stmt(self, post_ids: List[int]) -> Select:
+        return select(Post, Interest, User.username).join(
+            User, Post.author_id == User.id, isouter=True
+        ).join(
+            Interest, Post.primary_interest_id == Interest.id, isouter=True
+        ).where(
+            Post.id.in_(post_ids),
+            Post.is_deleted == False
+        )
+    
+    async def update_user_interest_weights(self, user_id: int, interest_id: int, 
+                                         interaction_type: str, db: AsyncSession):
+        """
+        Update user interest weights based on interactions.
         
+        Changes are flushed but not committed; the caller owns the transaction.
+        """
         # Update weight based on interaction type
-        interaction_weights = {
-            'view': 0.1,
-            'click': 0.3,
-            'upvote': 0.5,
-            'downvote': -0.3,
-            'save': 0.7,
-            'comment': 0.8,
-            'share': 1.0
-        }
+        weight_change = INTERACTION_WEIGHTS.get(interaction_type, 0.1)
+        dialect = db.get_bind().dialect.name
         
-        weight_change = interaction_weights.get(interaction_type, 0.1)
-        new_weight = max(0.1, min(5.0, weight_entry.weight + weight_change))
-        weight_entry.weight = new_weight
+        # Insert-or-update the weight in one statement, relying on the unique (user, interest) index
+        await db.execute(self._interest_weight_upsert_stmt(user_id, interest_id, weight_change, dialect))
         
-        # Update behavior score
-        behavior_score = db.query(UserBehaviorScore).filter(
+        # Update behavior score, if the user has one for this interest
+        await db.execute(self._behavior_score_update_stmt(user_id, interest_id, weight_change, dialect))
+    
+    def _interest_weight_upsert_stmt(self, user_id: int, interest_id: int,
+                                     weight_change: float, dialect: str):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        
+        now = datetime.utcnow()
+        stmt = insert(UserInterestWeight).values(
+            user_id=user_id,
+            interest_id=interest_id,
+            weight=max(0.1, min(5.0, 1.0 + weight_change)),
+            created_at=now,
+            updated_at=now
+        )
+        return stmt.on_conflict_do_update(
+            index_elements=[UserInterestWeight.user_id, UserInterestWeight.interest_id],
+            set_={
+                'weight': _clamp(UserInterestWeight.weight + weight_change, 0.1, 5.0, dialect),
+                'updated_at': now
+            }
+        )
+    
+    def _behavior_score_update_stmt(self, user_id: int, interest_id: int,
+                                    weight_change: float, dialect: str):
+        return update(UserBehaviorScore).where(
             UserBehaviorScore.user_id == user_id,
             UserBehaviorScore.interest_id == interest_id
-        ).first()
-        
-        if behavior_score:
-            behavior_score.interaction_count += 1
-            behavior_score.score = min(1.0, behavior_score.score + (weight_change * 0.1))
-            behavior_score.last_interaction = func.now()
-        
-        db.commit()
+        ).values(
+            interaction_count=UserBehaviorScore.interaction_count + 1,
+            score=_clamp(UserBehaviorScore.score + (weight_change * 0.1), None, 1.0, dialect),
+            last_interaction=datetime.utcnow()
+        ).execution_options(synchronize_session=False)
+
+def _clamp(expr, low: Optional[float], high: Optional[float], dialect: str):
+    """Clamp a SQL expression; SQLite spells GREATEST/LEAST as multi-argument MAX/MIN"""
+    greatest, least = (func.greatest, func.least) if dialect == 'postgresql' else (func.max, func.min)
+    if high is not None:
+        expr = least(expr, high)
+    if low is not None:
+        expr = greatest(expr, low)
+    return expr
 
 # Create singleton instance
-interest_recommender = InterestBasedRecommender()
\ No newline at end of file
+interest_recommender = InterestBasedRecommender()
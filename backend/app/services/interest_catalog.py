@@ -0,0 +1,129 @@
+"""
+Precomputed interest catalog responses.
+
+The interest list and category tree only change when the interests table is
+repopulated, yet every onboarding screen fetches both. The catalog builds
+their JSON bodies once, along with a content-hash ETag for each, so the
+routes can answer with stored bytes (or a 304) without touching the database
+or building response models.
+"""
+from typing import Callable, Optional
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.core.logger import logger
+from app.data.interests_data import get_interests_by_category
+from app.models import Interest
+import hashlib
+import json
+import threading
+import time
+
+class CatalogDocument:
+    """An immutable, pre-serialized JSON body and its ETag"""
+
+    __slots__ = ("body", "etag")
+
+    def __init__(self, payload):
+        self.body = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+
+    @classmethod
+    def from_body(cls, body: bytes) -> "CatalogDocument":
+        """A document from an already serialized body (e.g. the shared cache's copy)"""
+        document = cls.__new__(cls)
+        document.body = body
+        document.etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        return document
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """Whether an If-None-Match header value covers this document"""
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        # Weak comparison, as RFC 9110 requires for If-None-Match
+        return "*" in tags or any((tag[2:] if tag.startswith("W/") else tag) == self.etag for tag in tags)
+
+class InterestCatalog:
+    """The interest list and category tree as ready-to-send documents"""
+
+    def __init__(self, interests: CatalogDocument, categories: CatalogDocument):
+        self.interests = interests
+        self.categories = categories
+
+    @classmethod
+    def build(cls, db: Session) -> "InterestCatalog":
+        rows = db.execute(select(Interest).order_by(Interest.id)).scalars().all()
+        interests = [
+            {
+                "id": interest.id,
+                "name": interest.name,
+                "category": interest.category,
+                "subcategory": interest.subcategory,
+                "description": interest.description
+            }
+            for interest in rows
+        ]
+        categories = [
+            {"category": category, "subcategories": data["subcategories"]}
+            for category, data in get_interests_by_category().items()
+        ]
+        return cls(CatalogDocument(interests), CatalogDocument(categories))
+
+class InterestCatalogCache:
+    """
+    Holds the current catalog and swaps in a rebuilt one on refresh.
+
+    With a refresh interval, a request that finds the catalog older than the
+    interval starts a rebuild on a background thread and is still answered
+    from the current catalog, so requests never wait on the database.
+
+    With the cross-worker shared cache, the leader's published catalog is
+    served whenever it is current, and this worker's own copy is only the
+    fallback.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], refresh_interval: float = 0.0,
+                 shared=None):
+        self._session_factory = session_factory
+        self._refresh_interval = refresh_interval
+        self._shared = shared
+        self._refresh_lock = threading.Lock()
+        self._catalog = (shared.catalog() if shared is not None else None) or self._build()
+        self._built_at = time.monotonic()
+
+    @property
+    def catalog(self) -> InterestCatalog:
+        if self._shared is not None:
+            shared = self._shared.catalog()
+            if shared is not None:
+                return shared
+        if self._refresh_interval and time.monotonic() - self._built_at > self._refresh_interval:
+            self._refresh_in_background()
+        return self._catalog
+
+    def refresh(self) -> InterestCatalog:
+        """Rebuild now, e.g. after the interests table changes"""
+        with self._refresh_lock:
+            catalog = self._build()
+            if catalog.interests.etag != self._catalog.interests.etag:
+                logger.info(f"Interest catalog changed, new ETag {catalog.interests.etag}")
+            self._catalog = catalog
+            self._built_at = time.monotonic()
+        return catalog
+
+    def _refresh_in_background(self):
+        if self._refresh_lock.locked():
+            return
+        # Push the deadline out so only one request starts a rebuild
+        self._built_at = time.monotonic()
+        threading.Thread(target=self._safe_refresh, name="interest-catalog-refresh", daemon=True).start()
+
+    def _safe_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error(f"Failed to refresh interest catalog: {e}")
+
+    def _build(self) -> InterestCatalog:
+        with self._session_factory() as db:
+            return InterestCatalog.build(db)
@@ -0,0 +1,365 @@
+"""
+Out-of-process model inference over shared memory.
+
+Each worker process loads its own copy of the models with a pinned torch
+thread count. Callers write input arrays into a shared-memory slot, and only a
+small control tuple (slot number, array dtypes/shapes/offsets) travels over
+the worker's pipe. Workers write outputs into the slot's output buffer, so
+feature matrices and score/embedding arrays are never pickled.
+
+Every worker has its own pipe, and requests go to the live worker with the
+fewest outstanding. A worker process that dies (OOM kill, segfault) cannot
+wedge the others, as it could while holding the lock of a shared queue: its
+pipe reports EOF, the requests sent to it fail and their slots are freed, and
+new requests go to the workers left. Callers pass a timeout as well, for a
+worker that hangs without dying, and fall back to in-process inference.
+"""
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from multiprocessing import shared_memory
+from typing import Dict, List, Sequence, Tuple
+from app.core.logger import logger
+import asyncio
+import itertools
+import multiprocessing
+import multiprocessing.connection
+import queue
+import threading
+import time
+import numpy as np
+
+# Array layout descriptors: (dtype string, shape, byte offset)
+ArrayDesc = Tuple[str, Tuple[int, ...], int]
+
+ALIGNMENT = 64
+
+# How often the result dispatcher wakes up to check for close()
+DISPATCH_POLL_INTERVAL = 0.5
+
+def write_arrays(buffer: memoryview, arrays: Sequence[np.ndarray]) -> List[ArrayDesc]:
+    """Copy arrays back to back into a shared buffer and describe their layout"""
+    descs = []
+    offset = 0
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        end = offset + array.nbytes
+        if end > len(buffer):
+            raise ValueError(f"{end} bytes do not fit in a {len(buffer)} byte slot")
+        np.ndarray(array.shape, dtype=array.dtype, buffer=buffer, offset=offset)[...] = array
+        descs.append((array.dtype.str, array.shape, offset))
+        offset = (end + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+    return descs
+
+def read_arrays(buffer: memoryview, descs: Sequence[ArrayDesc]) -> List[np.ndarray]:
+    """Return views of arrays described by `descs` without copying"""
+    return [np.ndarray(shape, dtype=np.dtype(dtype), buffer=buffer, offset=offset)
+            for dtype, shape, offset in descs]
+
+def _load_handlers():
+    """Build the inference entry points available to workers"""
+    from app.services.rank_service import RankService
+    from app.services.recall_service import RecallService
+
+    rank_service = RankService()
+    recall_service = RecallService(connect_milvus=False)
+    return {
+        'rank': lambda wide, deep: [rank_service.score(wide, deep)],
+        'embed_user': lambda features: [recall_service.embed_users(features)],
+        'embed_item': lambda features: [recall_service.embed_items(features)],
+    }
+
+def _worker_main(worker_id: int, slot_names: List[Tuple[str, str]], conn, torch_threads: int):
+    try:
+        import torch
+
+        # Pin intra-op threads so workers don't oversubscribe the cores between them
+        torch.set_num_threads(torch_threads)
+        torch.set_num_interop_threads(1)
+
+        slots = [(shared_memory.SharedMemory(name=in_name), shared_memory.SharedMemory(name=out_name))
+                 for in_name, out_name in slot_names]
+        handlers = _load_handlers()
+    except Exception as e:
+        conn.send(('failed', f"{type(e).__name__}: {e}"))
+        return
+    conn.send(('ready', None))
+
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                # The pool's process went away
+                break
+            if message is None:
+                break
+
+            request_id, op, slot, descs, submitted_at = message
+            started_at = time.monotonic()
+            input_shm, output_shm = slots[slot]
+            try:
+                inputs = read_arrays(input_shm.buf, descs)
+                outputs = handlers[op](*inputs)
+                out_descs = write_arrays(output_shm.buf, outputs)
+                error = None
+            except Exception as e:
+                out_descs = None
+                error = f"{type(e).__name__}: {e}"
+            conn.send((request_id, out_descs, error,
+                       started_at - submitted_at, time.monotonic() - started_at))
+    finally:
+        for input_shm, output_shm in slots:
+            try:
+                input_shm.close()
+                output_shm.close()
+            except BufferError:
+                # An array view is still alive; the mapping goes away with the process
+                pass
+
+def _remaining(deadline):
+    return max(0.0, deadline - time.monotonic()) if deadline is not None else None
+
+class ModelWorkerPool:
+    """
+    A pool of inference worker processes fed through shared-memory slots.
+
+    The number of slots bounds in-flight requests; submitters block (or their
+    futures queue) until a slot frees up. Queue latency, the time between
+    submission and a worker picking the request up, is tracked per request.
+    """
+
+    def __init__(self, num_workers: int, torch_threads: int = 1,
+                 num_slots: int = 0, slot_bytes: int = 8 * 1024 * 1024,
+                 start_timeout: float = 120.0):
+        context = multiprocessing.get_context("spawn")
+        num_slots = num_slots or num_workers * 2
+
+        self._slots = []
+        for _ in range(num_slots):
+            self._slots.append((
+                shared_memory.SharedMemory(create=True, size=slot_bytes),
+                shared_memory.SharedMemory(create=True, size=slot_bytes)
+            ))
+        self._free_slots = queue.Queue()
+        for slot in range(num_slots):
+            self._free_slots.put(slot)
+
+        # Request ID -> (future, slot, worker ID)
+        self._pending: Dict[int, Tuple[Future, int, int]] = {}
+        self._pending_lock = threading.Lock()
+        self._request_ids = itertools.count()
+        self._queue_latencies = deque(maxlen=1000)
+        self._compute_latencies = deque(maxlen=1000)
+        self._completed = 0
+        self._failed = 0
+        self._outstanding = [0] * num_workers
+        self._dead = set()
+        self._closing = False
+
+        slot_names = [(input_shm.name, output_shm.name) for input_shm, output_shm in self._slots]
+        self._conns = []
+        # Submitters send from several threads
+        self._send_locks = [threading.Lock() for _ in range(num_workers)]
+        self._processes = []
+        for worker_id in range(num_workers):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=_worker_main,
+                args=(worker_id, slot_names, child_conn, torch_threads),
+                name=f"model-worker-{worker_id}",
+                daemon=True
+            )
+            process.start()
+            # Only the worker holds its end, so its exit shows up here as EOF
+            child_conn.close()
+            self._conns.append(parent_conn)
+            self._processes.append(process)
+
+        # Wait for every worker to load its models before accepting work
+        try:
+            self._wait_for_workers(start_timeout)
+        except Exception:
+            self._stop_workers()
+            self._release_slots()
+            raise
+
+        self._dispatcher = threading.Thread(target=self._dispatch_results, name="model-pool-results", daemon=True)
+        self._dispatcher.start()
+        logger.info(f"Started model worker pool with {num_workers} workers, {num_slots} slots, "
+                    f"{torch_threads} torch threads each")
+
+    def _wait_for_workers(self, timeout: float):
+        deadline = time.monotonic() + timeout
+        waiting = {conn: worker_id for worker_id, conn in enumerate(self._conns)}
+        while waiting:
+            ready = multiprocessing.connection.wait(list(waiting), timeout=_remaining(deadline))
+            if not ready:
+                raise RuntimeError(f"Model workers did not start within {timeout:.0f}s")
+            for conn in ready:
+                worker_id = waiting.pop(conn)
+                try:
+                    kind, error = conn.recv()
+                except EOFError:
+                    raise RuntimeError(f"Model worker {worker_id} exited during startup")
+                if kind == 'failed':
+                    raise RuntimeError(f"Model worker {worker_id} failed to start: {error}")
+                logger.info(f"Model worker {worker_id} ready")
+
+    def submit(self, op: str, arrays: Sequence[np.ndarray], timeout: float = None) -> Future:
+        """
+        Queue an inference request; the future resolves to a list of output
+        arrays. Waits up to `timeout` seconds for a free slot.
+        """
+        try:
+            slot = self._free_slots.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No free model worker slot within {timeout}s")
+        try:
+            descs = write_arrays(self._slots[slot][0].buf, arrays)
+        except Exception:
+            self._free_slots.put(slot)
+            raise
+
+        future = Future()
+        request_id = next(self._request_ids)
+        with self._pending_lock:
+            live = [worker_id for worker_id in range(len(self._processes)) if worker_id not in self._dead]
+            if not live:
+                self._free_slots.put(slot)
+                raise RuntimeError("No model workers are running")
+            worker_id = min(live, key=lambda worker_id: self._outstanding[worker_id])
+            self._outstanding[worker_id] += 1
+            self._pending[request_id] = (future, slot, worker_id)
+        try:
+            with self._send_locks[worker_id]:
+                self._conns[worker_id].send((request_id, op, slot, descs, time.monotonic()))
+        except (OSError, ValueError) as e:
+            # The worker died after it was picked; the dispatcher fails the request with it
+            logger.warning(f"Failed to send a request to model worker {worker_id}: {e}")
+        return future
+
+    def run(self, op: str, arrays: Sequence[np.ndarray], timeout: float = None) -> List[np.ndarray]:
+        """Submit and wait for the result from synchronous code, for up to `timeout` seconds in all"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        future = self.submit(op, arrays, timeout)
+        try:
+            return future.result(timeout=_remaining(deadline))
+        except FutureTimeoutError:
+            # The result is dropped when it arrives
+            future.cancel()
+            raise
+
+    async def run_async(self, op: str, arrays: Sequence[np.ndarray], timeout: float = None) -> List[np.ndarray]:
+        """Submit and await the result without blocking the event loop, for up to `timeout` seconds in all"""
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        # Waiting for a free slot may block, so do it off the loop
+        future = await loop.run_in_executor(None, self.submit, op, arrays, timeout)
+        # Timing out cancels the wrapped future, like run()
+        return await asyncio.wait_for(asyncio.wrap_future(future), _remaining(deadline))
+
+    def _dispatch_results(self):
+        while not self._closing:
+            live = {self._conns[worker_id]: worker_id
+                    for worker_id in range(len(self._processes)) if worker_id not in self._dead}
+            if not live:
+                break
+            for conn in multiprocessing.connection.wait(list(live), timeout=DISPATCH_POLL_INTERVAL):
+                worker_id = live[conn]
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    self._worker_exited(worker_id)
+                    continue
+                self._deliver(worker_id, *message)
+
+    def _deliver(self, worker_id: int, request_id: int, out_descs, error, queue_latency: float,
+                 compute_latency: float):
+        with self._pending_lock:
+            future, slot, _ = self._pending.pop(request_id)
+            self._outstanding[worker_id] -= 1
+        self._queue_latencies.append(queue_latency)
+        self._compute_latencies.append(compute_latency)
+
+        try:
+            # False when the caller timed out and cancelled it
+            if not future.set_running_or_notify_cancel():
+                return
+            if error is not None:
+                self._failed += 1
+                future.set_exception(RuntimeError(f"Model worker failed: {error}"))
+            else:
+                # Copy outputs out before the slot is reused
+                outputs = [array.copy() for array in read_arrays(self._slots[slot][1].buf, out_descs)]
+                self._completed += 1
+                future.set_result(outputs)
+        finally:
+            self._free_slots.put(slot)
+
+    def _worker_exited(self, worker_id: int):
+        """Fail the requests sent to a worker that has died, and stop sending it more"""
+        process = self._processes[worker_id]
+        process.join(timeout=1)
+        with self._pending_lock:
+            self._dead.add(worker_id)
+            lost = [(request_id, pending) for request_id, pending in self._pending.items() if pending[2] == worker_id]
+            for request_id, _ in lost:
+                del self._pending[request_id]
+            self._outstanding[worker_id] = 0
+        if self._closing:
+            return
+        logger.error(f"Model worker {worker_id} exited with code {process.exitcode}, failing {len(lost)} requests; "
+                     f"{len(self._processes) - len(self._dead)} workers left")
+        for _, (future, slot, _) in lost:
+            self._failed += 1
+            if future.set_running_or_notify_cancel():
+                future.set_exception(RuntimeError(f"Model worker {worker_id} exited with code {process.exitcode}"))
+            # The worker that held the slot is gone, so it is free again
+            self._free_slots.put(slot)
+
+    def stats(self) -> Dict:
+        """Report pool size, throughput and queue/compute latency percentiles"""
+        def percentiles(values):
+            if not values:
+                return {"p50_ms": None, "p99_ms": None}
+            values = np.asarray(values) * 1000
+            return {"p50_ms": float(np.percentile(values, 50)), "p99_ms": float(np.percentile(values, 99))}
+
+        with self._pending_lock:
+            in_flight = len(self._pending)
+        return {
+            "workers": len(self._processes),
+            "alive_workers": sum(process.is_alive() for process in self._processes),
+            "in_flight": in_flight,
+            "completed": self._completed,
+            "failed": self._failed,
+            "queue_latency": percentiles(list(self._queue_latencies)),
+            "compute_latency": percentiles(list(self._compute_latencies))
+        }
+
+    def close(self):
+        """Stop workers and release shared memory"""
+        self._closing = True
+        self._dispatcher.join(timeout=5)
+        self._stop_workers()
+        self._release_slots()
+
+    def _stop_workers(self):
+        for worker_id, conn in enumerate(self._conns):
+            try:
+                with self._send_locks[worker_id]:
+                    conn.send(None)
+            except (OSError, ValueError):
+                pass
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        for conn in self._conns:
+            conn.close()
+
+    def _release_slots(self):
+        for input_shm, output_shm in self._slots:
+            for shm in (input_shm, output_shm):
+                shm.close()
+                shm.unlink()
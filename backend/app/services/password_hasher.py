@@ -0,0 +1,107 @@
+"""
+Password hashing and verification on a dedicated, bounded thread pool.
+
+bcrypt is deliberately slow (tens of milliseconds per hash at the default
+cost). On the event loop it stalls every request on the worker; in FastAPI's
+shared threadpool a burst of sign-ups takes the threads and cores that feed
+requests need. bcrypt releases the GIL while hashing, so a small dedicated
+pool hashes in parallel while capping how many cores hashing can use.
+Requests beyond the queue bound are rejected rather than piling up.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+from passlib.context import CryptContext
+import asyncio
+import threading
+import time
+import numpy as np
+
+class PasswordHasherOverloaded(Exception):
+    """Raised when too many hash/verify calls are already queued"""
+
+class PasswordHasher:
+    """
+    Bounded executor for bcrypt hashing.
+
+    At most `max_workers` hashes run at once; at most `max_pending` calls
+    (running plus queued) are accepted. Queue wait and hash time are tracked
+    per call.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 64, rounds: int = 12):
+        self._context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hasher")
+        self._max_workers = max_workers
+        self._max_pending = max_pending
+        self._rounds = rounds
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._queue_waits = deque(maxlen=1000)
+        self._hash_times = deque(maxlen=1000)
+
+    async def hash(self, password: str) -> str:
+        """Hash a password with the configured bcrypt cost"""
+        return await self._submit(self._context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """Verify a password against a hash of any bcrypt cost"""
+        return await self._submit(self._context.verify, password, hashed_password)
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """Whether a stored hash was made with a different cost than the configured one"""
+        return self._context.needs_update(hashed_password)
+
+    async def _submit(self, fn: Callable, *args):
+        with self._lock:
+            if self._pending >= self._max_pending:
+                self._rejected += 1
+                raise PasswordHasherOverloaded(f"{self._pending} password hashes already pending")
+            self._pending += 1
+
+        submitted_at = time.monotonic()
+
+        def run():
+            started_at = time.monotonic()
+            try:
+                return fn(*args)
+            finally:
+                self._queue_waits.append(started_at - submitted_at)
+                self._hash_times.append(time.monotonic() - started_at)
+
+        future = self._executor.submit(run)
+        # Release the slot when the hash finishes, even if the awaiting request was cancelled
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future):
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+
+    def stats(self) -> Dict:
+        """Report pool size, queue depth, rejections and queue-wait/hash-time percentiles"""
+        def percentiles(values):
+            if not values:
+                return {"p50_ms": None, "p99_ms": None}
+            values = np.asarray(values) * 1000
+            return {"p50_ms": float(np.percentile(values, 50)), "p99_ms": float(np.percentile(values, 99))}
+
+        with self._lock:
+            pending = self._pending
+        return {
+            "workers": self._max_workers,
+            "bcrypt_rounds": self._rounds,
+            "running": min(pending, self._max_workers),
+            "queued": max(pending - self._max_workers, 0),
+            "max_pending": self._max_pending,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "queue_wait": percentiles(list(self._queue_waits)),
+            "hash_time": percentiles(list(self._hash_times))
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,7 +1,10 @@
 import torch
 import numpy as np
+from typing import Dict, Optional, Tuple
 from app.core.config import settings
 from app.core.logger import logger
+from app.core.metrics import FALLBACKS
+from app.services.registry import get_model_pool, registry
 import sys
 import os
 
@@ -10,6 +13,41 @@ sys.path.append(os.path.join(os.path.dirname(__file__), "../../wide-deep/src"))
 
 from model.wide_deep import WideAndDeep
 
+WIDE_DIM = 1000
+# Column order of the deep feature matrix
+DEEP_FEATURES = ('user_id', 'post_id', 'category', 'author')
+# Shared with scripts/train_models.py so that trained weights load here
+WIDE_DEEP_CONFIG = {
+    'model': {
+        'wide_dim': WIDE_DIM,
+        'embedding_dim': 8,
+        'hidden_dims': [64, 32, 16],
+        'dropout': 0.2
+    }
+}
+
+def wide_indices(user_interest: np.ndarray, post_interest: np.ndarray, author_id: np.ndarray) -> np.ndarray:
+    """
+    (n, 4) hashed WIDE_DIM buckets of the wide crosses: post interest, user
+    interest x post interest, author, user interest x author. Shared with
+    training (app.services.training_data).
+    """
+    crosses = (
+        post_interest,
+        user_interest * 1000003 + post_interest,
+        author_id,
+        user_interest * 1000003 + author_id,
+    )
+    columns = []
+    for salt, values in enumerate(crosses, start=1):
+        # splitmix64 finalizer, so neighbouring IDs land in unrelated buckets
+        x = values.astype(np.uint64) + np.uint64(salt * 0x9E3779B97F4A7C15 % 2 ** 64)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        x = x ^ (x >> np.uint64(31))
+        columns.append((x % np.uint64(WIDE_DIM)).astype(np.int64))
+    return np.stack(columns, axis=1)
+
 class RankService:
     def __init__(self):
         self.wide_deep_model = None
@@ -18,64 +56,119 @@ class RankService:
     def _load_model(self):
         """Load the Wide & Deep model"""
         try:
-            # Initialize model with config (using default values for now)
-            config = {
-                'model': {
-                    'wide_dim': 1000,
-                    'embedding_dim': 8,
-                    'hidden_dims': [64, 32, 16],
-                    'dropout': 0.2
-                }
-            }
-            
-            self.wide_deep_model = WideAndDeep(config)
+            self.wide_deep_model = WideAndDeep(WIDE_DEEP_CONFIG)
             
             # Load model weights if they exist
             if os.path.exists(settings.wide_deep_model_path):
                 self.wide_deep_model.load_state_dict(torch.load(settings.wide_deep_model_path))
                 logger.info("Loaded Wide & Deep model")
             else:
+                FALLBACKS.labels("wide_deep_weights_missing").inc()
                 logger.warning("Wide & Deep model file not found, using initialized model")
+            self.wide_deep_model.eval()
         except Exception as e:
             logger.error(f"Failed to load Wide & Deep model: {e}")
     
-    def rerank(self, user_id: str, post_ids: list) -> list:
-        """Re-rank posts using the Wide & Deep model"""
+    def models(self) -> list:
+        """The torch modules this service serves"""
+        return [self.wide_deep_model] if self.wide_deep_model is not None else []
+    
+    def build_features(self, user_id: str, post_ids: list, user_interest: int = 0,
+                       post_features: Optional[Dict[int, Tuple[int, int]]] = None):
+        """
+        Build the feature matrices for scoring posts for a user.
+        
+        `user_interest` is the user's highest-weighted interest and
+        `post_features` maps post IDs to (primary interest ID, author ID),
+        with 0 where unknown, as in training. Returns a float32
+        (n, WIDE_DIM) wide matrix, one-hot over the hashed crosses, and an
+        int64 (n, len(DEEP_FEATURES)) deep ID matrix.
+        """
+        n = len(post_ids)
+        post_features = post_features or {}
+        ids = np.array([int(post_id) for post_id in post_ids], dtype=np.int64)
+        known = [post_features.get(post_id, (0, 0)) for post_id in ids.tolist()]
+        interests = np.array([interest for interest, _ in known], dtype=np.int64).reshape(n)
+        authors = np.array([author for _, author in known], dtype=np.int64).reshape(n)
+        
+        wide_features = np.zeros((n, WIDE_DIM), dtype=np.float32)
+        buckets = wide_indices(np.full(n, user_interest, dtype=np.int64), interests, authors)
+        wide_features[np.arange(n)[:, None], buckets] = 1.0
+        deep_features = np.empty((n, len(DEEP_FEATURES)), dtype=np.int64)
+        deep_features[:, 0] = int(user_id)
+        deep_features[:, 1] = ids
+        deep_features[:, 2] = interests
+        deep_features[:, 3] = authors
+        return wide_features, deep_features
+    
+    def score(self, wide_features: np.ndarray, deep_features: np.ndarray) -> np.ndarray:
+        """Score a batch of feature rows in one forward pass"""
+        deep = {
+            name: torch.from_numpy(np.ascontiguousarray(deep_features[:, i:i + 1]))
+            for i, name in enumerate(DEEP_FEATURES)
+        }
+        with torch.no_grad():
+            scores = self.wide_deep_model(torch.from_numpy(wide_features), deep)
+        return scores.numpy().reshape(-1).astype(np.float32)
+    
+    def rerank(self, user_id: str, post_ids: list, user_interest: int = 0,
+               post_features: Optional[Dict[int, Tuple[int, int]]] = None) -> list:
+        """Re-rank posts using the Wide & Deep model (features as in build_features)"""
         try:
-            # In a real implementation, we would fetch features for each post
-            # For demo purposes, we'll create mock features and randomly shuffle
-            
-            if self.wide_deep_model:
-                # Create mock features for each post
-                reranked_posts = []
-                for post_id in post_ids:
-                    # Create mock features
-                    wide_features = torch.randn(1, 1000)  # Mock wide features
-                    deep_features = {
-                        'user_id': torch.tensor([[int(user_id)]]),
-                        'post_id': torch.tensor([[int(post_id)]]),
-                        'category': torch.tensor([[1]]),  # Mock category
-                        'author': torch.tensor([[123]])   # Mock author ID
-                    }
-                    
-                    # Get prediction score
-                    with torch.no_grad():
-                        score = self.wide_deep_model(wide_features, deep_features)
-                        reranked_posts.append((post_id, score.item()))
+            if self.wide_deep_model and post_ids:
+                wide_features, deep_features = self.build_features(user_id, post_ids, user_interest, post_features)
                 
-                # Sort by score (descending)
-                reranked_posts.sort(key=lambda x: x[1], reverse=True)
-                return [post_id for post_id, score in reranked_posts]
-            else:
+                # Run inference out of process when the model worker pool is enabled
+                pool = get_model_pool()
+                scores = None
+                if pool is not None:
+                    try:
+                        scores, = pool.run('rank', [wide_features, deep_features],
+                                           timeout=settings.model_worker_timeout)
+                    except Exception as e:
+                        FALLBACKS.labels("model_pool_error").inc()
+                        logger.warning(f"Model worker pool failed, scoring in process: {e}")
+                if scores is None:
+                    scores = self.score(wide_features, deep_features)
+                
+                return self._order_by_scores(post_ids, scores)
+            elif not self.wide_deep_model:
                 # Fallback: randomly shuffle posts
+                FALLBACKS.labels("rank_model_missing").inc()
                 logger.warning("Wide & Deep model not available, randomly shuffling posts")
                 import random
                 random.shuffle(post_ids)
-                return post_ids
+            return post_ids
         except Exception as e:
+            FALLBACKS.labels("rerank_error").inc()
             logger.error(f"Failed to re-rank posts: {e}")
             # Fallback: return original order
             return post_ids
-
-# Create a singleton instance
-rank_service = RankService()
\ No newline at end of file
+    
+    async def rerank_async(self, user_id: str, post_ids: list, user_interest: int = 0,
+                           post_features: Optional[Dict[int, Tuple[int, int]]] = None) -> list:
+        """Re-rank posts without blocking the event loop on model inference"""
+        from fastapi.concurrency import run_in_threadpool
+        pool = await registry.aget("model_pool")
+        if pool is None or not self.wide_deep_model or not post_ids:
+            return await run_in_threadpool(self.rerank, user_id, post_ids, user_interest, post_features)
+        
+        try:
+            wide_features, deep_features = self.build_features(user_id, post_ids, user_interest, post_features)
+            try:
+                scores, = await pool.run_async('rank', [wide_features, deep_features],
+                                               timeout=settings.model_worker_timeout)
+            except Exception as e:
+                FALLBACKS.labels("model_pool_error").inc()
+                logger.warning(f"Model worker pool failed, scoring in process: {e}")
+                scores = await run_in_threadpool(self.score, wide_features, deep_features)
+            return self._order_by_scores(post_ids, scores)
+        except Exception as e:
+            FALLBACKS.labels("rerank_error").inc()
+            logger.error(f"Failed to re-rank posts: {e}")
+            return post_ids
+    
+    def _order_by_scores(self, post_ids: list, scores: np.ndarray) -> list:
+        # Sort by score (descending); stable for equal scores
+        order = np.argsort(-scores, kind='stable')
+        return [post_ids[i] for i in order]
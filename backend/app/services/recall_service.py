@@ -3,6 +3,9 @@ import numpy as np
 from pymilvus import connections, Collection
 from app.core.config import settings
 from app.core.logger import logger
+from app.core.metrics import FALLBACKS
+from app.services.registry import get_model_pool
+from app.services.vector_index import get_search_params
 import sys
 import os
 
@@ -11,11 +14,28 @@ sys.path.append(os.path.join(os.path.dirname(__file__), "../../wide-deep/src"))
 
 from recall.two_tower import TwoTowerModel
 
+# Column order of the user and item feature matrices
+USER_FEATURES = ('user_id', 'age', 'gender', 'interests')
+ITEM_FEATURES = ('post_id', 'category', 'author_id')
+# Users have no age or gender yet; training fills in the same values
+DEFAULT_AGE = 25
+DEFAULT_GENDER = 1
+# Shared with scripts/train_models.py so that trained weights load here
+TWO_TOWER_CONFIG = {
+    'recall': {
+        'embedding_dim': 64,
+        'user_tower_hidden_dims': [128, 64],
+        'item_tower_hidden_dims': [128, 64],
+        'dropout': 0.2
+    }
+}
+
 class RecallService:
-    def __init__(self):
+    def __init__(self, connect_milvus: bool = True):
         self.milvus_collection = None
         self.two_tower_model = None
-        self._init_milvus()
+        if connect_milvus:
+            self._init_milvus()
         self._load_model()
     
     def _init_milvus(self):
@@ -35,60 +55,85 @@ class RecallService:
     def _load_model(self):
         """Load the Two-Tower model"""
         try:
-            # Initialize model with config (using default values for now)
-            config = {
-                'recall': {
-                    'embedding_dim': 64,
-                    'user_tower_hidden_dims': [128, 64],
-                    'item_tower_hidden_dims': [128, 64],
-                    'dropout': 0.2
-                }
-            }
-            
-            self.two_tower_model = TwoTowerModel(config)
+            self.two_tower_model = TwoTowerModel(TWO_TOWER_CONFIG)
             
             # Load model weights if they exist
             if os.path.exists(settings.two_tower_model_path):
                 self.two_tower_model.load_state_dict(torch.load(settings.two_tower_model_path))
                 logger.info("Loaded Two-Tower model")
             else:
+                FALLBACKS.labels("two_tower_weights_missing").inc()
                 logger.warning("Two-Tower model file not found, using initialized model")
+            self.two_tower_model.eval()
         except Exception as e:
             logger.error(f"Failed to load Two-Tower model: {e}")
     
-    def get_user_embedding(self, user_id: str) -> np.ndarray:
+    def models(self) -> list:
+        """The torch modules this service serves"""
+        return [self.two_tower_model] if self.two_tower_model is not None else []
+    
+    def after_fork(self):
+        """Connect to Milvus in a worker forked from a master that preloaded the model"""
+        if self.milvus_collection is None:
+            self._init_milvus()
+    
+    def build_user_features(self, user_id: str, user_interest: int = 0) -> np.ndarray:
+        """
+        Build the int64 (1, len(USER_FEATURES)) feature row for a user, whose
+        highest-weighted interest is `user_interest` (0 if none)
+        """
+        return np.array([[int(user_id), DEFAULT_AGE, DEFAULT_GENDER, user_interest]], dtype=np.int64)
+    
+    def embed_users(self, user_features: np.ndarray) -> np.ndarray:
+        """Run the user tower over a batch of feature rows"""
+        features = {
+            name: torch.from_numpy(np.ascontiguousarray(user_features[:, i]))
+            for i, name in enumerate(USER_FEATURES)
+        }
+        with torch.no_grad():
+            return self.two_tower_model.forward_user_tower(features).numpy().astype(np.float32)
+    
+    def embed_items(self, item_features: np.ndarray) -> np.ndarray:
+        """Run the item tower over a batch of (post_id, category, author_id) rows"""
+        features = {
+            name: torch.from_numpy(np.ascontiguousarray(item_features[:, i]))
+            for i, name in enumerate(ITEM_FEATURES)
+        }
+        with torch.no_grad():
+            return self.two_tower_model.forward_item_tower(features).numpy().astype(np.float32)
+    
+    def get_user_embedding(self, user_id: str, user_interest: int = 0) -> np.ndarray:
         """Generate user embedding using the Two-Tower model"""
         try:
-            # In a real implementation, we would fetch user features from database
-            # For demo purposes, we'll create mock features
-            user_features = {
-                'user_id': torch.tensor([int(user_id)]),
-                'age': torch.tensor([25]),  # Mock age
-                'gender': torch.tensor([1]),  # Mock gender (1=male, 0=female)
-                'interests': torch.tensor([5])  # Mock interests category
-            }
+            user_features = self.build_user_features(user_id, user_interest)
             
-            # Get user embedding
-            with torch.no_grad():
-                user_embedding = self.two_tower_model.forward_user_tower(user_features)
-                return user_embedding.numpy().flatten()
+            # Run inference out of process when the model worker pool is enabled
+            pool = get_model_pool()
+            embeddings = None
+            if pool is not None:
+                try:
+                    embeddings, = pool.run('embed_user', [user_features], timeout=settings.model_worker_timeout)
+                except Exception as e:
+                    FALLBACKS.labels("model_pool_error").inc()
+                    logger.warning(f"Model worker pool failed, embedding in process: {e}")
+            if embeddings is None:
+                embeddings = self.embed_users(user_features)
+            return embeddings.flatten()
         except Exception as e:
+            FALLBACKS.labels("user_embedding_error").inc()
             logger.error(f"Failed to generate user embedding: {e}")
             # Return a random embedding as fallback
             return np.random.rand(64)
     
-    def get_candidates(self, user_id: str, limit: int = 20) -> list:
+    def get_candidates(self, user_id: str, limit: int = 20, user_interest: int = 0) -> list:
         """Get candidate posts using Milvus vector search"""
         try:
             # Get user embedding
-            user_embedding = self.get_user_embedding(user_id)
+            user_embedding = self.get_user_embedding(user_id, user_interest)
             
             # Search in Milvus
             if self.milvus_collection:
-                search_params = {
-                    "metric_type": "IP",
-                    "params": {"nprobe": 10},
-                }
+                search_params = get_search_params()
                 
                 results = self.milvus_collection.search(
                     data=[user_embedding.tolist()],
@@ -107,13 +152,12 @@ class RecallService:
                 
                 return post_ids
             else:
-                # Fallback: return random post IDs
-                logger.warning("Milvus not available, returning mock post IDs")
-                return list(range(1, min(limit + 1, 101)))  # Return IDs 1-20 or less
+                # No candidates rather than placeholder IDs, which would outrank
+                # every real source once merged
+                FALLBACKS.labels("milvus_unavailable").inc()
+                logger.warning("Milvus not available, skipping vector recall")
+                return []
         except Exception as e:
+            FALLBACKS.labels("milvus_error").inc()
             logger.error(f"Failed to get candidates from Milvus: {e}")
-            # Fallback: return random post IDs
-            return list(range(1, min(limit + 1, 101)))
-
-# Create a singleton instance
-recall_service = RecallService()
\ No newline at end of file
+            return []
@@ -0,0 +1,240 @@
+from typing import Any, Callable, Dict, Iterable, Optional
+from app.core.logger import logger
+import threading
+import time
+
+class ServiceRegistry:
+    """
+    Lazily constructed, process-wide shared services.
+
+    Each service is built at most once, on first use or during warmup, under
+    its own lock so that concurrent first callers wait for a single
+    initialization instead of racing to build duplicates. Heavy imports
+    (torch, pymilvus) belong inside the factories so that modules which only
+    reference the registry stay cheap to import.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._timings: Dict[str, float] = {}
+        self._errors: Dict[str, str] = {}
+        self._warmup_thread: Optional[threading.Thread] = None
+        self._warmup_seconds: Optional[float] = None
+        # Set while building services in a process that is about to fork
+        self.preloading = False
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        """Register a factory; the service is not built until requested"""
+        self._factories[name] = factory
+        self._locks[name] = threading.Lock()
+
+    def get(self, name: str) -> Any:
+        """Return the shared instance, building it on first use"""
+        # Services may legitimately be None (e.g. a disabled feature), so test membership
+        if name in self._instances:
+            return self._instances[name]
+
+        with self._locks[name]:
+            if name in self._instances:
+                instance = self._instances[name]
+            else:
+                start = time.perf_counter()
+                try:
+                    instance = self._factories[name]()
+                except Exception as e:
+                    self._errors[name] = str(e)
+                    logger.error(f"Failed to initialize service '{name}': {e}")
+                    raise
+                self._timings[name] = time.perf_counter() - start
+                self._errors.pop(name, None)
+                self._instances[name] = instance
+                logger.info(f"Initialized service '{name}' in {self._timings[name]:.2f}s")
+        return instance
+
+    async def aget(self, name: str) -> Any:
+        """Return the shared instance without blocking the event loop while it is built"""
+        if name in self._instances:
+            return self._instances[name]
+        from fastapi.concurrency import run_in_threadpool
+        return await run_in_threadpool(self.get, name)
+
+    def is_ready(self, name: str) -> bool:
+        return name in self._instances
+
+    def warmup(self, names: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        """Build services eagerly and return their initialization times"""
+        start = time.perf_counter()
+        for name in names or list(self._factories):
+            try:
+                self.get(name)
+            except Exception:
+                # Already recorded; readiness reports it
+                pass
+        self._warmup_seconds = time.perf_counter() - start
+        logger.info(f"Service warmup finished in {self._warmup_seconds:.2f}s")
+        return dict(self._timings)
+
+    def start_warmup(self, names: Optional[Iterable[str]] = None):
+        """Warm services on a background thread so lightweight routes can serve meanwhile"""
+        if self._warmup_thread is not None:
+            return
+        self._warmup_thread = threading.Thread(
+            target=self.warmup, args=(names,), name="service-warmup", daemon=True
+        )
+        self._warmup_thread.start()
+
+    def preload(self, names: Iterable[str]) -> Dict[str, float]:
+        """
+        Build services in a master process before it forks workers. Factories
+        see `preloading` set and must not open connections or start threads,
+        which do not survive a fork; `after_fork` opens them in each worker.
+        """
+        self.preloading = True
+        try:
+            return self.warmup(names)
+        finally:
+            self.preloading = False
+
+    def after_fork(self):
+        """Let preloaded services open their connections in a forked worker"""
+        for name, instance in list(self._instances.items()):
+            after_fork = getattr(instance, "after_fork", None)
+            if after_fork is None:
+                continue
+            try:
+                after_fork()
+            except Exception as e:
+                logger.error(f"Failed to reinitialize service '{name}' after fork: {e}")
+
+    def close(self):
+        """Release services that hold processes, connections or shared memory"""
+        for name, instance in list(self._instances.items()):
+            close = getattr(instance, "close", None)
+            if close is None:
+                continue
+            try:
+                close()
+            except Exception as e:
+                logger.error(f"Failed to close service '{name}': {e}")
+
+    def readiness(self, lazy: bool = False) -> Dict:
+        """
+        Report per-service readiness, errors and startup timings. With `lazy`,
+        services are only built on first use, so ones not built yet do not
+        hold readiness back; failed ones still do.
+        """
+        services = {}
+        for name in self._factories:
+            if name in self._instances:
+                state = "ready"
+            elif name in self._errors:
+                state = "failed"
+            elif self._locks[name].locked():
+                state = "initializing"
+            else:
+                state = "pending"
+            services[name] = {
+                "status": state,
+                "init_seconds": self._timings.get(name),
+                "error": self._errors.get(name)
+            }
+        return {
+            "ready": all(
+                service["status"] == "ready" or (lazy and service["status"] != "failed")
+                for service in services.values()
+            ),
+            "warmup_seconds": self._warmup_seconds,
+            "services": services
+        }
+
+def _create_recall_service():
+    from app.services.recall_service import RecallService
+    # A preloading master connects to Milvus in each worker instead (see after_fork)
+    return RecallService(connect_milvus=not registry.preloading)
+
+def _create_rank_service():
+    from app.services.rank_service import RankService
+    return RankService()
+
+def _create_model_pool():
+    from app.core.config import settings
+    if settings.model_worker_processes <= 0:
+        return None
+    from app.services.model_worker_pool import ModelWorkerPool
+    return ModelWorkerPool(
+        num_workers=settings.model_worker_processes,
+        torch_threads=settings.model_worker_torch_threads,
+        num_slots=settings.model_worker_slots,
+        slot_bytes=settings.model_worker_slot_bytes
+    )
+
+def _create_shared_cache():
+    from app.core.config import settings
+    if not settings.shared_cache_enabled:
+        return None
+    from app.db.session import ReadSessionLocal
+    from app.services.shared_cache import SegmentStore, SharedFeedCache, default_directory
+    try:
+        store = SegmentStore(settings.shared_cache_dir or default_directory(), settings.shared_cache_check_interval)
+    except OSError as e:
+        # Serve from the database rather than failing every feed request
+        logger.error(f"Shared cache disabled: {e}")
+        return None
+    cache = SharedFeedCache(
+        store,
+        ReadSessionLocal,
+        refresh_interval=settings.shared_cache_refresh_seconds,
+        max_age=settings.shared_cache_max_age,
+        popular_size=settings.shared_cache_popular_size,
+        recency_size=settings.shared_cache_recency_size
+    )
+    cache.start()
+    return cache
+
+def _create_interest_catalog():
+    from app.core.config import settings
+    from app.db.session import ReadSessionLocal
+    from app.services.interest_catalog import InterestCatalogCache
+    return InterestCatalogCache(ReadSessionLocal, refresh_interval=settings.interest_catalog_refresh_seconds,
+                                shared=registry.get("shared_cache"))
+
+def _create_password_hasher():
+    from app.core.config import settings
+    from app.services.password_hasher import PasswordHasher
+    return PasswordHasher(
+        max_workers=settings.password_hash_workers,
+        max_pending=settings.password_hash_max_pending,
+        rounds=settings.bcrypt_rounds
+    )
+
+# Create the shared registry
+registry = ServiceRegistry()
+# Warmup builds services in registration order, so cheap ones come first
+registry.register("shared_cache", _create_shared_cache)
+registry.register("interest_catalog", _create_interest_catalog)
+registry.register("model_pool", _create_model_pool)
+registry.register("recall", _create_recall_service)
+registry.register("rank", _create_rank_service)
+registry.register("password_hasher", _create_password_hasher)
+
+def get_recall_service():
+    return registry.get("recall")
+
+def get_rank_service():
+    return registry.get("rank")
+
+def get_shared_cache():
+    """Return the cross-worker feed cache, or None when it is disabled"""
+    return registry.get("shared_cache")
+
+def get_interest_catalog():
+    return registry.get("interest_catalog")
+
+def get_password_hasher():
+    return registry.get("password_hasher")
+
+def get_model_pool():
+    """Return the out-of-process inference pool, or None when inference runs in-process"""
+    return registry.get("model_pool")
@@ -0,0 +1,323 @@
+"""
+Cross-worker cache of precomputed feed data, in memory-mapped files.
+
+Every API worker used to compute the popular feed and the interest catalog
+on its own and keep its own copy. With the shared cache, one worker -- the
+leader, whichever holds an exclusive flock on `leader.lock` -- rebuilds them
+every `shared_cache_refresh_seconds` and publishes three segments:
+
+- popular: the hydrated top-N popular feed cards
+- recency: the newest post IDs of every interest, with their timestamps
+- catalog: the interest list and category JSON bodies
+
+A segment is a file written in full under a temporary name and renamed
+over the previous one, so publishing is an atomic swap: readers never see
+a partial segment and never take a lock. Each worker maps the current
+file read-only and decodes each part once per version; a reader still
+holding an older mapping keeps a valid (unlinked) file until it lets go.
+Workers re-check for a new version at most every
+`shared_cache_check_interval` seconds (one stat call).
+
+If the leader exits, the kernel releases its lock and another worker's
+refresher takes over on its next attempt. Segments older than
+`shared_cache_max_age` are ignored, so a stuck leader makes readers fall
+back to the database instead of serving stale feeds.
+
+The default directory is under /dev/shm (RAM-backed on Linux), keyed by
+the database URL so that apps on different databases do not share it.
+"""
+from datetime import datetime, timedelta
+from heapq import merge
+from itertools import islice
+from typing import Callable, Dict, Iterable, List, Optional
+from sqlalchemy import desc, select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import CACHE_REQUESTS
+from app.core.serialization import dumps, loads
+from app.models import Interest, Post
+from app.services.event_store import event_store
+from app.services.interest_catalog import CatalogDocument, InterestCatalog
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # not POSIX: every worker refreshes its own copy
+    fcntl = None
+
+MAGIC = b"RADDITSC"
+_HEADER_LENGTH = struct.Struct("<I")
+
+def default_directory() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    key = hashlib.sha1(settings.database_url.encode()).hexdigest()[:12]
+    return os.path.join(base, f"raddit-cache-{key}")
+
+class Segment:
+    """A published segment, mapped read-only: named binary parts plus a version"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.identity = (stat.st_ino, stat.st_mtime_ns)
+        view = memoryview(self._map)
+        if view[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a shared cache segment")
+        start = len(MAGIC) + _HEADER_LENGTH.size
+        (header_length,) = _HEADER_LENGTH.unpack_from(view, len(MAGIC))
+        header = json.loads(bytes(view[start:start + header_length]))
+        self.version: int = header["version"]
+        self.created_at: float = header["created_at"]
+        payload = view[start + header_length:]
+        self._parts = {name: payload[offset:offset + length] for name, (offset, length) in header["parts"].items()}
+        self._decoded: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.created_at
+
+    def part(self, name: str) -> memoryview:
+        """A part's bytes, as a view into the shared mapping"""
+        return self._parts[name]
+
+    def decoded(self, key: str, decode: Callable[["Segment"], object]):
+        """`decode(segment)`, computed once per segment version in this process"""
+        value = self._decoded.get(key)
+        if value is None:
+            with self._lock:
+                value = self._decoded.get(key)
+                if value is None:
+                    value = decode(self)
+                    self._decoded[key] = value
+        return value
+
+class _Mapped:
+    __slots__ = ("segment", "checked_at")
+
+    def __init__(self, segment: Optional[Segment], checked_at: float):
+        self.segment = segment
+        self.checked_at = checked_at
+
+class SegmentStore:
+    """Publishes and maps segment files in one directory"""
+
+    def __init__(self, directory: str, check_interval: float):
+        self.directory = directory
+        self.check_interval = check_interval
+        self._mapped: Dict[str, _Mapped] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.seg")
+
+    def publish(self, key: str, parts: Dict[str, bytes]) -> int:
+        """Write a new version of a segment and swap it in atomically; returns the version"""
+        current = self.get(key, recheck=True)
+        version = current.version + 1 if current is not None else 1
+
+        offsets, offset = {}, 0
+        for name, data in parts.items():
+            offsets[name] = [offset, len(data)]
+            offset += len(data)
+        header = json.dumps({"version": version, "created_at": time.time(), "parts": offsets}).encode()
+
+        tmp = f"{self.path(key)}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(MAGIC)
+            f.write(_HEADER_LENGTH.pack(len(header)))
+            f.write(header)
+            for data in parts.values():
+                f.write(data)
+        os.replace(tmp, self.path(key))
+        return version
+
+    def get(self, key: str, recheck: bool = False) -> Optional[Segment]:
+        """The current segment, re-checking the file at most every `check_interval` seconds"""
+        now = time.monotonic()
+        mapped = self._mapped.get(key)
+        if mapped is not None and not recheck and now - mapped.checked_at < self.check_interval:
+            return mapped.segment
+
+        segment = mapped.segment if mapped is not None else None
+        try:
+            stat = os.stat(self.path(key))
+            if segment is None or segment.identity != (stat.st_ino, stat.st_mtime_ns):
+                segment = Segment(self.path(key))
+        except FileNotFoundError:
+            segment = None
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to map shared cache segment '{key}': {e}")
+        # The previous mapping is released when the last reader drops it
+        self._mapped[key] = _Mapped(segment, now)
+        return segment
+
+class SharedFeedCache:
+    """
+    Popular feed, per-interest recency lists and the interest catalog, shared
+    by all workers on a host. Readers return None when the data is missing
+    or stale, and callers fall back to the database.
+    """
+
+    def __init__(self, store: SegmentStore, session_factory: Callable[[], Session],
+                 refresh_interval: float, max_age: float, popular_size: int, recency_size: int):
+        self.store = store
+        self._session_factory = session_factory
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self.popular_size = popular_size
+        self.recency_size = recency_size
+        self.is_leader = False
+        self._lock_file = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # Reads
+
+    def _fresh(self, key: str) -> Optional[Segment]:
+        segment = self.store.get(key)
+        if segment is None or segment.age > self.max_age:
+            CACHE_REQUESTS.labels(f"shared_{key}", "miss").inc()
+            return None
+        CACHE_REQUESTS.labels(f"shared_{key}", "hit").inc()
+        return segment
+
+    def popular_cards(self, limit: int) -> Optional[List[Dict]]:
+        """The top `limit` popular feed cards, or None to compute them from the database"""
+        if limit > self.popular_size:
+            return None
+        segment = self._fresh("popular")
+        if segment is None:
+            return None
+        return [dict(card) for card in segment.decoded("cards", lambda segment: loads(segment.part("cards")))[:limit]]
+
+    def recent_post_ids(self, interest_ids: Iterable[int], limit: int) -> Optional[List[tuple]]:
+        """
+        The newest `limit` (post_id, interest_id) pairs across interests, as
+        `_primary_interest_stmt` would return them, or None to query instead.
+        """
+        if limit > self.recency_size:
+            return None
+        segment = self._fresh("recency")
+        if segment is None:
+            return None
+        lists = segment.decoded("posts", _decode_recency)
+        # Each list is newest first; merging them and taking `limit` matches one query over all interests
+        streams = [_tagged(lists.get(interest_id, ()), interest_id) for interest_id in set(interest_ids)]
+        return [(post_id, interest_id) for _, post_id, interest_id
+                in islice(merge(*streams, key=lambda item: item[0], reverse=True), limit)]
+
+    def catalog(self) -> Optional[InterestCatalog]:
+        segment = self._fresh("catalog")
+        if segment is None:
+            return None
+        return segment.decoded("catalog", lambda segment: InterestCatalog(
+            CatalogDocument.from_body(bytes(segment.part("interests"))),
+            CatalogDocument.from_body(bytes(segment.part("categories")))
+        ))
+
+    # Leader election and refresh
+
+    def start(self):
+        """Start competing for leadership on a background thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="shared-cache-refresh", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self.is_leader or self._try_lead():
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.error(f"Shared cache refresh failed: {e}")
+            self._stop.wait(self.refresh_interval)
+
+    def _try_lead(self) -> bool:
+        if fcntl is None:
+            self.is_leader = True
+            return True
+        lock_file = open(os.path.join(self.store.directory, "leader.lock"), "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        self.is_leader = True
+        logger.info(f"Worker {os.getpid()} is now the shared cache leader")
+        return True
+
+    def refresh(self):
+        """Rebuild and publish every segment"""
+        start = time.perf_counter()
+        with self._session_factory() as db:
+            cards = self._build_popular(db)
+            recency = self._build_recency(db)
+            catalog = InterestCatalog.build(db)
+        versions = {
+            "popular": self.store.publish("popular", {"cards": dumps(cards)}),
+            "recency": self.store.publish("recency", {"posts": dumps(recency)}),
+            "catalog": self.store.publish("catalog", {
+                "interests": catalog.interests.body,
+                "categories": catalog.categories.body,
+            }),
+        }
+        logger.info(f"Published shared cache {versions} in {time.perf_counter() - start:.2f}s")
+
+    def _build_popular(self, db: Session) -> List[Dict]:
+        # Mirrors InterestBasedRecommender._get_popular_candidates and _hydrate_posts
+        from app.services.interest_based_recommender import interest_recommender as recommender
+        since = datetime.utcnow() - timedelta(days=settings.popular_window_days)
+        layout = event_store.layout(db)
+        post_ids = [post_id for post_id, _ in db.execute(recommender._popular_stmt(since, self.popular_size, layout))]
+        if len(post_ids) < self.popular_size:
+            seen = set(post_ids)
+            post_ids += [post_id for post_id in db.execute(recommender._fresh_stmt(self.popular_size)).scalars()
+                         if post_id not in seen]
+        post_ids = post_ids[:self.popular_size]
+        if not post_ids:
+            return []
+
+        by_id = {post.id: (post, interest, username)
+                 for post, interest, username in db.execute(recommender._hydrate_stmt(post_ids))}
+        return [recommender._format_post(*by_id[post_id], 0.5) for post_id in post_ids if post_id in by_id]
+
+    def _build_recency(self, db: Session) -> Dict[str, List]:
+        # One indexed scan per interest (ix_posts_interest_feed) rather than a window over all posts
+        lists = {}
+        for interest_id in db.execute(select(Interest.id)).scalars():
+            rows = db.execute(
+                select(Post.id, Post.created_at).where(
+                    Post.primary_interest_id == interest_id,
+                    Post.is_deleted == False
+                ).order_by(desc(Post.created_at)).limit(self.recency_size)
+            ).all()
+            if rows:
+                lists[str(interest_id)] = [[post_id, created_at.timestamp()] for post_id, created_at in rows]
+        return lists
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+        self.is_leader = False
+
+def _tagged(posts: List, interest_id: int):
+    for post_id, created in posts:
+        yield created, post_id, interest_id
+
+def _decode_recency(segment: Segment) -> Dict[int, List]:
+    return {int(interest_id): posts for interest_id, posts in loads(segment.part("posts")).items()}
@@ -0,0 +1,246 @@
+"""
+Training examples for the Wide & Deep and Two-Tower models.
+
+Examples come from the event store's daily counts (app.services.event_store),
+read through a server-side cursor in chunks and aggregated per (user, post):
+
+- label 1: the user clicked, upvoted, saved, commented on or shared the post
+  and never downvoted it
+- label 0: the user only viewed it, or downvoted it
+- label 0: `negatives` posts drawn uniformly from the live posts for every
+  positive, standing in for the posts the user was never shown
+
+Each example carries the features serving builds (RankService.build_features,
+RecallService.build_user_features): the post's primary interest and author
+(the item features populate_milvus.py embeds) and the user's
+highest-weighted interest. Feature tables are loaded once, also in
+chunks, and joined in memory so negatives get the same lookup.
+
+Examples are written shuffled into fixed-size .npy shards of EXAMPLE_DTYPE
+records with a manifest.json; ShardDataset memory-maps them, so DataLoader
+workers share the page cache instead of each holding a copy.
+"""
+from typing import Dict, Iterator, List, Optional, Tuple
+from datetime import date
+import json
+import os
+
+import numpy as np
+import torch
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+from torch.utils.data import IterableDataset, get_worker_info
+
+from app.models import Post, UserInterestWeight
+from app.services.event_store import event_store
+from app.services.rank_service import wide_indices
+
+POSITIVE_EVENTS = ('click', 'upvote', 'save', 'comment', 'share')
+NEGATIVE_EVENTS = ('downvote',)
+
+EXAMPLE_DTYPE = np.dtype([
+    ('user_id', '<i8'),
+    ('post_id', '<i8'),
+    ('user_interest', '<i8'),
+    ('post_interest', '<i8'),
+    ('author_id', '<i8'),
+    ('label', '<f4'),
+])
+
+MANIFEST = "manifest.json"
+
+class FeatureTables:
+    """Post and user features as dense arrays indexed by ID; -1 marks a missing post"""
+
+    def __init__(self, post_ids: np.ndarray, post_interest: np.ndarray, post_author: np.ndarray,
+                 user_interest: np.ndarray):
+        self.post_ids = post_ids
+        self.post_interest = post_interest
+        self.post_author = post_author
+        self.user_interest = user_interest
+
+    @classmethod
+    def load(cls, db: Session, chunk_size: int) -> "FeatureTables":
+        ids, interests, authors = [], [], []
+        rows = db.execute(
+            select(Post.id, Post.primary_interest_id, Post.author_id)
+            .where(Post.is_deleted == False)
+            .execution_options(yield_per=chunk_size)
+        )
+        for partition in rows.partitions():
+            ids.append(np.array([row[0] for row in partition], dtype=np.int64))
+            interests.append(np.array([row[1] or 0 for row in partition], dtype=np.int64))
+            authors.append(np.array([row[2] or 0 for row in partition], dtype=np.int64))
+        post_ids = np.concatenate(ids) if ids else np.empty(0, dtype=np.int64)
+        size = int(post_ids.max()) + 1 if len(post_ids) else 1
+        post_interest = np.full(size, -1, dtype=np.int64)
+        post_author = np.zeros(size, dtype=np.int64)
+        if len(post_ids):
+            post_interest[post_ids] = np.concatenate(interests)
+            post_author[post_ids] = np.concatenate(authors)
+
+        # The first row per user is their highest-weighted interest, ties
+        # broken by ID as in the recommender
+        top: Dict[int, int] = {}
+        rows = db.execute(
+            select(UserInterestWeight.user_id, UserInterestWeight.interest_id)
+            .order_by(UserInterestWeight.user_id, UserInterestWeight.weight.desc(), UserInterestWeight.interest_id)
+            .execution_options(yield_per=chunk_size)
+        )
+        for partition in rows.partitions():
+            for user_id, interest_id in partition:
+                top.setdefault(user_id, interest_id)
+        user_interest = np.zeros(max(top, default=0) + 1, dtype=np.int64)
+        for user_id, interest_id in top.items():
+            user_interest[user_id] = interest_id or 0
+
+        return cls(post_ids, post_interest, post_author, user_interest)
+
+    def examples(self, user_ids: np.ndarray, post_ids: np.ndarray, labels: np.ndarray) -> np.ndarray:
+        """EXAMPLE_DTYPE records for the pairs whose post is still live"""
+        in_range = post_ids < len(self.post_interest)
+        user_ids, post_ids, labels = user_ids[in_range], post_ids[in_range], labels[in_range]
+        live = self.post_interest[post_ids] >= 0
+        user_ids, post_ids, labels = user_ids[live], post_ids[live], labels[live]
+
+        records = np.empty(len(post_ids), dtype=EXAMPLE_DTYPE)
+        records['user_id'] = user_ids
+        records['post_id'] = post_ids
+        known = user_ids < len(self.user_interest)
+        records['user_interest'] = np.where(known, self.user_interest[np.where(known, user_ids, 0)], 0)
+        records['post_interest'] = self.post_interest[post_ids]
+        records['author_id'] = self.post_author[post_ids]
+        records['label'] = labels
+        return records
+
+def labeled_pairs(db: Session, chunk_size: int,
+                  since: Optional[date] = None) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Yield (user_ids, post_ids, labels) chunks, one row per interacted (user, post)"""
+    layout = event_store.load_layout(db)
+    counts = event_store.daily_counts(layout, db.get_bind().dialect.name, since=since)
+    positive = func.sum(case((counts.c.event_type.in_(POSITIVE_EVENTS), counts.c.count), else_=0))
+    negative = func.sum(case((counts.c.event_type.in_(NEGATIVE_EVENTS), counts.c.count), else_=0))
+    rows = db.execute(
+        select(counts.c.user_id, counts.c.post_id, positive, negative)
+        .group_by(counts.c.user_id, counts.c.post_id)
+        .execution_options(yield_per=chunk_size)
+    )
+    for partition in rows.partitions():
+        pairs = np.array(partition, dtype=np.int64).reshape(-1, 4)
+        labels = ((pairs[:, 2] > 0) & (pairs[:, 3] == 0)).astype(np.float32)
+        yield pairs[:, 0], pairs[:, 1], labels
+
+def sample_negatives(tables: FeatureTables, user_ids: np.ndarray, labels: np.ndarray,
+                     negatives: int, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (user_ids, post_ids) of `negatives` random live posts per positive. A
+    sample can occasionally hit a post the user did engage with; at catalog
+    sizes that noise is negligible.
+    """
+    users = np.repeat(user_ids[labels > 0], negatives)
+    if not len(users) or not len(tables.post_ids):
+        return users[:0], users[:0]
+    return users, tables.post_ids[rng.integers(0, len(tables.post_ids), size=len(users))]
+
+class ShardWriter:
+    """Buffers examples and writes them as shuffled, fixed-size .npy shards plus a manifest"""
+
+    def __init__(self, directory: str, shard_size: int, rng: np.random.Generator):
+        self.directory = directory
+        self.shard_size = shard_size
+        self.rng = rng
+        self.shards: List[Dict] = []
+        self.examples = 0
+        self.positives = 0
+        self._buffer: List[np.ndarray] = []
+        self._buffered = 0
+        os.makedirs(directory, exist_ok=True)
+        # Shards from an earlier run would otherwise be mixed in
+        for name in os.listdir(directory):
+            if name.startswith("shard-") or name == MANIFEST:
+                os.remove(os.path.join(directory, name))
+
+    def add(self, records: np.ndarray):
+        self._buffer.append(records)
+        self._buffered += len(records)
+        while self._buffered >= self.shard_size:
+            self._flush(self.shard_size)
+
+    def close(self) -> Dict:
+        if self._buffered:
+            self._flush(self._buffered)
+        manifest = {
+            'dtype': [[name, EXAMPLE_DTYPE[name].str] for name in EXAMPLE_DTYPE.names],
+            'examples': self.examples,
+            'positives': self.positives,
+            'shards': self.shards,
+        }
+        with open(os.path.join(self.directory, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+    def _flush(self, count: int):
+        buffered = np.concatenate(self._buffer)
+        shard, rest = buffered[:count], buffered[count:]
+        self._buffer = [rest] if len(rest) else []
+        self._buffered = len(rest)
+
+        # Events arrive grouped by user; shuffling here keeps each shard a mix
+        shard = shard[self.rng.permutation(len(shard))]
+        name = f"shard-{len(self.shards):05d}.npy"
+        tmp_path = os.path.join(self.directory, name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, shard)
+        os.replace(tmp_path, os.path.join(self.directory, name))
+
+        positives = int((shard['label'] > 0).sum())
+        self.shards.append({'file': name, 'examples': len(shard), 'positives': positives})
+        self.examples += len(shard)
+        self.positives += positives
+
+def read_manifest(directory: str) -> Dict:
+    with open(os.path.join(directory, MANIFEST)) as f:
+        return json.load(f)
+
+class ShardDataset(IterableDataset):
+    """
+    Batches of examples from memory-mapped shards. Each DataLoader worker
+    reads its own subset of the shards, so use at least as many shards as
+    workers. Call set_epoch before each epoch for a new shuffle.
+    """
+
+    def __init__(self, directory: str, shards: List[str], batch_size: int,
+                 shuffle: bool = True, seed: int = 0):
+        self.directory = directory
+        self.shards = shards
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
+    def __iter__(self) -> Iterator[Dict[str, torch.Tensor]]:
+        worker = get_worker_info()
+        worker_id, num_workers = (worker.id, worker.num_workers) if worker else (0, 1)
+        order = np.arange(len(self.shards))
+        if self.shuffle:
+            # Same shard order in every worker, so they split it without overlap
+            order = np.random.default_rng((self.seed, self.epoch)).permutation(order)
+        rng = np.random.default_rng((self.seed, self.epoch, worker_id + 1))
+
+        for index in order[worker_id::num_workers]:
+            data = np.load(os.path.join(self.directory, self.shards[index]), mmap_mode='r')
+            rows = rng.permutation(len(data)) if self.shuffle else np.arange(len(data))
+            for start in range(0, len(rows), self.batch_size):
+                batch = data[np.sort(rows[start:start + self.batch_size])]
+                yield self._tensors(batch)
+
+    @staticmethod
+    def _tensors(batch: np.ndarray) -> Dict[str, torch.Tensor]:
+        tensors = {name: torch.from_numpy(np.ascontiguousarray(batch[name])) for name in EXAMPLE_DTYPE.names}
+        tensors['wide_index'] = torch.from_numpy(
+            wide_indices(batch['user_interest'], batch['post_interest'], batch['author_id'])
+        )
+        return tensors
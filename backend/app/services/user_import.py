@@ -0,0 +1,214 @@
+"""
+Creating users and their interest selections, one at a time or in bulk.
+
+`interest_inserts` builds the rows every new interest selection needs
+(user_interests, user_interest_weights and user_behavior_scores) as
+executemany batches. The register/onboarding routes and the bulk importer
+share it.
+
+`import_users` streams user records from CSV or JSONL and hashes passwords
+across worker processes while the previous chunk is written. Each chunk is
+written to all four tables with executemany inserts in one transaction, then
+a checkpoint is saved so an interrupted import can resume.
+"""
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Insert
+from app.core.logger import logger
+from app.models import Interest, User, UserBehaviorScore, UserInterestWeight, user_interests
+import csv
+import itertools
+import json
+import os
+import time
+
+def interest_inserts(selections: Iterable[Tuple[int, Sequence[int]]]) -> List[Tuple[Insert, List[Dict]]]:
+    """
+    Statements and parameter rows that give each user their selected
+    interests, with the initial weight and an empty behavior score.
+
+    Execute each pair as `db.execute(stmt, rows)` (sync or async session).
+    Duplicate interest IDs within a selection are dropped.
+    """
+    memberships, weights, scores = [], [], []
+    for user_id, interest_ids in selections:
+        for interest_id in dict.fromkeys(interest_ids):
+            memberships.append({"user_id": user_id, "interest_id": interest_id, "initial_weight": 1.0})
+            weights.append({"user_id": user_id, "interest_id": interest_id, "weight": 1.0})
+            scores.append({"user_id": user_id, "interest_id": interest_id, "score": 0.0, "interaction_count": 0})
+
+    if not memberships:
+        return []
+    return [
+        (insert(user_interests), memberships),
+        (insert(UserInterestWeight.__table__), weights),
+        (insert(UserBehaviorScore.__table__), scores),
+    ]
+
+# Reading input
+
+def read_records(path: str, skip: int = 0) -> Iterator[Dict]:
+    """
+    Stream user records from a .csv or .jsonl file.
+
+    Each record has username, email, interests (list of IDs) and either a
+    plaintext `password` or an existing bcrypt `hashed_password`. In CSV,
+    interests are separated by semicolons or given as a JSON list.
+    """
+    with open(path, newline="") as f:
+        if path.endswith(".jsonl"):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = (_parse_csv_row(row) for row in csv.DictReader(f))
+        yield from itertools.islice(rows, skip, None)
+
+def _parse_csv_row(row: Dict) -> Dict:
+    interests = (row.get("interests") or "").strip()
+    if interests.startswith("["):
+        interest_ids = json.loads(interests)
+    else:
+        interest_ids = [int(value) for value in interests.split(";") if value.strip()]
+    return {
+        "username": row["username"],
+        "email": row["email"],
+        "password": row.get("password") or None,
+        "hashed_password": row.get("hashed_password") or None,
+        "interests": interest_ids,
+    }
+
+# Hashing (runs in worker processes)
+
+def hash_passwords(passwords: List[str], rounds: int) -> List[str]:
+    from passlib.context import CryptContext
+    context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+    return [context.hash(password) for password in passwords]
+
+# Importing
+
+class ImportStats:
+    """Running totals for a bulk import"""
+
+    def __init__(self, records: int = 0, users: int = 0, skipped: int = 0, rows: int = 0):
+        self.records = records  # input records consumed, including skipped ones
+        self.users = users
+        self.skipped = skipped
+        self.rows = rows  # rows written across all four tables
+        self.started_at = time.perf_counter()
+        # Rates cover this run only, not totals restored from a checkpoint
+        self._users_at_start = users
+        self._rows_at_start = rows
+
+    def rates(self) -> Dict[str, float]:
+        elapsed = max(time.perf_counter() - self.started_at, 1e-9)
+        return {
+            "users_per_s": (self.users - self._users_at_start) / elapsed,
+            "rows_per_s": (self.rows - self._rows_at_start) / elapsed
+        }
+
+    def to_dict(self) -> Dict:
+        return {"records": self.records, "users": self.users, "skipped": self.skipped, "rows": self.rows}
+
+def load_checkpoint(path: Optional[str]) -> Dict:
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+def save_checkpoint(path: str, stats: ImportStats):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(stats.to_dict(), f)
+    os.replace(tmp_path, path)
+
+def import_users(session_factory: Callable[[], Session], path: str, chunk_size: int = 1000,
+                 hash_workers: int = None, bcrypt_rounds: int = 12,
+                 checkpoint_path: Optional[str] = None,
+                 progress: Optional[Callable[[ImportStats], None]] = None) -> ImportStats:
+    """
+    Import users from `path` in chunks of `chunk_size`.
+
+    Records whose username or email already exists (for example, a chunk
+    re-read after a crash between commit and checkpoint) are skipped, as are
+    unknown interest IDs. With `checkpoint_path`, progress is saved after
+    every committed chunk and a rerun continues after the last one.
+    """
+    checkpoint = load_checkpoint(checkpoint_path)
+    stats = ImportStats(**checkpoint)
+    if checkpoint:
+        logger.info(f"Resuming import of {path} after {stats.records} records")
+
+    with session_factory() as db:
+        valid_interests = set(db.execute(select(Interest.id)).scalars())
+
+    records = read_records(path, skip=stats.records)
+    workers = hash_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = None
+        while True:
+            chunk = list(itertools.islice(records, chunk_size))
+            # Hash this chunk in the workers while the previous one is written
+            submitted = (chunk, _submit_hashes(pool, chunk, workers, bcrypt_rounds)) if chunk else None
+            if pending is not None:
+                _write_chunk(session_factory, *pending, valid_interests, stats)
+                if checkpoint_path:
+                    save_checkpoint(checkpoint_path, stats)
+                if progress:
+                    progress(stats)
+            if submitted is None:
+                break
+            pending = submitted
+
+    return stats
+
+def _submit_hashes(pool: ProcessPoolExecutor, chunk: List[Dict], workers: int,
+                   rounds: int) -> List[Tuple[List[int], Future]]:
+    indexes = [i for i, record in enumerate(chunk) if not record.get("hashed_password") and record.get("password")]
+    batch_size = max(1, -(-len(indexes) // workers))
+    batches = []
+    for start in range(0, len(indexes), batch_size):
+        batch = indexes[start:start + batch_size]
+        batches.append((batch, pool.submit(hash_passwords, [chunk[i]["password"] for i in batch], rounds)))
+    return batches
+
+def _write_chunk(session_factory: Callable[[], Session], chunk: List[Dict],
+                 hash_batches: List[Tuple[List[int], Future]], valid_interests: set, stats: ImportStats):
+    hashes = {}
+    for batch, future in hash_batches:
+        hashes.update(zip(batch, future.result()))
+
+    with session_factory() as db:
+        usernames = [record["username"] for record in chunk]
+        emails = [record["email"] for record in chunk]
+        taken_names = set(db.execute(select(User.username).where(User.username.in_(usernames))).scalars())
+        taken_emails = set(db.execute(select(User.email).where(User.email.in_(emails))).scalars())
+
+        users, selections = [], {}
+        for i, record in enumerate(chunk):
+            username, email = record["username"], record["email"]
+            if username in taken_names or email in taken_emails:
+                stats.skipped += 1
+                continue
+            taken_names.add(username)
+            taken_emails.add(email)
+            users.append({
+                "username": username,
+                "email": email,
+                "hashed_password": record.get("hashed_password") or hashes.get(i),
+                "is_active": True,
+                "has_completed_onboarding": bool(record.get("interests")),
+            })
+            selections[username] = [interest_id for interest_id in record.get("interests") or []
+                                    if interest_id in valid_interests]
+
+        if users:
+            created = db.execute(insert(User.__table__).returning(User.id, User.username), users).all()
+            inserts = interest_inserts((user_id, selections[username]) for user_id, username in created)
+            for stmt, rows in inserts:
+                db.execute(stmt, rows)
+                stats.rows += len(rows)
+            stats.rows += len(users)
+            stats.users += len(users)
+        db.commit()
+    stats.records += len(chunk)
@@ -0,0 +1,44 @@
+from typing import Dict, Optional
+from app.core.config import settings
+
+# Index types the recall tuner knows how to build and search
+SUPPORTED_INDEX_TYPES = ("FLAT", "IVF_FLAT", "IVF_SQ8", "IVF_PQ", "HNSW")
+
+def get_index_params(index_type: Optional[str] = None, **overrides) -> Dict:
+    """Build Milvus index params for an index type, defaulting to the configured one"""
+    index_type = (index_type or settings.milvus_index_type).upper()
+
+    if index_type == "HNSW":
+        params = {
+            "M": overrides.get("M", settings.milvus_hnsw_m),
+            "efConstruction": overrides.get("efConstruction", settings.milvus_hnsw_ef_construction)
+        }
+    elif index_type.startswith("IVF"):
+        params = {"nlist": overrides.get("nlist", settings.milvus_nlist)}
+        if index_type == "IVF_PQ":
+            params["m"] = overrides.get("m", 8)
+            params["nbits"] = overrides.get("nbits", 8)
+    else:
+        params = {}
+
+    return {
+        "metric_type": settings.milvus_metric_type,
+        "index_type": index_type,
+        "params": params
+    }
+
+def get_search_params(index_type: Optional[str] = None, **overrides) -> Dict:
+    """Build Milvus search params matching an index type"""
+    index_type = (index_type or settings.milvus_index_type).upper()
+
+    if index_type == "HNSW":
+        params = {"ef": overrides.get("ef", settings.milvus_hnsw_ef)}
+    elif index_type.startswith("IVF"):
+        params = {"nprobe": overrides.get("nprobe", settings.milvus_nprobe)}
+    else:
+        params = {}
+
+    return {
+        "metric_type": settings.milvus_metric_type,
+        "params": params
+    }
@@ -0,0 +1,31 @@
+"""
+Gunicorn settings for the preload-and-fork multi-worker mode:
+
+    cd backend && gunicorn app.main:app
+
+The master imports the app and loads the models once (app.core.prefork),
+then forks WEB_CONCURRENCY uvicorn workers that share the weights
+copy-on-write. Any setting can still be overridden on the command line.
+"""
+import gc
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# Model warmup can take a while on a cold start
+timeout = 120
+
+# No collections while the app is imported, so the objects frozen before the
+# fork are packed together instead of scattered around freed ones
+gc.disable()
+
+def when_ready(server):
+    # Runs in the master after the app is imported and before the first fork
+    from app.core.prefork import preload_models
+    preload_models()
+
+def post_fork(server, worker):
+    from app.core.prefork import init_worker
+    init_worker(server.cfg.workers)
@@ -0,0 +1,57 @@
+from logging.config import fileConfig
+from alembic import context
+from sqlalchemy import create_engine, pool
+from app.core.config import settings
+from app.models import Base
+from app.services.event_store import is_partition_table
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+def include_object(object, name, type_, reflected, compare_to):
+    # Monthly user_events_YYYYMM tables are created by the compaction job, not migrations
+    if type_ == "table" and reflected and is_partition_table(name):
+        return False
+    if type_ == "index" and reflected and is_partition_table(object.table.name):
+        return False
+    return True
+
+def get_url():
+    # An explicit URL (e.g. from scripts/check_query_plans.py) wins over settings
+    return config.get_main_option("sqlalchemy.url") or settings.database_url
+
+def run_migrations_offline():
+    """Emit migration SQL without connecting to a database"""
+    context.configure(
+        url=get_url(),
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    """Run migrations against the configured database"""
+    connectable = create_engine(get_url(), poolclass=pool.NullPool)
+    with connectable.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+            # SQLite cannot ALTER constraints in place; batch mode rebuilds tables
+            render_as_batch=True,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,113 @@
+"""Initial schema, as created by Base.metadata.create_all before migrations
+
+Databases created by the old scripts/init_db.py already have these tables;
+scripts/init_db.py stamps them at this revision before upgrading.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("username", sa.String()),
+        sa.Column("email", sa.String()),
+        sa.Column("hashed_password", sa.String()),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+        sa.Column("has_completed_onboarding", sa.Boolean()),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "interests",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String()),
+        sa.Column("category", sa.String()),
+        sa.Column("subcategory", sa.String()),
+        sa.Column("description", sa.Text()),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_index("ix_interests_id", "interests", ["id"])
+    op.create_index("ix_interests_name", "interests", ["name"], unique=True)
+    op.create_index("ix_interests_category", "interests", ["category"])
+    op.create_index("ix_interests_subcategory", "interests", ["subcategory"])
+
+    op.create_table(
+        "user_interests",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("interest_id", sa.Integer(), sa.ForeignKey("interests.id"), primary_key=True),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("initial_weight", sa.Float()),
+    )
+
+    op.create_table(
+        "posts",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String()),
+        sa.Column("content", sa.Text()),
+        sa.Column("author_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("is_deleted", sa.Boolean()),
+        sa.Column("primary_interest_id", sa.Integer(), sa.ForeignKey("interests.id")),
+        sa.Column("secondary_interest_ids", sa.String()),
+        sa.Column("content_tags", sa.String()),
+    )
+    op.create_index("ix_posts_id", "posts", ["id"])
+    op.create_index("ix_posts_title", "posts", ["title"])
+
+    op.create_table(
+        "user_interest_weights",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("interest_id", sa.Integer(), sa.ForeignKey("interests.id")),
+        sa.Column("weight", sa.Float()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    op.create_index("ix_user_interest_weights_id", "user_interest_weights", ["id"])
+
+    op.create_table(
+        "user_behavior_scores",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("interest_id", sa.Integer(), sa.ForeignKey("interests.id")),
+        sa.Column("score", sa.Float()),
+        sa.Column("interaction_count", sa.Integer()),
+        sa.Column("last_interaction", sa.DateTime()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    op.create_index("ix_user_behavior_scores_id", "user_behavior_scores", ["id"])
+
+    op.create_table(
+        "user_events",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("post_id", sa.Integer(), sa.ForeignKey("posts.id")),
+        sa.Column("event_type", sa.String()),
+        sa.Column("engagement_score", sa.Float()),
+        sa.Column("timestamp", sa.DateTime()),
+    )
+    op.create_index("ix_user_events_id", "user_events", ["id"])
+
+def downgrade():
+    op.drop_table("user_events")
+    op.drop_table("user_behavior_scores")
+    op.drop_table("user_interest_weights")
+    op.drop_table("posts")
+    op.drop_table("user_interests")
+    op.drop_table("interests")
+    op.drop_table("users")
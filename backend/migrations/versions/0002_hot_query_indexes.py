@@ -0,0 +1,44 @@
+"""Composite indexes for the feed queries and unique (user, interest) pairs
+
+Duplicate (user_id, interest_id) rows in user_interest_weights and
+user_behavior_scores are collapsed to the most recent row first, so the
+unique indexes can be created and used as upsert targets.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+def _dedupe(table):
+    op.execute(f"""
+        DELETE FROM {table}
+        WHERE id NOT IN (
+            SELECT MAX(id) FROM {table} GROUP BY user_id, interest_id
+        )
+    """)
+
+def upgrade():
+    _dedupe("user_interest_weights")
+    _dedupe("user_behavior_scores")
+
+    op.create_index("uq_user_interest_weights_user_interest", "user_interest_weights",
+                    ["user_id", "interest_id"], unique=True)
+    op.create_index("uq_user_behavior_scores_user_interest", "user_behavior_scores",
+                    ["user_id", "interest_id"], unique=True)
+    op.create_index("ix_posts_interest_feed", "posts",
+                    ["primary_interest_id", "is_deleted", "created_at"])
+    op.create_index("ix_posts_feed", "posts", ["is_deleted", "created_at"])
+    op.create_index("ix_user_events_timestamp_post", "user_events", ["timestamp", "post_id"])
+
+def downgrade():
+    op.drop_index("ix_user_events_timestamp_post", table_name="user_events")
+    op.drop_index("ix_posts_feed", table_name="posts")
+    op.drop_index("ix_posts_interest_feed", table_name="posts")
+    op.drop_index("uq_user_behavior_scores_user_interest", table_name="user_behavior_scores")
+    op.drop_index("uq_user_interest_weights_user_interest", table_name="user_interest_weights")
@@ -0,0 +1,43 @@
+"""Daily event aggregates and the monthly event partition catalog
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "event_daily_aggregates",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("post_id", sa.Integer(), sa.ForeignKey("posts.id"), nullable=False),
+        sa.Column("event_type", sa.String(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+    )
+    op.create_index("uq_event_daily_aggregates_key", "event_daily_aggregates",
+                    ["user_id", "post_id", "event_type", "day"], unique=True)
+    op.create_index("ix_event_daily_aggregates_day_post", "event_daily_aggregates",
+                    ["day", "post_id", "count"])
+
+    op.create_table(
+        "event_partitions",
+        sa.Column("table_name", sa.String(), primary_key=True),
+        sa.Column("start", sa.DateTime(), nullable=False),
+        sa.Column("end", sa.DateTime(), nullable=False),
+        sa.Column("row_count", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime()),
+    )
+
+def downgrade():
+    op.drop_table("event_partitions")
+    op.drop_index("ix_event_daily_aggregates_day_post", table_name="event_daily_aggregates")
+    op.drop_index("uq_event_daily_aggregates_key", table_name="event_daily_aggregates")
+    op.drop_table("event_daily_aggregates")
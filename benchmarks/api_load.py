@@ -0,0 +1,348 @@
+"""
+End-to-end API latency and throughput under concurrent load.
+
+Boots the app in-process (ASGI, no network) against a database seeded by
+scripts/generate_dataset.py, with the Milvus collection replaced by an
+in-memory brute-force index over the generated post embeddings. The models
+themselves are the real ones, so recall and rerank cost is included.
+
+Each workload runs a fixed number of concurrent clients for a fixed time;
+every client loops picking an endpoint by the workload's mix:
+
+- read-heavy: feeds and post pages, no writes
+- event-storm: mostly /api/user/event, with some feed reads
+- mixed: a bit of everything
+
+Results (per endpoint and overall: req/s, p50/p95/p99/max, errors) are
+printed and can be written as JSON. With --baseline, each endpoint is
+compared against a stored run and the script exits non-zero when p99 or
+throughput regresses past --tolerance.
+
+--logging measures what logging costs per request: "queue" is the app's
+default background writer, "sync" writes records on the request path with
+the same handlers and format, and "off" drops them. --log-requests adds an
+access line per request, so every request logs at least once.
+
+Usage:
+    python benchmarks/api_load.py --save-baseline benchmarks/baselines/api_load.json
+    python benchmarks/api_load.py --baseline benchmarks/baselines/api_load.json
+    python benchmarks/api_load.py --workloads mixed --concurrency 64 --duration 30 --output results.json
+    python benchmarks/api_load.py --database-url sqlite:///load.db --embeddings synthetic_embeddings
+    python benchmarks/api_load.py --log-requests --logging sync   # vs the default --logging queue
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Add the backend directory to the path to use the app, and scripts/ for the dataset generator
+sys.path.append(os.path.join(os.path.dirname(__file__), "../backend"))
+sys.path.append(os.path.join(os.path.dirname(__file__), "../scripts"))
+
+EVENT_TYPES = ('view', 'view', 'view', 'click', 'click', 'upvote', 'save', 'comment', 'share')
+
+# Endpoint shares per workload
+WORKLOADS = {
+    "read-heavy": {"home": 0.5, "popular": 0.15, "initial": 0.1, "post": 0.25},
+    "event-storm": {"event": 0.85, "home": 0.15},
+    "mixed": {"home": 0.35, "popular": 0.1, "initial": 0.05, "post": 0.2, "event": 0.3},
+}
+
+class InMemoryHit:
+    def __init__(self, post_id, distance):
+        self.id = post_id
+        self.distance = distance
+        self.entity = {"post_id": post_id}
+
+class InMemoryCollection:
+    """Exact inner-product search with the subset of the pymilvus Collection API that recall uses"""
+
+    def __init__(self, post_ids: np.ndarray, embeddings: np.ndarray, latency: float = 0.0):
+        self.post_ids = np.asarray(post_ids)
+        self.embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        # Simulated round trip to a remote Milvus
+        self.latency = latency
+
+    def load(self):
+        pass
+
+    def search(self, data, anns_field, param, limit, expr=None, output_fields=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        queries = np.asarray(data, dtype=np.float32)
+        scores = queries @ self.embeddings.T
+        limit = min(limit, scores.shape[1])
+        top = np.argpartition(-scores, limit - 1, axis=1)[:, :limit]
+        results = []
+        for row, candidates in enumerate(top):
+            ordered = candidates[np.argsort(-scores[row, candidates])]
+            results.append([InMemoryHit(int(self.post_ids[i]), float(scores[row, i])) for i in ordered])
+        return results
+
+def use_in_memory_milvus(collection):
+    """Make the recall service search `collection` instead of connecting to Milvus"""
+    from app.services.registry import registry
+
+    def create_recall_service():
+        from app.services.recall_service import RecallService
+        service = RecallService(connect_milvus=False)
+        service.milvus_collection = collection
+        return service
+
+    registry.register("recall", create_recall_service)
+
+class Requests:
+    """Builds the request for each endpoint from the seeded IDs"""
+
+    def __init__(self, num_users: int, post_ids: np.ndarray, seed: int):
+        self.rng = np.random.default_rng(seed)
+        self.num_users = num_users
+        self.post_ids = post_ids
+
+    def user(self):
+        return int(self.rng.integers(1, self.num_users + 1))
+
+    def post(self):
+        return int(self.post_ids[self.rng.integers(0, len(self.post_ids))])
+
+    def send(self, client, endpoint):
+        if endpoint == "home":
+            return client.get(f"/api/recommend/home?user_id={self.user()}&limit=20")
+        if endpoint == "initial":
+            return client.get(f"/api/recommend/initial?user_id={self.user()}&limit=20")
+        if endpoint == "popular":
+            return client.get("/api/recommend/popular?limit=20")
+        if endpoint == "post":
+            return client.get(f"/api/post/{self.post()}")
+        if endpoint == "event":
+            return client.post("/api/user/event", json={
+                "user_id": str(self.user()),
+                "post_id": str(self.post()),
+                "event_type": EVENT_TYPES[int(self.rng.integers(0, len(EVENT_TYPES)))]
+            })
+        raise ValueError(f"Unknown endpoint {endpoint}")
+
+def summarize(latencies, errors, elapsed):
+    values = np.asarray(latencies) * 1000
+    summary = {"requests": len(latencies), "errors": errors, "rps": len(latencies) / elapsed}
+    for name, q in (("p50_ms", 50), ("p95_ms", 95), ("p99_ms", 99)):
+        summary[name] = float(np.percentile(values, q)) if len(values) else None
+    summary["max_ms"] = float(values.max()) if len(values) else None
+    return summary
+
+async def run_workload(client, requests, mix, concurrency, duration):
+    endpoints = list(mix)
+    shares = np.asarray([mix[endpoint] for endpoint in endpoints], dtype=np.float64)
+    shares /= shares.sum()
+    latencies = {endpoint: [] for endpoint in endpoints}
+    errors = {endpoint: 0 for endpoint in endpoints}
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            endpoint = endpoints[int(requests.rng.choice(len(endpoints), p=shares))]
+            start = time.perf_counter()
+            response = await requests.send(client, endpoint)
+            if response.status_code >= 400:
+                errors[endpoint] += 1
+            else:
+                latencies[endpoint].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "concurrency": concurrency,
+        "duration_s": elapsed,
+        "endpoints": {endpoint: summarize(latencies[endpoint], errors[endpoint], elapsed) for endpoint in endpoints},
+    }
+    result["total"] = summarize([value for values in latencies.values() for value in values],
+                                sum(errors.values()), elapsed)
+    return result
+
+def compare(results, baseline, tolerance):
+    """Per-endpoint p99 and throughput changes against a baseline; returns the regressions"""
+    rows, regressions = [], []
+    for workload, result in results["workloads"].items():
+        base_workload = baseline.get("workloads", {}).get(workload)
+        if base_workload is None:
+            continue
+        for endpoint, current in {**result["endpoints"], "total": result["total"]}.items():
+            base = base_workload["endpoints"].get(endpoint) if endpoint != "total" else base_workload["total"]
+            if not base or not current["requests"] or not base["requests"]:
+                continue
+            p99_change = current["p99_ms"] / base["p99_ms"] - 1
+            rps_change = current["rps"] / base["rps"] - 1
+            regressed = p99_change > tolerance or rps_change < -tolerance
+            rows.append((workload, endpoint, base["p99_ms"], current["p99_ms"], p99_change,
+                         base["rps"], current["rps"], rps_change, regressed))
+            if regressed:
+                regressions.append(f"{workload}/{endpoint}")
+
+    print(f"\nAgainst baseline ({baseline.get('meta', {}).get('git_commit', 'unknown commit')}), "
+          f"tolerance {tolerance:.0%}:")
+    print(f"{'workload':<12} {'endpoint':<9} {'p99 base':>9} {'p99 now':>9} {'change':>8} "
+          f"{'req/s base':>11} {'req/s now':>10} {'change':>8}")
+    for workload, endpoint, base_p99, p99, p99_change, base_rps, rps, rps_change, regressed in rows:
+        print(f"{workload:<12} {endpoint:<9} {base_p99:>9.1f} {p99:>9.1f} {p99_change:>+8.1%} "
+              f"{base_rps:>11.1f} {rps:>10.1f} {rps_change:>+8.1%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+def print_results(results):
+    for workload, result in results["workloads"].items():
+        print(f"\n{workload} ({result['concurrency']} clients, {result['duration_s']:.1f}s)")
+        print(f"{'endpoint':<9} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+        for endpoint, summary in {**result["endpoints"], "total": result["total"]}.items():
+            if not summary["requests"]:
+                print(f"{endpoint:<9} {0:>9} {summary['errors']:>7}")
+                continue
+            print(f"{endpoint:<9} {summary['requests']:>9} {summary['errors']:>7} {summary['rps']:>8.1f} "
+                  f"{summary['p50_ms']:>8.1f} {summary['p95_ms']:>8.1f} {summary['p99_ms']:>8.1f} "
+                  f"{summary['max_ms']:>8.1f}")
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def use_logging(mode):
+    """Swap the app's queue-backed log handler for direct handlers ("sync") or none ("off")"""
+    import logging
+    from app.core import logger as app_logging
+    if mode == "queue":
+        return
+    app_logging.stop_logging()
+
+    def tag_request_id(record):
+        record.request_id = app_logging.request_id_var.get()
+        return True
+
+    for target in (app_logging.logger, app_logging.access_logger):
+        handlers = list(target.handlers)
+        for handler in handlers:
+            target.removeHandler(handler)
+        if mode == "off":
+            target.addHandler(logging.NullHandler())
+            continue
+        # Same formatter, request IDs and rate limiting; only the write path differs
+        for rate_limit in handlers[0].filters:
+            target.addFilter(rate_limit)
+        target.addFilter(tag_request_id)
+        for handler in app_logging._build_handlers():
+            target.addHandler(handler)
+
+async def main_async(args, num_users, post_ids, embeddings):
+    import httpx
+    from app.db.session import async_engine, async_read_engine
+    from app.main import app
+    from app.services.registry import registry
+
+    use_logging(args.logging)
+    use_in_memory_milvus(InMemoryCollection(post_ids, embeddings, latency=args.milvus_latency_ms / 1000))
+    # Build the models before measuring anything
+    registry.warmup()
+
+    requests = Requests(num_users, post_ids, args.seed)
+    results = {
+        "meta": {
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "users": num_users,
+            "posts": len(post_ids),
+            "milvus_latency_ms": args.milvus_latency_ms,
+            "logging": args.logging,
+            "log_requests": args.log_requests,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "workloads": {}
+    }
+    async with httpx.AsyncClient(app=app, base_url="http://bench", timeout=None) as client:
+        for workload in args.workloads:
+            mix = WORKLOADS[workload]
+            # Warm caches and connection pools for this mix
+            await run_workload(client, requests, mix, args.concurrency, args.warmup)
+            results["workloads"][workload] = await run_workload(client, requests, mix, args.concurrency,
+                                                                args.duration)
+
+    registry.close()
+    await async_engine.dispose()
+    await async_read_engine.dispose()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API latency and throughput under load")
+    parser.add_argument("--workloads", type=lambda v: v.split(","), default=list(WORKLOADS),
+                        help=f"comma-separated, from {', '.join(WORKLOADS)}")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per workload")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds before each workload")
+    parser.add_argument("--scale", type=float, default=0.5, help="generated dataset scale (see generate_dataset.py)")
+    parser.add_argument("--database-url", help="use an already seeded database instead of generating one")
+    parser.add_argument("--embeddings", help="embedding files for --database-url (from generate_dataset.py)")
+    parser.add_argument("--milvus-latency-ms", type=float, default=0.0, help="added to every vector search")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="compare against results JSON from an earlier run")
+    parser.add_argument("--save-baseline", help="write results JSON to this path as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed p99/throughput change vs baseline")
+    parser.add_argument("--logging", choices=["queue", "sync", "off"], default="queue",
+                        help="how log records are written (see above)")
+    parser.add_argument("--log-requests", action="store_true", help="log an access line per request")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    unknown = set(args.workloads) - set(WORKLOADS)
+    if unknown:
+        parser.error(f"unknown workloads: {sorted(unknown)}")
+    if args.database_url and not args.embeddings:
+        parser.error("--database-url needs --embeddings")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        embeddings_dir = args.embeddings or os.path.join(tmp, "embeddings")
+        # Point the app at the bench database before it is imported
+        os.environ["DATABASE_URL"] = url
+        os.environ.pop("DATABASE_READ_URL", None)
+        os.environ["SERVICE_WARMUP"] = "lazy"
+        os.environ["LOG_FILE"] = os.path.join(tmp, "bench.log")
+        os.environ["LOG_REQUESTS"] = "true" if args.log_requests else "false"
+
+        import generate_dataset as gen
+        if not args.database_url:
+            dataset = gen.SyntheticDataset(int(gen.USERS_PER_SCALE * args.scale), int(gen.POSTS_PER_SCALE * args.scale),
+                                           int(gen.EVENTS_PER_SCALE * args.scale), days=30, seed=args.seed)
+            gen.generate(dataset, gen.DatabaseWriter(url), embeddings_dir)
+
+        post_ids = np.load(os.path.join(embeddings_dir, "post_ids.npy"))
+        embeddings = np.load(os.path.join(embeddings_dir, "post_embeddings.npy"))
+        num_users = len(np.load(os.path.join(embeddings_dir, "user_ids.npy"), mmap_mode="r"))
+        results = asyncio.run(main_async(args, num_users, post_ids, embeddings))
+
+    print_results(results)
+    for path in filter(None, (args.output, args.save_baseline)):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nWrote results to {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\nRegressed: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
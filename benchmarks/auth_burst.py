@@ -0,0 +1,193 @@
+"""
+Feed latency during a registration burst.
+
+Runs the API in-process against a seeded SQLite database. Feed clients hit
+/api/recommend/popular continuously while registration clients sign up as
+fast as they can. bcrypt hashing runs three ways:
+
+- event loop: an `async def` route that hashes inline, blocking the loop
+- shared threadpool: a plain `def` route, hashing on FastAPI's threadpool
+  (the previous register route)
+- bounded pool: the real /api/auth/register, hashing on the dedicated
+  bounded password hasher
+
+Usage:
+    python benchmarks/auth_burst.py --feed-clients 16 --signup-clients 32 --duration 5
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Add the backend directory to the path to use the app
+sys.path.append(os.path.join(os.path.dirname(__file__), "../backend"))
+
+NUM_USERS = 1000
+NUM_INTERESTS = 50
+NUM_POSTS = 5000
+
+def seed(path):
+    from sqlalchemy import create_engine, insert
+    from app.models import Base, Interest, Post, User, UserEvent
+
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    rng = np.random.default_rng(0)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": i, "username": f"user{i}", "email": f"user{i}@example.com"} for i in range(1, NUM_USERS + 1)
+        ])
+        conn.execute(insert(Interest), [
+            {"id": i, "name": f"interest{i}", "category": "bench", "subcategory": "bench"}
+            for i in range(1, NUM_INTERESTS + 1)
+        ])
+        conn.execute(insert(Post), [
+            {
+                "id": i,
+                "title": f"post {i}",
+                "content": "lorem ipsum " * 30,
+                "author_id": int(rng.integers(1, NUM_USERS + 1)),
+                "primary_interest_id": int(rng.integers(1, NUM_INTERESTS + 1)),
+                "created_at": now - timedelta(minutes=i),
+                "is_deleted": False
+            }
+            for i in range(1, NUM_POSTS + 1)
+        ])
+        conn.execute(insert(UserEvent), [
+            {
+                "user_id": int(rng.integers(1, NUM_USERS + 1)),
+                "post_id": int(rng.zipf(1.3) % NUM_POSTS + 1),
+                "event_type": "view",
+                "timestamp": now - timedelta(minutes=int(rng.integers(0, 60 * 24 * 6)))
+            }
+            for _ in range(20000)
+        ])
+    engine.dispose()
+
+def build_app():
+    """Import the app (after the environment points it at the bench database) and add the old-style routes"""
+    from passlib.context import CryptContext
+    from app.core.config import settings
+    from app.main import app
+
+    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
+
+    @app.post("/bench/register-event-loop")
+    async def register_on_event_loop(payload: dict):
+        return {"hash": pwd_context.hash(payload["password"])}
+
+    @app.post("/bench/register-threadpool")
+    def register_on_threadpool(payload: dict):
+        return {"hash": pwd_context.hash(payload["password"])}
+
+    return app
+
+async def run_phase(client, signup_path, feed_clients, signup_clients, duration):
+    feed_latencies = []
+    signups = []
+    rejected = 0
+    names = itertools.count()
+    deadline = time.perf_counter() + duration
+
+    async def feed():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await client.get("/api/recommend/popular?limit=20")
+            response.raise_for_status()
+            feed_latencies.append(time.perf_counter() - start)
+
+    async def signup():
+        nonlocal rejected
+        while time.perf_counter() < deadline:
+            n = next(names)
+            payload = {
+                "username": f"bench{os.getpid()}_{n}_{time.monotonic_ns()}",
+                "email": f"bench{n}_{time.monotonic_ns()}@example.com",
+                "password": "correct horse battery staple",
+                "interests": [1, 2, 3]
+            }
+            response = await client.post(signup_path, json=payload)
+            if response.status_code == 503:
+                rejected += 1
+                await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+                continue
+            response.raise_for_status()
+            signups.append(1)
+
+    tasks = [feed() for _ in range(feed_clients)]
+    if signup_path:
+        tasks += [signup() for _ in range(signup_clients)]
+    start = time.perf_counter()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    latencies = np.asarray(feed_latencies) * 1000
+    return {
+        "feed_rps": len(feed_latencies) / elapsed,
+        "feed_p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else float("nan"),
+        "feed_p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else float("nan"),
+        "signups_per_s": len(signups) / elapsed,
+        "rejected": rejected
+    }
+
+async def main_async(args):
+    import httpx
+
+    app = build_app()
+    phases = {
+        "no registrations": None,
+        "event loop": "/bench/register-event-loop",
+        "shared threadpool": "/bench/register-threadpool",
+        "bounded pool": "/api/auth/register",
+    }
+    results = {}
+    async with httpx.AsyncClient(app=app, base_url="http://bench", timeout=None) as client:
+        # Warm the connection pools and caches
+        await run_phase(client, None, args.feed_clients, 0, 0.5)
+        for name, path in phases.items():
+            results[name] = await run_phase(client, path, args.feed_clients, args.signup_clients, args.duration)
+
+    from app.db.session import async_engine, async_read_engine
+    from app.services.registry import get_password_hasher, registry
+    hasher_stats = get_password_hasher().stats()
+    registry.close()
+    await async_engine.dispose()
+    await async_read_engine.dispose()
+
+    print(f"{args.feed_clients} feed clients, {args.signup_clients} sign-up clients, "
+          f"bcrypt cost {hasher_stats['bcrypt_rounds']}, {os.cpu_count()} CPUs\n")
+    print(f"{'phase':<20} {'feed req/s':>11} {'feed p50':>9} {'feed p99':>9} {'signups/s':>10} {'503s':>6}")
+    for name, result in results.items():
+        print(f"{name:<20} {result['feed_rps']:>11.1f} {result['feed_p50_ms']:>9.1f} "
+              f"{result['feed_p99_ms']:>9.1f} {result['signups_per_s']:>10.1f} {result['rejected']:>6}")
+    print(f"\nbounded pool: queue wait p99 {hasher_stats['queue_wait']['p99_ms']:.0f} ms, "
+          f"hash time p50 {hasher_stats['hash_time']['p50_ms']:.0f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark feed latency during a registration burst")
+    parser.add_argument("--feed-clients", type=int, default=16)
+    parser.add_argument("--signup-clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per phase")
+    parser.add_argument("--bcrypt-rounds", type=int, default=10,
+                        help="bcrypt cost for every phase (production default is 12)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        # Point the app at the bench database before it is imported; models stay unloaded
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+        os.environ.pop("DATABASE_READ_URL", None)
+        os.environ["SERVICE_WARMUP"] = "lazy"
+        os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+        seed(path)
+        asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    main()
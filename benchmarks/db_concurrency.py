@@ -0,0 +1,155 @@
+"""
+Throughput of the feed read path at increasing client concurrency, comparing
+a synchronous session used inside async code (the old route behavior, which
+blocks the event loop) with the async session.
+
+Each simulated request runs the recommender's primary-interest and hydrate
+queries plus a short non-database await (standing in for the vector recall
+call). Alongside throughput, a probe task measures event-loop lag: how late a
+1 ms timer fires, which is what every other request on the worker (health
+checks, auth, cached responses) waits on while the loop is blocked.
+
+Usage:
+    python benchmarks/db_concurrency.py --posts 50000 --duration 5
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Add the backend directory to the path to use the app's models and queries
+sys.path.append(os.path.join(os.path.dirname(__file__), "../backend"))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.models import Base, Interest, Post, User
+from app.services.interest_based_recommender import interest_recommender
+
+NUM_INTERESTS = 200
+
+def seed(path, num_posts):
+    """Create a standalone SQLite database with users, interests and posts"""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": i, "username": f"user{i}", "email": f"user{i}@example.com"} for i in range(1, 1001)
+        ])
+        conn.execute(insert(Interest), [
+            {"id": i, "name": f"interest{i}", "category": "bench", "subcategory": "bench"}
+            for i in range(1, NUM_INTERESTS + 1)
+        ])
+        conn.execute(insert(Post), [
+            {
+                "id": i,
+                "title": f"post {i}",
+                "content": "lorem ipsum " * 30,
+                "author_id": random.randint(1, 1000),
+                "primary_interest_id": random.randint(1, NUM_INTERESTS),
+                "created_at": now - timedelta(minutes=i),
+                "is_deleted": False
+            }
+            for i in range(1, num_posts + 1)
+        ])
+    engine.dispose()
+
+def sample_interests():
+    return random.sample(range(1, NUM_INTERESTS + 1), 5)
+
+def make_sync_request(session_factory, io_seconds):
+    async def request():
+        # The old pattern: blocking ORM calls made directly inside a coroutine
+        with session_factory() as db:
+            rows = db.execute(interest_recommender._primary_interest_stmt(sample_interests(), 40)).all()
+            db.execute(interest_recommender._hydrate_stmt([post_id for post_id, _ in rows[:20]])).all()
+        await asyncio.sleep(io_seconds)
+    return request
+
+def make_async_request(session_factory, io_seconds):
+    async def request():
+        async with session_factory() as db:
+            rows = (await db.execute(interest_recommender._primary_interest_stmt(sample_interests(), 40))).all()
+            (await db.execute(interest_recommender._hydrate_stmt([post_id for post_id, _ in rows[:20]]))).all()
+        await asyncio.sleep(io_seconds)
+    return request
+
+async def run_load(request, concurrency, duration):
+    latencies = []
+    lags = []
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await request()
+            latencies.append(time.perf_counter() - start)
+
+    async def lag_probe():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append(time.perf_counter() - start - 0.001)
+
+    start = time.perf_counter()
+    await asyncio.gather(lag_probe(), *(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.asarray(latencies) * 1000
+    lags = np.asarray(lags) * 1000
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "loop_lag_p99_ms": float(np.percentile(lags, 99))
+    }
+
+async def main_async(args, path):
+    sync_engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False},
+                                pool_size=args.pool_size, max_overflow=0)
+    # aiosqlite defaults to NullPool; pool it like the sync engine for a fair comparison
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=AsyncAdaptedQueuePool,
+                                       pool_size=args.pool_size, max_overflow=0)
+    modes = {
+        "sync (blocking)": make_sync_request(sessionmaker(bind=sync_engine), args.io_ms / 1000),
+        "async": make_async_request(async_sessionmaker(async_engine), args.io_ms / 1000),
+    }
+
+    print(f"{'mode':<16} {'clients':>8} {'requests':>9} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'loop lag p99':>13}")
+    for concurrency in args.concurrency:
+        for name, request in modes.items():
+            # Warm connections and caches before measuring
+            await run_load(request, concurrency, min(0.5, args.duration))
+            result = await run_load(request, concurrency, args.duration)
+            print(f"{name:<16} {concurrency:>8} {result['requests']:>9} {result['rps']:>9.1f} "
+                  f"{result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['loop_lag_p99_ms']:>13.2f}")
+
+    sync_engine.dispose()
+    await async_engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sync vs async DB sessions under concurrent load")
+    parser.add_argument("--posts", type=int, default=20000)
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds per measurement")
+    parser.add_argument("--concurrency", type=lambda v: [int(c) for c in v.split(",")], default=[1, 16, 128])
+    parser.add_argument("--io-ms", type=float, default=5.0, help="simulated non-DB await per request")
+    parser.add_argument("--pool-size", type=int, default=16)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        seed(path, args.posts)
+        print(f"Seeded {args.posts} posts into {path}\n")
+        asyncio.run(main_async(args, path))
+
+if __name__ == "__main__":
+    main()
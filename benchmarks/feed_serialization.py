@@ -0,0 +1,109 @@
+"""
+CPU cost of turning a recommendation feed into response bytes.
+
+Compares FastAPI's response_model path (validate the dicts into pydantic
+models, jsonable_encoder, stdlib json) with the direct path in
+app.core.serialization (stdlib json or orjson on the plain dicts), and what
+gzip and brotli compression add on top, for feeds of different sizes.
+
+Usage:
+    python benchmarks/feed_serialization.py --posts 20,50,100
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Add the backend directory to the path to use the app's response code
+sys.path.append(os.path.join(os.path.dirname(__file__), "../backend"))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from app.api.recommend import RecommendationResponse, _feed_card
+from app.core import serialization
+
+WORDS = ("model", "vector", "recall", "ranking", "python", "latency", "forum", "thread", "cache", "index")
+
+def make_posts(count, seed):
+    """Feed posts shaped like the recommender's `_format_post` output"""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    posts = []
+    for i in range(count):
+        content = " ".join(rng.choice(WORDS) for _ in range(60))
+        posts.append({
+            "id": rng.randint(1, 10_000_000),
+            "title": " ".join(rng.choice(WORDS) for _ in range(8)).capitalize(),
+            "content": content[:200] + "..." if len(content) > 200 else content,
+            "author": f"user{rng.randint(1, 1_000_000)}",
+            "timestamp": (now - timedelta(minutes=rng.randint(0, 100_000))).isoformat(),
+            "primary_interest": {"id": rng.randint(1, 300), "name": "Machine Learning", "category": "Technology"},
+            "relevance_score": rng.random(),
+        })
+    return posts
+
+def pydantic_body(posts):
+    # What a response_model route does with the returned dicts
+    model = RecommendationResponse(posts=posts, user_id=1, recommendation_type="personalized")
+    return JSONResponse(jsonable_encoder(model)).body
+
+def direct_body(posts):
+    return serialization.dumps({
+        "posts": [_feed_card(post) for post in posts],
+        "user_id": 1,
+        "recommendation_type": "personalized",
+    })
+
+def stdlib_body(posts):
+    orjson, serialization.orjson = serialization.orjson, None
+    try:
+        return direct_body(posts)
+    finally:
+        serialization.orjson = orjson
+
+def measure(func, min_time):
+    """Mean seconds per call, repeating until `min_time` has passed"""
+    func()
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        func()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / calls
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark feed response serialization and compression")
+    parser.add_argument("--posts", type=lambda v: [int(n) for n in v.split(",")], default=[20, 50, 100])
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds per measurement")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    encoders = [("pydantic + json", pydantic_body), ("direct json", stdlib_body)]
+    if serialization.orjson is not None:
+        encoders.append(("direct orjson", direct_body))
+    else:
+        print("orjson is not installed; skipping the orjson encoder\n")
+    codings = ["gzip"] + (["br"] if serialization.brotli is not None else [])
+
+    print(f"{'posts':>5} {'encoder':<20} {'µs':>9} {'speedup':>8} {'bytes':>8}")
+    for count in args.posts:
+        posts = make_posts(count, args.seed)
+        baseline = None
+        for name, func in encoders:
+            seconds = measure(lambda: func(posts), args.min_time)
+            baseline = baseline or seconds
+            print(f"{count:>5} {name:<20} {seconds * 1e6:>9.1f} {baseline / seconds:>7.1f}x {len(func(posts)):>8}")
+
+        body = encoders[-1][1](posts)
+        for coding in codings:
+            seconds = measure(lambda: serialization.compress(body, coding), args.min_time)
+            print(f"{count:>5} {'+ ' + coding:<20} {seconds * 1e6:>9.1f} {'':>8} "
+                  f"{len(serialization.compress(body, coding)):>8}")
+        print()
+
+if __name__ == "__main__":
+    main()
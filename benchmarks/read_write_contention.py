@@ -0,0 +1,151 @@
+"""
+Feed read throughput while user events are being written concurrently.
+
+Compares the old setup (one engine, default SQLite journal, reads and writes
+sharing the same pool) with the split writer/reader engines and the WAL
+profile from app.db.session. Each profile gets its own database file, since
+WAL mode persists in the file.
+
+Usage:
+    python benchmarks/read_write_contention.py --readers 16 --writers 4 --duration 5
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Add the backend directory to the path to use the app's models and queries
+sys.path.append(os.path.join(os.path.dirname(__file__), "../backend"))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from app.db.session import create_db_engine
+from app.models import Base, Interest, Post, User, UserEvent
+from app.services.interest_based_recommender import interest_recommender
+
+NUM_USERS = 1000
+NUM_INTERESTS = 200
+
+def seed(path, num_posts):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": i, "username": f"user{i}", "email": f"user{i}@example.com"} for i in range(1, NUM_USERS + 1)
+        ])
+        conn.execute(insert(Interest), [
+            {"id": i, "name": f"interest{i}", "category": "bench", "subcategory": "bench"}
+            for i in range(1, NUM_INTERESTS + 1)
+        ])
+        conn.execute(insert(Post), [
+            {
+                "id": i,
+                "title": f"post {i}",
+                "content": "lorem ipsum " * 30,
+                "author_id": random.randint(1, NUM_USERS),
+                "primary_interest_id": random.randint(1, NUM_INTERESTS),
+                "created_at": now - timedelta(minutes=i),
+                "is_deleted": False
+            }
+            for i in range(1, num_posts + 1)
+        ])
+    engine.dispose()
+
+def run_profile(read_factory, write_factory, num_posts, readers, writers, duration):
+    read_latencies = []
+    write_latencies = []
+    write_errors = []
+    deadline = time.perf_counter() + duration
+
+    def reader():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            with read_factory() as db:
+                interests = random.sample(range(1, NUM_INTERESTS + 1), 5)
+                rows = db.execute(interest_recommender._primary_interest_stmt(interests, 40)).all()
+                db.execute(interest_recommender._hydrate_stmt([post_id for post_id, _ in rows[:20]])).all()
+            read_latencies.append(time.perf_counter() - start)
+
+    def writer():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                # One event per transaction, as the event route does
+                with write_factory() as db:
+                    db.add(UserEvent(
+                        user_id=random.randint(1, NUM_USERS),
+                        post_id=random.randint(1, num_posts),
+                        event_type="view"
+                    ))
+                    db.commit()
+                write_latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                write_errors.append(e)
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    def p99(values):
+        return float(np.percentile(np.asarray(values) * 1000, 99)) if values else float("nan")
+
+    return {
+        "reads_per_s": len(read_latencies) / elapsed,
+        "read_p99_ms": p99(read_latencies),
+        "writes_per_s": len(write_latencies) / elapsed,
+        "write_p99_ms": p99(write_latencies),
+        "write_errors": len(write_errors)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark feed reads under concurrent event writes")
+    parser.add_argument("--posts", type=int, default=20000)
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    pool_size = args.readers + args.writers
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+
+        path = os.path.join(tmp, "shared.db")
+        seed(path, args.posts)
+        shared = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False},
+                               pool_size=pool_size, max_overflow=0)
+        factory = sessionmaker(bind=shared)
+        results["shared engine, default journal"] = run_profile(
+            factory, factory, args.posts, args.readers, args.writers, args.duration)
+        shared.dispose()
+
+        path = os.path.join(tmp, "split.db")
+        seed(path, args.posts)
+        writer_engine = create_db_engine(f"sqlite:///{path}", pool_size=args.writers, max_overflow=0)
+        reader_engine = create_db_engine(f"sqlite:///{path}", pool_size=args.readers, max_overflow=0,
+                                         read_only=True)
+        results["split engines, WAL profile"] = run_profile(
+            sessionmaker(bind=reader_engine), sessionmaker(bind=writer_engine),
+            args.posts, args.readers, args.writers, args.duration)
+        writer_engine.dispose()
+        reader_engine.dispose()
+
+    print(f"{args.readers} readers, {args.writers} writers, {args.duration:.0f}s per profile\n")
+    print(f"{'profile':<32} {'reads/s':>9} {'read p99':>9} {'writes/s':>9} {'write p99':>10} {'errors':>7}")
+    for name, result in results.items():
+        print(f"{name:<32} {result['reads_per_s']:>9.1f} {result['read_p99_ms']:>9.1f} "
+              f"{result['writes_per_s']:>9.1f} {result['write_p99_ms']:>10.1f} {result['write_errors']:>7}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Memory per API worker: independent workers vs preload-and-fork.
+
+`independent` starts each worker as a fresh interpreter that loads its own
+models, the way `uvicorn --workers N` does. `preload` loads the models once
+in the parent with app.core.prefork.preload_models and forks the workers, the
+way backend/gunicorn.conf.py does. Each worker scores a few batches so that
+it looks like a serving process, then the parent reads every process's
+/proc/<pid>/smaps_rollup:
+
+- RSS counts every page a process maps, shared or not
+- PSS splits each shared page between the processes mapping it, so PSS
+  summed over processes is what they use together
+- USS is memory private to one process, what stopping it would free
+
+The preload total includes the parent, which holds the shared weights.
+Linux only.
+
+Usage:
+    python benchmarks/worker_memory.py --workers 4
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+
+# Add the backend directory to the path to use the app's services
+sys.path.append(os.path.join(os.path.dirname(__file__), "../backend"))
+
+def read_memory(pid):
+    """RSS, PSS and USS of a process in bytes"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "uss": fields["Private_Clean"] + fields["Private_Dirty"],
+    }
+
+def exercise(recall, rank, batches):
+    """Run the inference a feed request does, so the worker touches what it serves with"""
+    post_ids = list(range(1, 101))
+    for user_id in range(1, batches + 1):
+        recall.embed_users(recall.build_user_features(str(user_id)))
+        rank.score(*rank.build_features(str(user_id), post_ids))
+
+def independent_worker(conn, threads, batches):
+    from app.core.prefork import configure_torch_threads
+    from app.services.rank_service import RankService
+    from app.services.recall_service import RecallService
+
+    configure_torch_threads(threads)
+    exercise(RecallService(connect_milvus=False), RankService(), batches)
+    conn.send("ready")
+    conn.recv()
+
+def forked_worker(conn, threads, batches):
+    from app.core.logger import restart_logging_after_fork
+    from app.core.prefork import configure_torch_threads
+    from app.services.registry import registry
+
+    restart_logging_after_fork()
+    configure_torch_threads(threads)
+    exercise(registry.get("recall"), registry.get("rank"), batches)
+    conn.send("ready")
+    conn.recv()
+
+def start_independent(workers, threads, batches):
+    context = multiprocessing.get_context("spawn")
+    started = []
+    for _ in range(workers):
+        parent_conn, child_conn = context.Pipe()
+        process = context.Process(target=independent_worker, args=(child_conn, threads, batches))
+        process.start()
+        started.append((process.pid, parent_conn, process.join))
+    return started
+
+def start_forked(workers, threads, batches):
+    started = []
+    for _ in range(workers):
+        parent_conn, child_conn = multiprocessing.Pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                forked_worker(child_conn, threads, batches)
+            finally:
+                os._exit(0)
+        started.append((pid, parent_conn, lambda pid=pid: os.waitpid(pid, 0)))
+    return started
+
+def measure(started):
+    """
+    Wait until every worker is ready, then read its memory and this
+    process's (whose PSS shrinks with every page the workers share) and stop it
+    """
+    for _, conn, _ in started:
+        conn.recv()
+    usage = [read_memory(pid) for pid, _, _ in started]
+    parent = read_memory(os.getpid())
+    for _, conn, wait in started:
+        conn.send("stop")
+        wait()
+    return usage, parent
+
+def report(mode, usage, extra_pss=0):
+    mib = 2 ** 20
+    count = len(usage)
+    mean = {key: sum(worker[key] for worker in usage) / count / mib for key in ("rss", "pss", "uss")}
+    total = (sum(worker["pss"] for worker in usage) + extra_pss) / mib
+    print(f"{mode:<12} {count:>7} {mean['rss']:>10.1f}M {mean['pss']:>10.1f}M {mean['uss']:>10.1f}M {total:>9.1f}M")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare API worker memory with and without preload-and-fork")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=1, help="torch threads per worker")
+    parser.add_argument("--batches", type=int, default=20, help="inference batches each worker runs")
+    args = parser.parse_args()
+
+    print(f"{'mode':<12} {'workers':>7} {'RSS/worker':>11} {'PSS/worker':>11} {'USS/worker':>11} {'total PSS':>10}")
+
+    # Independent workers first, before this process has loaded anything they could share
+    usage, _ = measure(start_independent(args.workers, args.threads, args.batches))
+    report("independent", usage)
+
+    from app.core.prefork import preload_models
+    preload_models()
+    usage, parent = measure(start_forked(args.workers, args.threads, args.batches))
+    report("preload", usage, extra_pss=parent["pss"])
+
+if __name__ == "__main__":
+    main()
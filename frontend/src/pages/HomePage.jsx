@@ -7,12 +7,19 @@ const HomePage = () => {
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
+    // Set when the effect is cleaned up, so a superseded stream stops adding posts
+    let cancelled = false;
+
     const fetchRecommendedPosts = async () => {
       try {
         // For demo purposes, we'll use a default user ID
         const userId = '1';
-        const recommendedPosts = await recommendationService.getHomeRecommendations(userId);
-        setPosts(recommendedPosts);
+        // Show each batch as it arrives instead of waiting for the whole feed
+        await recommendationService.streamHomeRecommendations(userId, (batch) => {
+          if (cancelled) return;
+          setPosts((current) => [...current, ...batch]);
+          setLoading(false);
+        });
       } catch (error) {
         console.error('Error fetching recommended posts:', error);
       } finally {
@@ -21,6 +28,9 @@ const HomePage = () => {
     };
 
     fetchRecommendedPosts();
+    return () => {
+      cancelled = true;
+    };
   }, []);
 
   if (loading) {
@@ -45,6 +45,52 @@ const recommendationService = {
     }
   },
 
+  // Stream home page recommendations, calling onPosts with each batch as it
+  // arrives so the first posts render before the whole feed is ranked.
+  // Resolves with every post received.
+  async streamHomeRecommendations(userId, onPosts) {
+    const received = [];
+    try {
+      const response = await fetch(`${API_BASE_URL}/recommend/home/stream?user_id=${encodeURIComponent(userId)}`, {
+        headers: { Accept: 'application/x-ndjson' }
+      });
+      if (!response.ok || !response.body) {
+        throw new Error(`Stream request failed with status ${response.status}`);
+      }
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffered = '';
+      for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffered += decoder.decode(value, { stream: true });
+        const lines = buffered.split('\n');
+        buffered = lines.pop();
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const event = JSON.parse(line);
+          if (event.type === 'posts') {
+            received.push(...event.posts);
+            onPosts(event.posts);
+          } else if (event.type === 'error') {
+            throw new Error(event.detail);
+          }
+        }
+      }
+      return received;
+    } catch (error) {
+      console.error('Error streaming recommendations:', error);
+      if (received.length > 0) {
+        // Keep what already arrived rather than replacing it
+        return received;
+      }
+      const posts = await this.getHomeRecommendations(userId);
+      onPosts(posts);
+      return posts;
+    }
+  },
+
   // Get initial recommendations for new users
   async getInitialRecommendations(userId) {
     try {
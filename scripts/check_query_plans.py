@@ -0,0 +1,175 @@
+"""
+Fail when a hot recommender query regresses to a full table scan.
+
+Builds a throwaway SQLite database from the Alembic migrations, seeds it with
+a large synthetic dataset, runs ANALYZE, and then runs EXPLAIN QUERY PLAN on
+each hot statement in InterestBasedRecommender. Any plan step that scans a
+large table without an index makes the script exit non-zero.
+
+Usage:
+    python scripts/check_query_plans.py
+    python scripts/check_query_plans.py --posts 500000 --events 1000000
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Add the backend directory to the path to use the app's models and queries
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..", "backend")
+sys.path.append(BACKEND_DIR)
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+from app.models import Interest, Post, User, UserBehaviorScore, UserEvent, UserInterestWeight, user_interests
+from app.services.event_store import event_store, is_partition_table
+from app.services.interest_based_recommender import interest_recommender
+
+NUM_INTERESTS = 500
+CHUNK_SIZE = 50000
+
+# Tables big enough that a full scan on the request path is a regression
+LARGE_TABLES = {
+    "users", "posts", "user_events", "user_interests",
+    "user_interest_weights", "user_behavior_scores", "event_daily_aggregates",
+}
+
+FULL_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+
+def migrate(url):
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+    config.set_main_option("sqlalchemy.url", url)
+    command.upgrade(config, "head")
+
+def insert_chunked(conn, table, rows):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        conn.execute(insert(table), rows[start:start + CHUNK_SIZE])
+
+def seed(engine, num_users, num_posts, num_events, rng):
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        insert_chunked(conn, Interest.__table__, [
+            {"id": i, "name": f"interest{i}", "category": "seed", "subcategory": "seed"}
+            for i in range(1, NUM_INTERESTS + 1)
+        ])
+        insert_chunked(conn, User.__table__, [
+            {"id": i, "username": f"user{i}", "email": f"user{i}@example.com", "has_completed_onboarding": True}
+            for i in range(1, num_users + 1)
+        ])
+
+        interests = rng.integers(1, NUM_INTERESTS + 1, size=num_posts)
+        authors = rng.integers(1, num_users + 1, size=num_posts)
+        ages = rng.integers(0, 60 * 24 * 90, size=num_posts)
+        insert_chunked(conn, Post.__table__, [
+            {
+                "id": i + 1,
+                "title": f"post {i + 1}",
+                "content": "seed",
+                "author_id": int(authors[i]),
+                "primary_interest_id": int(interests[i]),
+                "secondary_interest_ids": f"[{int(interests[i]) % NUM_INTERESTS + 1}]",
+                "created_at": now - timedelta(minutes=int(ages[i])),
+                "is_deleted": bool(i % 50 == 0)
+            }
+            for i in range(num_posts)
+        ])
+
+        pairs = [(user_id, int(interest_id))
+                 for user_id in range(1, num_users + 1)
+                 for interest_id in rng.choice(np.arange(1, NUM_INTERESTS + 1), size=5, replace=False)]
+        insert_chunked(conn, user_interests, [{"user_id": u, "interest_id": i} for u, i in pairs])
+        insert_chunked(conn, UserInterestWeight.__table__,
+                       [{"user_id": u, "interest_id": i, "weight": 1.0} for u, i in pairs])
+        insert_chunked(conn, UserBehaviorScore.__table__,
+                       [{"user_id": u, "interest_id": i, "score": 0.0, "interaction_count": 0} for u, i in pairs])
+
+        event_users = rng.integers(1, num_users + 1, size=num_events)
+        event_posts = rng.integers(1, num_posts + 1, size=num_events)
+        event_ages = rng.integers(0, 60 * 24 * 60, size=num_events)
+        insert_chunked(conn, UserEvent.__table__, [
+            {
+                "user_id": int(event_users[i]),
+                "post_id": int(event_posts[i]),
+                "event_type": "view",
+                "timestamp": now - timedelta(minutes=int(event_ages[i]))
+            }
+            for i in range(num_events)
+        ])
+
+        conn.exec_driver_sql("ANALYZE")
+
+def hot_queries(layout):
+    """The statements the recommendation and event paths issue per request"""
+    r = interest_recommender
+    interest_ids = [3, 17, 42, 99, 256]
+    return {
+        "user interests": r._user_interests_stmt(7),
+        "user interest weights": r._user_interest_weights_stmt(7),
+        "user behavior scores": r._user_behavior_scores_stmt(7),
+        "primary interest candidates": r._primary_interest_stmt(interest_ids, 40),
+        "secondary interest candidates": r._secondary_interest_stmt(40),
+        "popular candidates": r._popular_stmt(datetime.utcnow() - timedelta(days=7), 20, layout),
+        "fresh candidates": r._fresh_stmt(20),
+        "rank features": r._rank_features_stmt(list(range(1000, 1060))),
+        "hydrate posts": r._hydrate_stmt(list(range(1000, 1040))),
+        "behavior score update": r._behavior_score_update_stmt(7, 42, 0.3, "sqlite"),
+    }
+
+def is_full_scan(step):
+    match = FULL_SCAN.match(step)
+    return bool(match) and (match.group(1) in LARGE_TABLES or is_partition_table(match.group(1)))
+
+def explain(conn, stmt):
+    compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).all()
+    return [row[-1] for row in rows]
+
+def main():
+    parser = argparse.ArgumentParser(description="Check hot-query plans for full table scans")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--posts", type=int, default=200000)
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'plans.db')}"
+        migrate(url)
+        engine = create_engine(url)
+        seed(engine, args.users, args.posts, args.events, np.random.default_rng(args.seed))
+        print(f"Seeded {args.users} users, {args.posts} posts, {args.events} events")
+
+        # Compact so the popularity query reads aggregates and monthly partitions as in production
+        with Session(engine) as db:
+            stats = event_store.compact(db)
+            layout = event_store.load_layout(db)
+        print(f"Compacted events: {stats}\n")
+
+        failures = []
+        with engine.connect() as conn:
+            for name, stmt in hot_queries(layout).items():
+                plan = explain(conn, stmt)
+                scans = [step for step in plan if is_full_scan(step)]
+                status = "FAIL" if scans else "ok"
+                print(f"[{status}] {name}")
+                for step in plan:
+                    print(f"       {step}")
+                if scans:
+                    failures.append(name)
+        engine.dispose()
+
+    if failures:
+        print(f"\n{len(failures)} hot queries scan large tables: {', '.join(failures)}")
+        sys.exit(1)
+    print("\nAll hot queries use indexes")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Compact user events: roll complete days into daily aggregates, move closed
+months into monthly partition tables, and delete raw events past retention.
+
+Safe to run repeatedly (e.g. daily from cron); each step only handles what
+the previous run left behind.
+
+Usage:
+    python scripts/compact_events.py
+    python scripts/compact_events.py --retention-days 30
+"""
+import argparse
+import os
+import sys
+
+# Add the backend directory to the path to share settings with the API
+sys.path.append(os.path.join(os.path.dirname(__file__), "../backend"))
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.event_store import event_store
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact user events into partitions and daily aggregates")
+    parser.add_argument("--retention-days", type=int, default=settings.event_retention_days,
+                        help="keep raw events this many days (default from settings)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        stats = event_store.compact(db, retention_days=args.retention_days)
+        layout = event_store.load_layout(db)
+    finally:
+        db.close()
+
+    print(f"Aggregated {stats['aggregated_rows']} (user, post, event type, day) rows")
+    print(f"Moved {stats['partitioned_events']} events into monthly partitions")
+    print(f"Dropped {stats['dropped_events']} raw events older than {args.retention_days} days")
+    print(f"Aggregates cover through {layout.watermark or 'nothing yet'}; "
+          f"{len(layout.partitions)} monthly partitions")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Export user-post interactions for model training as per-day counts.
+
+Rows are (user_id, post_id, event_type, day, count), read from the daily
+aggregates plus raw events after the last compacted day, so the export never
+scans the full raw event history.
+
+Usage:
+    python scripts/export_training_events.py --output interactions.csv
+    python scripts/export_training_events.py --output recent.csv --days 30
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Add the backend directory to the path to share settings with the API
+sys.path.append(os.path.join(os.path.dirname(__file__), "../backend"))
+
+from app.db.session import ReadSessionLocal
+from app.services.event_store import event_store
+
+BATCH_SIZE = 10000
+
+def main():
+    parser = argparse.ArgumentParser(description="Export daily interaction counts for training")
+    parser.add_argument("--output", required=True, help="CSV file to write")
+    parser.add_argument("--days", type=int, default=None, help="only export the last N days")
+    args = parser.parse_args()
+
+    since = (datetime.utcnow() - timedelta(days=args.days)).date() if args.days else None
+    db = ReadSessionLocal()
+    try:
+        start = time.perf_counter()
+        layout = event_store.load_layout(db)
+        counts = event_store.daily_counts(layout, db.get_bind().dialect.name, since=since)
+        rows = db.execute(counts.select().execution_options(yield_per=BATCH_SIZE))
+
+        written = 0
+        with open(args.output, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["user_id", "post_id", "event_type", "day", "count"])
+            for partition in rows.partitions():
+                writer.writerows(
+                    (user_id, post_id, event_type, day.isoformat(), count)
+                    for user_id, post_id, event_type, day, count in partition
+                )
+                written += len(partition)
+    finally:
+        db.close()
+
+    print(f"Exported {written} rows to {args.output} in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,502 @@
+"""
+Generate a large synthetic dataset for load and capacity testing.
+
+Everything is generated in vectorized NumPy chunks and written with bulk
+inserts, so millions of rows take minutes rather than hours:
+
+- interests: the real catalog from interests_data.py, with a skewed
+  popularity (a few categories and interests dominate)
+- users: each picks a handful of interests, concentrated in one home category
+- posts: primary interests follow interest popularity, secondary interests
+  come from the same subcategory, authors follow a Zipf distribution (a few
+  prolific posters), and newer posts are more common
+- user events: post popularity and user activity are Zipf-distributed; most
+  events land on posts in the user's own interests, after the post was
+  created, with a realistic mix of event types
+
+The output is a SQLite or Postgres database (created from the Alembic
+migrations; it must not already contain users) or a directory of Parquet
+files (`parquet:DIR`, needs pyarrow). Matching item and user embedding files
+are written too, clustered by interest. Load them into the vector index with
+`scripts/populate_milvus.py --embeddings DIR`, and derive behavior scores
+with `scripts/rebuild_behavior_scores.py`.
+
+Usage:
+    python scripts/generate_dataset.py sqlite:///load.db
+    python scripts/generate_dataset.py postgresql://raddit@localhost/raddit_load --scale 100
+    python scripts/generate_dataset.py parquet:data/load --users 2000000 --posts 5000000 --events 50000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Add the backend directory to the path to use the app's models and interest catalog
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..", "backend")
+sys.path.append(BACKEND_DIR)
+
+from sqlalchemy import create_engine, event, func, insert, select
+from app.core.config import settings
+from app.data.interests_data import get_all_interests
+from app.models import Interest, Post, User, UserBehaviorScore, UserEvent, UserInterestWeight, user_interests
+
+# Rows generated and written at a time
+CHUNK_SIZE = 100000
+# Rows of the users x interests score matrix built at a time when picking interests
+INTEREST_PICK_CHUNK = 10000
+
+# Per-unit-of-scale sizes
+USERS_PER_SCALE = 10000
+POSTS_PER_SCALE = 20000
+EVENTS_PER_SCALE = 200000
+
+EVENT_TYPES = ('view', 'click', 'upvote', 'downvote', 'save', 'comment', 'share')
+EVENT_TYPE_SHARES = (0.62, 0.22, 0.07, 0.015, 0.035, 0.025, 0.015)
+
+TITLE_TEMPLATES = (
+    "What I learned about {interest} this year",
+    "Beginner question about {interest}",
+    "The state of {interest} in one chart",
+    "Unpopular opinion: {interest} is overrated",
+    "Resources for getting into {interest}?",
+    "Weekly {interest} discussion thread",
+    "A deep dive into {interest}",
+    "{interest}: what are you working on?",
+)
+
+WORDS = ("the", "of", "and", "a", "to", "in", "is", "that", "for", "it", "with", "as", "was", "on",
+         "project", "community", "thread", "result", "question", "idea", "data", "update", "review")
+
+class Sampler:
+    """Draws indexes 0..n-1 in proportion to fixed weights, via the cumulative distribution"""
+
+    def __init__(self, weights: np.ndarray):
+        self.cdf = np.cumsum(weights, dtype=np.float64)
+        self.cdf /= self.cdf[-1]
+
+    def sample(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        return np.minimum(np.searchsorted(self.cdf, rng.random(size), side="right"), len(self.cdf) - 1)
+
+def zipf_weights(n: int, exponent: float) -> np.ndarray:
+    """Bounded Zipf: the weight of rank r is 1 / r^exponent"""
+    return 1.0 / np.arange(1, n + 1, dtype=np.float64) ** exponent
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def to_datetimes(now: np.datetime64, seconds: np.ndarray) -> np.ndarray:
+    return now - seconds.astype("timedelta64[s]")
+
+class SyntheticDataset:
+    """Generates the tables in dependency order, one column dict per chunk"""
+
+    def __init__(self, num_users: int, num_posts: int, num_events: int, days: int, seed: int,
+                 interest_affinity: float = 0.7, embedding_dim: int = 64):
+        self.rng = np.random.default_rng(seed)
+        self.num_users = num_users
+        self.num_posts = num_posts
+        self.num_events = num_events
+        self.window = days * 86400
+        self.interest_affinity = interest_affinity
+        self.embedding_dim = embedding_dim
+        self.now = np.datetime64(np.datetime64("now", "s"), "us")
+
+        # Interest names are unique in the table, but a few repeat across subcategories
+        catalog = {}
+        for interest in get_all_interests():
+            catalog.setdefault(interest["name"], interest)
+        self.interests = list(catalog.values())
+
+        categories = sorted({interest["category"] for interest in self.interests})
+        subcategories = sorted({(interest["category"], interest["subcategory"]) for interest in self.interests})
+        self.interest_category = np.array([categories.index(i["category"]) for i in self.interests])
+        self.interest_subcategory = np.array(
+            [subcategories.index((i["category"], i["subcategory"])) for i in self.interests]
+        )
+
+        # Popularity: Zipf over shuffled categories, times Zipf over shuffled interests within each
+        rng = self.rng
+        category_weights = zipf_weights(len(categories), 1.0)[rng.permutation(len(categories))]
+        interest_weights = np.empty(len(self.interests))
+        for category in range(len(categories)):
+            members = np.flatnonzero(self.interest_category == category)
+            within = zipf_weights(len(members), 0.8)[rng.permutation(len(members))]
+            interest_weights[members] = category_weights[category] * within / within.sum()
+        self.interest_weights = interest_weights / interest_weights.sum()
+        self.category_weights = category_weights / category_weights.sum()
+
+        # Interests grouped by subcategory, for drawing related secondary interests
+        self.by_subcategory = np.argsort(self.interest_subcategory, kind="stable")
+        self.subcategory_sizes = np.bincount(self.interest_subcategory, minlength=len(subcategories))
+        self.subcategory_starts = np.concatenate([[0], np.cumsum(self.subcategory_sizes)[:-1]])
+
+        # Filled in as users and posts are generated; events and embeddings depend on them
+        self.user_interest_offsets = None
+        self.user_interest_ids = None
+        self.post_primary = None
+        self.post_secondary = None
+        self.post_created = None
+        self.post_deleted = None
+
+    # Interests
+
+    def interest_rows(self):
+        yield {
+            "id": np.arange(1, len(self.interests) + 1),
+            "name": [i["name"] for i in self.interests],
+            "category": [i["category"] for i in self.interests],
+            "subcategory": [i["subcategory"] for i in self.interests],
+            "description": [f"{i['category']} - {i['subcategory']}: {i['name']}" for i in self.interests],
+        }
+
+    # Users and their interest selections
+
+    def user_rows(self, hashed_password: str):
+        rng = self.rng
+        for start in range(0, self.num_users, CHUNK_SIZE):
+            ids = np.arange(start + 1, min(start + CHUNK_SIZE, self.num_users) + 1)
+            # Accounts were created before the event window, older ones first
+            ages = self.window + rng.random(len(ids)) * self.window * 4
+            yield {
+                "id": ids,
+                "username": [f"user{i}" for i in ids.tolist()],
+                "email": [f"user{i}@example.com" for i in ids.tolist()],
+                "hashed_password": [hashed_password] * len(ids),
+                "is_active": np.ones(len(ids), dtype=bool),
+                "has_completed_onboarding": np.ones(len(ids), dtype=bool),
+                "created_at": to_datetimes(self.now, ages),
+                "updated_at": to_datetimes(self.now, ages),
+            }
+
+    def pick_user_interests(self):
+        """Choose each user's interests; keeps them as CSR arrays for event generation"""
+        rng = self.rng
+        counts = np.clip(1 + rng.poisson(4, size=self.num_users), 1, 15)
+        max_count = int(counts.max())
+        log_weights = np.log(self.interest_weights).astype(np.float32)
+        home_sampler = Sampler(self.category_weights)
+
+        picks = []
+        for start in range(0, self.num_users, INTEREST_PICK_CHUNK):
+            chunk_counts = counts[start:start + INTEREST_PICK_CHUNK]
+            home = home_sampler.sample(rng, len(chunk_counts))
+            # Gumbel top-k samples without replacement in proportion to the (boosted) weights
+            scores = log_weights + rng.gumbel(size=(len(chunk_counts), len(log_weights))).astype(np.float32)
+            scores += 1.5 * (self.interest_category[None, :] == home[:, None])
+            top = np.argpartition(-scores, max_count - 1, axis=1)[:, :max_count]
+            order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            picks.append(top[np.arange(max_count)[None, :] < chunk_counts[:, None]])
+
+        self.user_interest_offsets = np.concatenate([[0], np.cumsum(counts)])
+        self.user_interest_ids = np.concatenate(picks).astype(np.int32) + 1
+
+    def user_interest_rows(self):
+        """Yield (table, columns) chunks for user_interests, user_interest_weights and user_behavior_scores"""
+        rng = self.rng
+        counts = np.diff(self.user_interest_offsets)
+        user_ids = np.repeat(np.arange(1, self.num_users + 1), counts)
+        for start in range(0, len(user_ids), CHUNK_SIZE):
+            users = user_ids[start:start + CHUNK_SIZE]
+            interests = self.user_interest_ids[start:start + CHUNK_SIZE]
+            ones = np.ones(len(users))
+            yield user_interests, {"user_id": users, "interest_id": interests, "initial_weight": ones}
+            # Weights have drifted from the onboarding default of 1.0
+            weights = np.clip(rng.lognormal(0.0, 0.35, size=len(users)), 0.1, 5.0).round(3)
+            yield UserInterestWeight.__table__, {"user_id": users, "interest_id": interests, "weight": weights}
+            yield UserBehaviorScore.__table__, {
+                "user_id": users, "interest_id": interests,
+                "score": np.zeros(len(users)), "interaction_count": np.zeros(len(users), dtype=np.int64)
+            }
+
+    # Posts
+
+    def generate_posts(self):
+        rng = self.rng
+        num_posts = self.num_posts
+        self.post_primary = Sampler(self.interest_weights).sample(rng, num_posts).astype(np.int32)
+
+        # Up to two secondary interests from the primary interest's subcategory
+        subcategory = self.interest_subcategory[self.post_primary]
+        secondary = np.full((num_posts, 2), -1, dtype=np.int32)
+        num_secondary = rng.choice(3, size=num_posts, p=(0.3, 0.5, 0.2))
+        for slot in range(2):
+            offsets = (rng.random(num_posts) * self.subcategory_sizes[subcategory]).astype(np.int64)
+            candidates = self.by_subcategory[self.subcategory_starts[subcategory] + offsets]
+            keep = (num_secondary > slot) & (candidates != self.post_primary)
+            secondary[keep, slot] = candidates[keep]
+        secondary[secondary[:, 0] == secondary[:, 1], 1] = -1
+        self.post_secondary = secondary
+
+        # More posts are recent than old
+        self.post_created = self.window * rng.random(num_posts) ** 1.5
+        self.post_deleted = rng.random(num_posts) < 0.01
+
+    def post_rows(self):
+        rng = self.rng
+        author_sampler = Sampler(zipf_weights(self.num_users, 1.05))
+        author_order = rng.permutation(self.num_users) + 1
+        slugs = [interest["name"].lower().replace(" ", "-") for interest in self.interests]
+        names = [interest["name"] for interest in self.interests]
+        bodies = [" ".join(rng.choice(WORDS, size=int(length))) for length in rng.integers(20, 400, size=64)]
+
+        for start in range(0, self.num_posts, CHUNK_SIZE):
+            end = min(start + CHUNK_SIZE, self.num_posts)
+            ids = np.arange(start + 1, end + 1)
+            primary = self.post_primary[start:end]
+            secondary = self.post_secondary[start:end]
+            templates = rng.integers(0, len(TITLE_TEMPLATES), size=len(ids))
+            body_ids = rng.integers(0, len(bodies), size=len(ids))
+            yield {
+                "id": ids,
+                "title": [TITLE_TEMPLATES[t].format(interest=names[p])
+                          for t, p in zip(templates.tolist(), primary.tolist())],
+                "content": [bodies[b] for b in body_ids.tolist()],
+                "author_id": author_order[author_sampler.sample(rng, len(ids))],
+                "created_at": to_datetimes(self.now, self.post_created[start:end]),
+                "is_deleted": self.post_deleted[start:end],
+                "primary_interest_id": primary + 1,
+                "secondary_interest_ids": [
+                    "[" + ", ".join(str(i + 1) for i in pair if i >= 0) + "]" for pair in secondary.tolist()
+                ],
+                "content_tags": [f'["{slugs[p]}"]' for p in primary.tolist()],
+            }
+
+    # Events
+
+    def event_rows(self):
+        rng = self.rng
+        user_sampler = Sampler(zipf_weights(self.num_users, 0.8))
+        user_order = rng.permutation(self.num_users)
+        post_sampler = Sampler(zipf_weights(self.num_posts, 1.0))
+        post_order = rng.permutation(self.num_posts)
+        type_sampler = Sampler(np.array(EVENT_TYPE_SHARES))
+        event_types = np.array(EVENT_TYPES)
+
+        # Posts of each interest, most popular first (following the global popularity order)
+        by_interest = post_order[np.argsort(self.post_primary[post_order], kind="stable")]
+        interest_sizes = np.bincount(self.post_primary, minlength=len(self.interests))
+        interest_starts = np.concatenate([[0], np.cumsum(interest_sizes)[:-1]])
+        user_counts = np.diff(self.user_interest_offsets)
+
+        for start in range(0, self.num_events, CHUNK_SIZE):
+            size = min(CHUNK_SIZE, self.num_events - start)
+            users = user_order[user_sampler.sample(rng, size)]
+            posts = post_order[post_sampler.sample(rng, size)]
+
+            # Most events are on posts in one of the user's own interests, with a heavy head
+            slots = self.user_interest_offsets[users] + (rng.random(size) * user_counts[users]).astype(np.int64)
+            interests = self.user_interest_ids[slots] - 1
+            available = interest_sizes[interests]
+            own = (rng.random(size) < self.interest_affinity) & (available > 0)
+            ranks = (available * rng.random(size) ** 3).astype(np.int64)
+            posts[own] = by_interest[interest_starts[interests[own]] + ranks[own]]
+
+            # Events follow the post's creation, mostly within the first day
+            created = self.post_created[posts]
+            ages = created - rng.exponential(12 * 3600, size=size)
+            late = ages < 0
+            ages[late] = created[late] * rng.random(int(late.sum()))
+
+            types = type_sampler.sample(rng, size)
+            engaged = types >= 2
+            scores = np.where(engaged, rng.beta(5, 2, size=size), rng.beta(2, 5, size=size)).round(3)
+            yield {
+                "id": np.arange(start + 1, start + size + 1),
+                "user_id": users + 1,
+                "post_id": posts + 1,
+                "event_type": event_types[types],
+                "engagement_score": scores,
+                "timestamp": to_datetimes(self.now, ages),
+            }
+
+    # Embeddings
+
+    def write_embeddings(self, directory: str):
+        """Item embeddings for live posts and user embeddings, clustered by interest"""
+        rng = self.rng
+        os.makedirs(directory, exist_ok=True)
+        dim = self.embedding_dim
+        subcategory_centers = normalize(rng.standard_normal((len(self.subcategory_sizes), dim)))
+        interest_centers = normalize(
+            subcategory_centers[self.interest_subcategory] + 0.6 * normalize(rng.standard_normal((len(self.interests), dim)))
+        ).astype(np.float32)
+
+        live = np.flatnonzero(~self.post_deleted)
+        post_ids = np.lib.format.open_memmap(os.path.join(directory, "post_ids.npy"), mode="w+",
+                                             dtype=np.int64, shape=(len(live),))
+        post_embeddings = np.lib.format.open_memmap(os.path.join(directory, "post_embeddings.npy"), mode="w+",
+                                                    dtype=np.float32, shape=(len(live), dim))
+        for start in range(0, len(live), CHUNK_SIZE):
+            rows = live[start:start + CHUNK_SIZE]
+            vectors = interest_centers[self.post_primary[rows]].copy()
+            secondary = self.post_secondary[rows]
+            for slot in range(2):
+                has = secondary[:, slot] >= 0
+                vectors[has] += 0.3 * interest_centers[secondary[has, slot]]
+            vectors += 0.4 * rng.standard_normal(vectors.shape).astype(np.float32) / np.sqrt(dim)
+            post_ids[start:start + len(rows)] = rows + 1
+            post_embeddings[start:start + len(rows)] = normalize(vectors)
+        post_ids.flush()
+        post_embeddings.flush()
+
+        user_ids = np.arange(1, self.num_users + 1, dtype=np.int64)
+        np.save(os.path.join(directory, "user_ids.npy"), user_ids)
+        user_embeddings = np.lib.format.open_memmap(os.path.join(directory, "user_embeddings.npy"), mode="w+",
+                                                    dtype=np.float32, shape=(self.num_users, dim))
+        counts = np.diff(self.user_interest_offsets)
+        for start in range(0, self.num_users, CHUNK_SIZE):
+            end = min(start + CHUNK_SIZE, self.num_users)
+            lo, hi = self.user_interest_offsets[start], self.user_interest_offsets[end]
+            owners = np.repeat(np.arange(end - start), counts[start:end])
+            vectors = np.zeros((end - start, dim), dtype=np.float32)
+            np.add.at(vectors, owners, interest_centers[self.user_interest_ids[lo:hi] - 1])
+            vectors += 0.5 * rng.standard_normal(vectors.shape).astype(np.float32) / np.sqrt(dim)
+            user_embeddings[start:end] = normalize(vectors)
+        user_embeddings.flush()
+        return len(live)
+
+# Writers
+
+class DatabaseWriter:
+    """Bulk-inserts column chunks into a database migrated to the current schema"""
+
+    def __init__(self, url: str):
+        from alembic import command
+        from alembic.config import Config
+
+        self.engine = create_engine(url)
+        if self.engine.dialect.name == "sqlite":
+            # A throwaway load database does not need durability while loading
+            @event.listens_for(self.engine, "connect")
+            def _fast_load(dbapi_connection, connection_record):
+                cursor = dbapi_connection.cursor()
+                cursor.execute("PRAGMA journal_mode=WAL")
+                cursor.execute("PRAGMA synchronous=OFF")
+                cursor.execute("PRAGMA cache_size=-262144")
+                cursor.close()
+
+        config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+        config.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+        config.set_main_option("sqlalchemy.url", url)
+        command.upgrade(config, "head")
+
+        with self.engine.connect() as conn:
+            if conn.execute(select(func.count()).select_from(User.__table__)).scalar():
+                sys.exit(f"{url} already has users; generate into an empty database")
+
+    def write(self, table, columns):
+        keys = list(columns)
+        values = [column.tolist() if isinstance(column, np.ndarray) else column for column in columns.values()]
+        rows = [dict(zip(keys, row)) for row in zip(*values)]
+        with self.engine.begin() as conn:
+            conn.execute(insert(table), rows)
+
+    def finish(self):
+        with self.engine.begin() as conn:
+            if self.engine.dialect.name == "postgresql":
+                # Rows were inserted with explicit IDs, so move the sequences past them
+                for table in ("interests", "users", "posts", "user_events",
+                              "user_interest_weights", "user_behavior_scores"):
+                    conn.exec_driver_sql(
+                        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                        f"COALESCE((SELECT MAX(id) FROM {table}), 1))"
+                    )
+            conn.exec_driver_sql("ANALYZE")
+        self.engine.dispose()
+
+class ParquetWriter:
+    """Writes each chunk as one part file under DIR/<table>/"""
+
+    def __init__(self, directory: str):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            sys.exit("Parquet output needs pyarrow (pip install pyarrow)")
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.directory = directory
+        self.parts = {}
+
+    def write(self, table, columns):
+        part = self.parts.get(table.name, 0)
+        self.parts[table.name] = part + 1
+        path = os.path.join(self.directory, table.name)
+        os.makedirs(path, exist_ok=True)
+        self.pq.write_table(self.pa.table(dict(columns)), os.path.join(path, f"part-{part:05d}.parquet"))
+
+    def finish(self):
+        pass
+
+def hash_password(password: str) -> str:
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], bcrypt__rounds=settings.bcrypt_rounds).hash(password)
+
+def report(name, rows, started):
+    elapsed = time.perf_counter() - started
+    print(f"  {name:<20} {rows:>12,} rows {elapsed:>8.1f}s {rows / max(elapsed, 1e-9):>12,.0f} rows/s")
+
+def write_table(writer, name, chunks, table=None):
+    """Write (columns) or (table, columns) chunks and report throughput"""
+    started = time.perf_counter()
+    rows = 0
+    for chunk in chunks:
+        chunk_table, columns = (table, chunk) if table is not None else chunk
+        writer.write(chunk_table, columns)
+        rows += len(next(iter(columns.values())))
+    report(name, rows, started)
+
+def generate(dataset, writer, embeddings_dir, password="password"):
+    """Write every table, then the embedding files"""
+    started = time.perf_counter()
+    write_table(writer, "interests", dataset.interest_rows(), table=Interest.__table__)
+    write_table(writer, "users", dataset.user_rows(hash_password(password)), table=User.__table__)
+    dataset.pick_user_interests()
+    write_table(writer, "user interests (x3)", dataset.user_interest_rows())
+    dataset.generate_posts()
+    write_table(writer, "posts", dataset.post_rows(), table=Post.__table__)
+    write_table(writer, "user events", dataset.event_rows(), table=UserEvent.__table__)
+    writer.finish()
+
+    embeddings_started = time.perf_counter()
+    num_embedded = dataset.write_embeddings(embeddings_dir)
+    report("post embeddings", num_embedded, embeddings_started)
+    print(f"Done in {time.perf_counter() - started:.1f}s; embeddings in {embeddings_dir}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic dataset for load testing")
+    parser.add_argument("output", help="SQLAlchemy database URL, or parquet:DIR")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help=f"multiplier for the default sizes ({USERS_PER_SCALE} users, "
+                             f"{POSTS_PER_SCALE} posts, {EVENTS_PER_SCALE} events)")
+    parser.add_argument("--users", type=int, default=None)
+    parser.add_argument("--posts", type=int, default=None)
+    parser.add_argument("--events", type=int, default=None)
+    parser.add_argument("--days", type=int, default=30, help="span of post creation and event history")
+    parser.add_argument("--interest-affinity", type=float, default=0.7,
+                        help="share of events on posts in the user's own interests")
+    parser.add_argument("--password", default="password", help="password every generated user can log in with")
+    parser.add_argument("--embeddings-dir", default="synthetic_embeddings")
+    parser.add_argument("--embedding-dim", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    num_users = args.users or int(USERS_PER_SCALE * args.scale)
+    num_posts = args.posts or int(POSTS_PER_SCALE * args.scale)
+    num_events = args.events if args.events is not None else int(EVENTS_PER_SCALE * args.scale)
+
+    if args.output.startswith("parquet:"):
+        writer = ParquetWriter(args.output[len("parquet:"):])
+    else:
+        writer = DatabaseWriter(args.output)
+
+    dataset = SyntheticDataset(num_users, num_posts, num_events, args.days, args.seed,
+                               interest_affinity=args.interest_affinity, embedding_dim=args.embedding_dim)
+    print(f"Generating {num_users:,} users, {num_posts:,} posts and {num_events:,} events into {args.output}")
+    generate(dataset, writer, args.embeddings_dir, password=args.password)
+
+if __name__ == "__main__":
+    main()
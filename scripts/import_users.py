@@ -0,0 +1,61 @@
+"""
+Bulk-import users and their interest selections from CSV or JSONL.
+
+Input records have username, email, interests and either a plaintext
+password (hashed here, in parallel across processes) or an existing bcrypt
+hashed_password. CSV interests are semicolon-separated IDs:
+
+    username,email,password,interests
+    alice,alice@example.com,secret,1;4;9
+
+Progress is checkpointed after every chunk; rerunning the same command
+resumes where it stopped.
+
+Usage:
+    python scripts/import_users.py users.csv
+    python scripts/import_users.py users.jsonl --chunk-size 5000 --hash-workers 8
+"""
+import argparse
+import os
+import sys
+
+# Add the backend directory to the path to share settings with the API
+sys.path.append(os.path.join(os.path.dirname(__file__), "../backend"))
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.user_import import import_users
+
+def report(stats):
+    rates = stats.rates()
+    print(f"  {stats.records} records read, {stats.users} users imported, {stats.skipped} skipped | "
+          f"{rates['users_per_s']:.0f} users/s, {rates['rows_per_s']:.0f} rows/s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-import users from CSV or JSONL")
+    parser.add_argument("path", help="input .csv or .jsonl file")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="users per transaction")
+    parser.add_argument("--hash-workers", type=int, default=None, help="password hashing processes (default: CPUs)")
+    parser.add_argument("--bcrypt-rounds", type=int, default=settings.bcrypt_rounds)
+    parser.add_argument("--checkpoint", default=None, help="checkpoint file (default: <path>.checkpoint)")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    args = parser.parse_args()
+
+    checkpoint = args.checkpoint or f"{args.path}.checkpoint"
+    if args.restart and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+    print(f"Importing {args.path} in chunks of {args.chunk_size}")
+    stats = import_users(
+        SessionLocal, args.path,
+        chunk_size=args.chunk_size,
+        hash_workers=args.hash_workers,
+        bcrypt_rounds=args.bcrypt_rounds,
+        checkpoint_path=checkpoint,
+        progress=report
+    )
+    print("Done:")
+    report(stats)
+
+if __name__ == "__main__":
+    main()
@@ -5,14 +5,27 @@ from sqlalchemy.orm import sessionmaker
 from app.models import Base, User, Post
 from app.db.session import SessionLocal
 
+def migrate_db():
+    """Bring the schema up to date with Alembic migrations"""
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import inspect
+    from app.db.session import engine
+    
+    config = Config(os.path.join(os.path.dirname(__file__), "..", "backend", "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(os.path.dirname(__file__), "..", "backend", "migrations"))
+    
+    # Databases created by create_all before migrations existed match the initial revision
+    tables = inspect(engine).get_table_names()
+    if "users" in tables and "alembic_version" not in tables:
+        command.stamp(config, "0001")
+    
+    command.upgrade(config, "head")
+
 def init_db():
     """Initialize the database with tables and sample data"""
-    # Import all models to ensure they are registered
-    from app.models import Base
-    
-    # Create all tables
-    from app.db.session import engine
-    Base.metadata.create_all(bind=engine)
+    # Create or upgrade all tables
+    migrate_db()
     
     # Add sample data
     db = SessionLocal()
@@ -1,99 +1,285 @@
+"""
+Build post embeddings into Milvus without taking recall offline.
+
+Posts are read from the database in keyset-paginated chunks, embedded with
+batched item-tower forward passes (in-process or across model worker
+processes), and inserted in bounded batches into a fresh build collection.
+Serving always reads through the alias named by MILVUS_COLLECTION_NAME; once
+the build collection is complete, indexed and loaded, the alias is switched
+to it in one step, so recall never sees a half-built index.
+
+Progress is checkpointed after every inserted batch. Rerunning after an
+interruption continues filling the same build collection.
+
+A plain collection created before blue/green builds cannot share its name
+with the alias. Either set MILVUS_COLLECTION_NAME to a new name, build, and
+point the API at it (no downtime), or pass --migrate-legacy to drop the old
+collection just before the alias is created (recall is down in between).
+
+With --embeddings DIR, vectors are read from post_ids.npy and
+post_embeddings.npy (as written by scripts/generate_dataset.py) instead of
+being computed by the model.
+
+Usage:
+    python scripts/populate_milvus.py
+    python scripts/populate_milvus.py --workers 4 --batch-size 2048
+    python scripts/populate_milvus.py --embeddings synthetic_embeddings
+    python scripts/populate_milvus.py --restart  # discard an unfinished build
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from datetime import datetime
+
 import numpy as np
 from pymilvus import (
     connections,
     FieldSchema, CollectionSchema, DataType,
     Collection, utility
 )
-import sys
-import os
 
-# Add wide-deep directory to path to import models
-sys.path.append(os.path.join(os.path.dirname(__file__), "../wide-deep/src"))
-
-from recall.two_tower import TwoTowerModel
-import torch
-
-def create_milvus_collection():
-    """Create Milvus collection for storing item embeddings"""
-    try:
-        # Connect to Milvus
-        connections.connect(alias="default", host="localhost", port="19530")
-        
-        # Drop collection if it exists
-        if utility.has_collection("item_embeddings"):
-            utility.drop_collection("item_embeddings")
-        
-        # Create collection schema
-        fields = [
-            FieldSchema(name="post_id", dtype=DataType.INT64, is_primary=True, auto_id=False),
-            FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=64)
-        ]
-        
-        schema = CollectionSchema(fields=fields, description="Post embeddings")
-        collection = Collection(name="item_embeddings", schema=schema)
-        
-        # Create index
-        index_params = {
-            "metric_type": "IP",
-            "index_type": "IVF_FLAT",
-            "params": {"nlist": 128}
-        }
-        
-        collection.create_index(field_name="embedding", index_params=index_params)
-        print("Created Milvus collection with index")
-        return collection
-    except Exception as e:
-        print(f"Error creating Milvus collection: {e}")
-        return None
-
-def generate_sample_embeddings(collection):
-    """Generate sample embeddings and insert into Milvus"""
-    try:
-        # Generate sample post embeddings
-        post_ids = list(range(1, 101))  # 100 sample posts
-        embeddings = []
-        
-        # Initialize a simple Two-Tower model for generating embeddings
-        config = {
-            'recall': {
-                'embedding_dim': 64,
-                'user_tower_hidden_dims': [128, 64],
-                'item_tower_hidden_dims': [128, 64],
-                'dropout': 0.2
-            }
-        }
-        
-        model = TwoTowerModel(config)
-        
-        # Generate embeddings for sample posts
-        for post_id in post_ids:
-            # Create mock item features
-            item_features = {
-                'post_id': torch.tensor([post_id]),
-                'category': torch.tensor([post_id % 10]),  # Mock category
-                'author_id': torch.tensor([post_id % 50]),  # Mock author
-            }
-            
-            # Get item embedding
-            with torch.no_grad():
-                embedding = model.forward_item_tower(item_features)
-                embeddings.append(embedding.numpy().flatten())
-        
-        # Insert into Milvus
-        if collection:
-            entities = [post_ids, embeddings]
-            collection.insert(entities)
-            collection.flush()
-            print(f"Inserted {len(post_ids)} sample embeddings into Milvus")
+# Add the backend directory to the path to share settings and models with the API
+sys.path.append(os.path.join(os.path.dirname(__file__), "../backend"))
+
+from sqlalchemy import select
+from app.core.config import settings
+from app.db.session import ReadSessionLocal
+from app.models import Post
+from app.services.vector_index import get_index_params
+
+EMBEDDING_DIM = 64
+
+def create_build_collection(name):
+    """Create an empty, indexed collection for a new build"""
+    fields = [
+        FieldSchema(name="post_id", dtype=DataType.INT64, is_primary=True, auto_id=False),
+        FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=EMBEDDING_DIM)
+    ]
+    schema = CollectionSchema(fields=fields, description="Post embeddings")
+    collection = Collection(name=name, schema=schema)
+    # Create index using the tuned settings
+    collection.create_index(field_name="embedding", index_params=get_index_params())
+    print(f"Created build collection {name}")
+    return collection
+
+def builds_for(alias):
+    """Existing build collections for an alias, oldest first"""
+    return sorted(name for name in utility.list_collections() if name.startswith(f"{alias}__"))
+
+def alias_target(alias):
+    """The collection an alias currently points to, if any"""
+    for name in builds_for(alias):
+        if alias in utility.list_aliases(name):
+            return name
+    return None
+
+def load_checkpoint(path):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return None
+
+def save_checkpoint(path, checkpoint):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+def read_posts(after_id, chunk_size):
+    """Yield (post_id, category, author_id) int64 chunks of live posts in ID order"""
+    while True:
+        with ReadSessionLocal() as db:
+            rows = db.execute(
+                select(Post.id, Post.primary_interest_id, Post.author_id)
+                .where(Post.id > after_id, Post.is_deleted == False)
+                .order_by(Post.id)
+                .limit(chunk_size)
+            ).all()
+        if not rows:
+            return
+        chunk = np.array([(post_id, category or 0, author_id or 0) for post_id, category, author_id in rows],
+                         dtype=np.int64)
+        yield chunk
+        after_id = int(chunk[-1, 0])
+
+class Embedder:
+    """Item-tower inference, in-process or on the model worker pool"""
+
+    def __init__(self, workers, torch_threads):
+        self.pool = None
+        self.recall_service = None
+        if workers > 0:
+            from app.services.model_worker_pool import ModelWorkerPool
+            self.pool = ModelWorkerPool(num_workers=workers, torch_threads=torch_threads)
         else:
-            print("Collection not available")
-    except Exception as e:
-        print(f"Error generating embeddings: {e}")
+            import torch
+            from app.services.recall_service import RecallService
+            torch.set_num_threads(torch_threads)
+            self.recall_service = RecallService(connect_milvus=False)
+
+    def submit(self, features):
+        """Return a future-like object whose result() is the (n, dim) embedding array"""
+        if self.pool is not None:
+            return _PoolResult(self.pool.submit('embed_item', [features]))
+        return _Done(self.recall_service.embed_items(features))
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+
+class _PoolResult:
+    def __init__(self, future):
+        self.future = future
+
+    def result(self):
+        embeddings, = self.future.result()
+        return embeddings
+
+class _Done:
+    def __init__(self, value):
+        self.value = value
+
+    def result(self):
+        return self.value
+
+def model_batches(embedder, after_id, chunk_size, batch_size):
+    """Yield (post_ids, pending embeddings) for live posts after `after_id`, embedded by the item tower"""
+    for chunk in read_posts(after_id, chunk_size):
+        for offset in range(0, len(chunk), batch_size):
+            features = chunk[offset:offset + batch_size]
+            yield features[:, 0], embedder.submit(features)
+
+def file_batches(directory, after_id, batch_size):
+    """Yield (post_ids, embeddings) after `after_id` from post_ids.npy / post_embeddings.npy in `directory`"""
+    post_ids = np.load(os.path.join(directory, "post_ids.npy"), mmap_mode="r")
+    embeddings = np.load(os.path.join(directory, "post_embeddings.npy"), mmap_mode="r")
+    for offset in range(int(np.searchsorted(post_ids, after_id, side="right")), len(post_ids), batch_size):
+        yield post_ids[offset:offset + batch_size], _Done(np.asarray(embeddings[offset:offset + batch_size]))
+
+def populate(collection, batches, checkpoint, checkpoint_path, max_in_flight, report_every=20):
+    """Insert every (post_ids, pending embeddings) batch in order, keeping at most `max_in_flight` pending"""
+    in_flight = deque()
+    inserted = 0
+    start = time.perf_counter()
+
+    def insert_oldest():
+        nonlocal inserted
+        post_ids, result = in_flight.popleft()
+        collection.insert([post_ids.tolist(), list(result.result())])
+        inserted += len(post_ids)
+        # Batches are inserted in ID order, so everything up to this batch's last ID is stored
+        checkpoint["last_post_id"] = int(post_ids[-1])
+        checkpoint["inserted"] += len(post_ids)
+        save_checkpoint(checkpoint_path, checkpoint)
+
+    # The generator only embeds the next batch when it is pulled, which bounds the work in flight
+    for number, batch in enumerate(batches, 1):
+        if len(in_flight) >= max_in_flight:
+            insert_oldest()
+        in_flight.append(batch)
+        if number % report_every == 0:
+            rate = inserted / max(time.perf_counter() - start, 1e-9)
+            print(f"  up to post {int(batch[0][-1])}: {checkpoint['inserted']} inserted, {rate:.0f} posts/s")
+
+    while in_flight:
+        insert_oldest()
+    return inserted, time.perf_counter() - start
+
+def is_legacy_collection(alias):
+    """Whether a collection from before blue/green builds holds the serving name"""
+    return alias_target(alias) is None and utility.has_collection(alias)
+
+def legacy_collection_message(alias):
+    return (f"{alias} is a plain collection, so it cannot become an alias without being dropped first, "
+            f"leaving recall without a collection until the alias exists. Either set MILVUS_COLLECTION_NAME "
+            f"to a new name, build, and point the API at it (no downtime), or rerun with --migrate-legacy "
+            f"to accept that gap.")
+
+def swap_alias(alias, build_name, keep, migrate_legacy=False):
+    """Point the serving alias at the new build, then drop all but `keep` previous builds"""
+    previous = alias_target(alias)
+    if previous is None and utility.has_collection(alias):
+        if not migrate_legacy:
+            raise SystemExit(legacy_collection_message(alias))
+        # Recall has no collection from here until the alias is created
+        print(f"Dropping legacy collection {alias} so the name can become an alias")
+        utility.drop_collection(alias)
+
+    if previous is None:
+        utility.create_alias(build_name, alias)
+    else:
+        utility.alter_alias(build_name, alias)
+    print(f"Alias {alias} now points to {build_name} (was {previous or 'unset'})")
+
+    stale = [name for name in builds_for(alias) if name != build_name]
+    for name in stale[:max(len(stale) - keep, 0)]:
+        utility.drop_collection(name)
+        print(f"Dropped old build {name}")
 
 def main():
-    """Main function to set up Milvus"""
-    collection = create_milvus_collection()
-    generate_sample_embeddings(collection)
+    parser = argparse.ArgumentParser(description="Build post embeddings into a new collection and swap it in")
+    parser.add_argument("--chunk-size", type=int, default=20000, help="posts read from the database at a time")
+    parser.add_argument("--batch-size", type=int, default=1024, help="posts per forward pass and insert")
+    parser.add_argument("--workers", type=int, default=settings.model_worker_processes,
+                        help="model worker processes (0 embeds in this process)")
+    parser.add_argument("--torch-threads", type=int, default=settings.model_worker_torch_threads)
+    parser.add_argument("--max-in-flight", type=int, default=None,
+                        help="batches embedded ahead of insertion (default: 2 per worker)")
+    parser.add_argument("--embeddings", metavar="DIR",
+                        help="insert precomputed embeddings (e.g. from generate_dataset.py) instead of running the model")
+    parser.add_argument("--keep", type=int, default=1, help="previous builds to keep for rollback")
+    parser.add_argument("--checkpoint", default=f"{settings.milvus_collection_name}.build.json")
+    parser.add_argument("--restart", action="store_true", help="discard an unfinished build and start over")
+    parser.add_argument("--migrate-legacy", action="store_true",
+                        help="drop a pre-alias collection holding the serving name (recall is down briefly)")
+    args = parser.parse_args()
+
+    alias = settings.milvus_collection_name
+    connections.connect(alias="default", host=settings.milvus_host, port=settings.milvus_port)
+    # Refuse before building rather than after
+    if is_legacy_collection(alias) and not args.migrate_legacy:
+        raise SystemExit(legacy_collection_message(alias))
+
+    checkpoint = load_checkpoint(args.checkpoint)
+    if args.restart and checkpoint:
+        # Otherwise the partial build would outlive the last good one as the rollback target
+        abandoned = checkpoint["collection"]
+        if utility.has_collection(abandoned) and abandoned != alias_target(alias):
+            utility.drop_collection(abandoned)
+            print(f"Dropped unfinished build {abandoned}")
+        checkpoint = None
+
+    if checkpoint and utility.has_collection(checkpoint["collection"]):
+        collection = Collection(checkpoint["collection"])
+        # Drop anything inserted after the last checkpoint so the resumed batches are not duplicated
+        collection.delete(expr=f"post_id > {checkpoint['last_post_id']}")
+        print(f"Resuming build {checkpoint['collection']} after post {checkpoint['last_post_id']}")
+    else:
+        build_name = f"{alias}__{datetime.utcnow():%Y%m%d%H%M%S}"
+        collection = create_build_collection(build_name)
+        checkpoint = {"collection": build_name, "last_post_id": 0, "inserted": 0}
+        save_checkpoint(args.checkpoint, checkpoint)
+
+    max_in_flight = args.max_in_flight or max(2 * args.workers, 1)
+    if args.embeddings:
+        batches = file_batches(args.embeddings, checkpoint["last_post_id"], args.batch_size)
+        inserted, elapsed = populate(collection, batches, checkpoint, args.checkpoint, max_in_flight)
+    else:
+        embedder = Embedder(args.workers, args.torch_threads)
+        try:
+            batches = model_batches(embedder, checkpoint["last_post_id"], args.chunk_size, args.batch_size)
+            inserted, elapsed = populate(collection, batches, checkpoint, args.checkpoint, max_in_flight)
+        finally:
+            embedder.close()
+    print(f"Embedded {inserted} posts in {elapsed:.1f}s ({inserted / max(elapsed, 1e-9):.0f} posts/s)")
+
+    collection.flush()
+    collection.load()
+    swap_alias(alias, checkpoint["collection"], args.keep, args.migrate_legacy)
+    os.remove(args.checkpoint)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,98 @@
+"""
+Recompute user behavior scores from the full event history.
+
+Reads per-day event counts (daily aggregates for compacted days, raw events
+after them) instead of scanning every raw event, and applies the same
+per-interaction weights as the live event route, for the post's primary and
+secondary interests. Scores are recomputed from totals and capped at 1.0.
+Only existing (user, interest) rows are updated, as with live events; rows
+without any events are reset to zero.
+
+Usage:
+    python scripts/rebuild_behavior_scores.py
+"""
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+# Add the backend directory to the path to share settings with the API
+sys.path.append(os.path.join(os.path.dirname(__file__), "../backend"))
+
+from sqlalchemy import bindparam, func, select, update
+from app.db.session import SessionLocal
+from app.models import Post, UserBehaviorScore
+from app.services.event_store import day_start, event_store
+from app.services.interest_based_recommender import INTERACTION_WEIGHTS
+
+BATCH_SIZE = 10000
+
+def collect_scores(db):
+    """Total up (count, score, last day) per (user, interest) from daily counts"""
+    layout = event_store.load_layout(db)
+    counts = event_store.daily_counts(layout, db.get_bind().dialect.name)
+    stmt = select(
+        counts.c.user_id, Post.primary_interest_id, Post.secondary_interest_ids,
+        counts.c.event_type, func.sum(counts.c.count), func.max(counts.c.day)
+    ).join(
+        Post, Post.id == counts.c.post_id
+    ).group_by(
+        counts.c.user_id, Post.id, Post.primary_interest_id, Post.secondary_interest_ids, counts.c.event_type
+    ).execution_options(yield_per=BATCH_SIZE)
+
+    totals = defaultdict(lambda: [0, 0.0, None])
+    for user_id, primary_id, secondary_ids, event_type, count, last_day in db.execute(stmt):
+        interest_ids = [primary_id] if primary_id else []
+        if secondary_ids:
+            try:
+                interest_ids.extend(json.loads(secondary_ids))
+            except json.JSONDecodeError:
+                pass  # Ignore if secondary interests are not valid JSON, as the event route does
+
+        weight_change = INTERACTION_WEIGHTS.get(event_type, 0.1)
+        for interest_id in interest_ids:
+            total = totals[(user_id, interest_id)]
+            total[0] += count
+            total[1] += weight_change * 0.1 * count
+            total[2] = max(total[2], last_day) if total[2] else last_day
+    return totals
+
+def write_scores(db, totals):
+    table = UserBehaviorScore.__table__
+    db.execute(update(table).values(score=0.0, interaction_count=0))
+
+    stmt = update(table).where(
+        table.c.user_id == bindparam("b_user_id"),
+        table.c.interest_id == bindparam("b_interest_id")
+    ).values(
+        score=bindparam("b_score"),
+        interaction_count=bindparam("b_count"),
+        last_interaction=bindparam("b_last")
+    )
+    rows = [
+        {
+            "b_user_id": user_id,
+            "b_interest_id": interest_id,
+            "b_score": min(score, 1.0),
+            "b_count": count,
+            "b_last": day_start(last_day)
+        }
+        for (user_id, interest_id), (count, score, last_day) in totals.items()
+    ]
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.execute(stmt, rows[start:start + BATCH_SIZE])
+    db.commit()
+
+def main():
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        totals = collect_scores(db)
+        write_scores(db, totals)
+    finally:
+        db.close()
+    print(f"Rebuilt scores for {len(totals)} (user, interest) pairs in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
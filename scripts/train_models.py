@@ -0,0 +1,227 @@
+"""
+Train the Wide & Deep ranker and the Two-Tower recall model from user events.
+
+Stages, each reported in examples/sec:
+
+1. extract: (user, post) interactions streamed from the event store through
+   a server-side cursor and labeled (app.services.training_data)
+2. sample+write: negative sampling, feature lookup and shuffled .npy shards
+   under --data-dir
+3. load: one pass of the multi-worker DataLoader over the training shards,
+   without a model, to show whether input or compute bounds training
+4. wide_deep / two_tower: CPU training, then the held-out loss
+
+The last shard is held out for validation. Weights are written to the paths
+RankService and RecallService load (WIDE_DEEP_MODEL_PATH and
+TWO_TOWER_MODEL_PATH); restart the API workers to serve them.
+
+Usage:
+    python scripts/train_models.py
+    python scripts/train_models.py --days 30 --negatives 4 --epochs 3
+    python scripts/train_models.py --skip-extract  # retrain on the existing shards
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from torch.utils.data import DataLoader
+
+# Add the backend directory to the path to share settings and models with the API
+sys.path.append(os.path.join(os.path.dirname(__file__), "../backend"))
+
+from app.core.config import settings
+from app.db.session import ReadSessionLocal
+from app.services.rank_service import DEEP_FEATURES, WIDE_DEEP_CONFIG, WIDE_DIM, WideAndDeep
+from app.services.recall_service import (
+    DEFAULT_AGE, DEFAULT_GENDER, ITEM_FEATURES, TWO_TOWER_CONFIG, USER_FEATURES, TwoTowerModel
+)
+from app.services.training_data import (
+    FeatureTables, ShardDataset, ShardWriter, labeled_pairs, read_manifest, sample_negatives
+)
+
+# Example columns behind each model input, in the serving column orders
+DEEP_COLUMNS = dict(zip(DEEP_FEATURES, ('user_id', 'post_id', 'post_interest', 'author_id')))
+ITEM_COLUMNS = dict(zip(ITEM_FEATURES, ('post_id', 'post_interest', 'author_id')))
+
+class StageTimer:
+    """Collects (stage, examples, seconds) rows for the summary table"""
+
+    def __init__(self):
+        self.rows = []
+
+    def record(self, stage, examples, seconds):
+        self.rows.append((stage, examples, seconds))
+        print(f"{stage}: {examples} examples in {seconds:.1f}s ({examples / max(seconds, 1e-9):,.0f}/s)")
+
+    def report(self):
+        print(f"\n{'stage':<14} {'examples':>12} {'seconds':>9} {'examples/s':>12}")
+        for stage, examples, seconds in self.rows:
+            print(f"{stage:<14} {examples:>12} {seconds:>9.1f} {examples / max(seconds, 1e-9):>12,.0f}")
+
+def extract(args, timer):
+    """Stream labeled pairs out of the database and write them, with negatives, as shards"""
+    since = (datetime.utcnow() - timedelta(days=args.days)).date() if args.days else None
+    rng = np.random.default_rng(args.seed)
+    writer = ShardWriter(args.data_dir, args.shard_size, rng)
+
+    db = ReadSessionLocal()
+    try:
+        tables = FeatureTables.load(db, args.chunk_size)
+        print(f"Loaded features for {len(tables.post_ids)} posts and {len(tables.user_interest)} user IDs")
+
+        pairs = 0
+        extract_seconds = write_seconds = 0.0
+        start = time.perf_counter()
+        for user_ids, post_ids, labels in labeled_pairs(db, args.chunk_size, since=since):
+            fetched = time.perf_counter()
+            extract_seconds += fetched - start
+            pairs += len(labels)
+
+            sampled_users, sampled_posts = sample_negatives(tables, user_ids, labels, args.negatives, rng)
+            writer.add(tables.examples(user_ids, post_ids, labels))
+            writer.add(tables.examples(sampled_users, sampled_posts, np.zeros(len(sampled_posts), np.float32)))
+
+            start = time.perf_counter()
+            write_seconds += start - fetched
+    finally:
+        db.close()
+
+    start = time.perf_counter()
+    manifest = writer.close()
+    write_seconds += time.perf_counter() - start
+    timer.record("extract", pairs, extract_seconds)
+    timer.record("sample+write", manifest['examples'], write_seconds)
+    print(f"Wrote {manifest['examples']} examples ({manifest['positives']} positive) "
+          f"in {len(manifest['shards'])} shards to {args.data_dir}")
+
+def make_loader(args, shards, shuffle):
+    dataset = ShardDataset(args.data_dir, shards, args.batch_size, shuffle=shuffle, seed=args.seed)
+    # Batches are built in the workers, so the loader only passes them through
+    options = {'prefetch_factor': 4} if args.loader_workers else {}
+    return DataLoader(dataset, batch_size=None, num_workers=args.loader_workers, **options)
+
+def epochs(loader, count):
+    for epoch in range(count):
+        loader.dataset.set_epoch(epoch)
+        yield epoch
+
+def wide_deep_scores(model, batch):
+    wide = torch.zeros(len(batch['label']), WIDE_DIM)
+    wide.scatter_(1, batch['wide_index'], 1.0)
+    deep = {name: batch[column].unsqueeze(1) for name, column in DEEP_COLUMNS.items()}
+    # WideAndDeep ends in a sigmoid, as RankService treats its scores as probabilities
+    return model(wide, deep).reshape(-1)
+
+def two_tower_logits(model, batch):
+    n = len(batch['label'])
+    user = dict(zip(USER_FEATURES, (
+        batch['user_id'],
+        torch.full((n,), DEFAULT_AGE, dtype=torch.int64),
+        torch.full((n,), DEFAULT_GENDER, dtype=torch.int64),
+        batch['user_interest'],
+    )))
+    item = {name: batch[column] for name, column in ITEM_COLUMNS.items()}
+    return (model.forward_user_tower(user) * model.forward_item_tower(item)).sum(dim=1)
+
+def wide_deep_loss(model, batch):
+    return F.binary_cross_entropy(wide_deep_scores(model, batch).clamp(1e-7, 1 - 1e-7), batch['label'])
+
+def two_tower_loss(model, batch):
+    return F.binary_cross_entropy_with_logits(two_tower_logits(model, batch), batch['label'])
+
+def train(name, model, loss_fn, train_loader, validation_loader, args, timer):
+    optimizer = torch.optim.Adam(model.parameters(), lr=args.lr)
+    examples = 0
+    start = time.perf_counter()
+    for epoch in epochs(train_loader, args.epochs):
+        model.train()
+        total, batches = 0.0, 0
+        for batch in train_loader:
+            optimizer.zero_grad()
+            loss = loss_fn(model, batch)
+            loss.backward()
+            optimizer.step()
+            total += loss.item()
+            batches += 1
+            examples += len(batch['label'])
+        print(f"{name} epoch {epoch + 1}/{args.epochs}: train loss {total / max(batches, 1):.4f}")
+    timer.record(name, examples, time.perf_counter() - start)
+
+    model.eval()
+    total, count = 0.0, 0
+    with torch.no_grad():
+        for batch in validation_loader:
+            total += loss_fn(model, batch).item() * len(batch['label'])
+            count += len(batch['label'])
+    if count:
+        print(f"{name} validation loss {total / count:.4f} over {count} examples")
+
+def save(model, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # Replaced in one step, so a worker starting meanwhile never loads a partial file
+    tmp_path = path + ".tmp"
+    torch.save(model.state_dict(), tmp_path)
+    os.replace(tmp_path, path)
+    print(f"Saved {path}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the ranking and recall models from user events")
+    parser.add_argument("--data-dir", default="training_data", help="where training shards are written")
+    parser.add_argument("--days", type=int, default=None, help="only use the last N days of events")
+    parser.add_argument("--skip-extract", action="store_true", help="train on the shards already in --data-dir")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="rows fetched from the database at a time")
+    parser.add_argument("--negatives", type=int, default=4, help="random negatives sampled per positive")
+    parser.add_argument("--shard-size", type=int, default=500000, help="examples per shard")
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--epochs", type=int, default=2)
+    parser.add_argument("--lr", type=float, default=1e-3)
+    parser.add_argument("--loader-workers", type=int, default=2, help="DataLoader worker processes")
+    parser.add_argument("--torch-threads", type=int, default=None, help="threads for the training step")
+    parser.add_argument("--models", default="wide_deep,two_tower", help="comma-separated models to train")
+    parser.add_argument("--wide-deep-output", default=settings.wide_deep_model_path)
+    parser.add_argument("--two-tower-output", default=settings.two_tower_model_path)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    torch.manual_seed(args.seed)
+    if args.torch_threads:
+        torch.set_num_threads(args.torch_threads)
+    timer = StageTimer()
+
+    if not args.skip_extract:
+        extract(args, timer)
+
+    shards = [shard['file'] for shard in read_manifest(args.data_dir)['shards']]
+    if not shards:
+        print("No training examples; record some user events first")
+        return
+    train_shards, validation_shards = (shards[:-1], shards[-1:]) if len(shards) > 1 else (shards, [])
+    if len(train_shards) < args.loader_workers:
+        print(f"Only {len(train_shards)} training shards for {args.loader_workers} loader workers; "
+              f"lower --shard-size to keep every worker busy")
+    train_loader = make_loader(args, train_shards, shuffle=True)
+    validation_loader = make_loader(args, validation_shards, shuffle=False)
+
+    start = time.perf_counter()
+    loaded = sum(len(batch['label']) for batch in train_loader)
+    timer.record("load", loaded, time.perf_counter() - start)
+
+    models = set(args.models.split(","))
+    if "wide_deep" in models:
+        model = WideAndDeep(WIDE_DEEP_CONFIG)
+        train("wide_deep", model, wide_deep_loss, train_loader, validation_loader, args, timer)
+        save(model, args.wide_deep_output)
+    if "two_tower" in models:
+        model = TwoTowerModel(TWO_TOWER_CONFIG)
+        train("two_tower", model, two_tower_loss, train_loader, validation_loader, args, timer)
+        save(model, args.two_tower_output)
+
+    timer.report()
+
+if __name__ == "__main__":
+    main()
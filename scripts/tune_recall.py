@@ -0,0 +1,283 @@
+"""
+Sweep Milvus index parameters and report recall@k against query latency.
+
+Loads the item embedding set (from the serving collection or generated
+synthetically), computes exact brute-force top-k as ground truth, then builds
+a scratch collection per index configuration and measures recall@k and
+p50/p99 single-query latency for each search setting. The cheapest setting
+that meets the target recall can be written back to the .env file that
+`Settings` reads.
+
+Usage:
+    python scripts/tune_recall.py --source synthetic --num-items 100000
+    python scripts/tune_recall.py --source collection --target-recall 0.95 --write-config backend/.env
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from pymilvus import (
+    connections,
+    FieldSchema, CollectionSchema, DataType,
+    Collection, utility
+)
+
+# Add the backend directory to the path to share settings with the API
+sys.path.append(os.path.join(os.path.dirname(__file__), "../backend"))
+
+from app.core.config import settings
+from app.services.vector_index import SUPPORTED_INDEX_TYPES, get_index_params, get_search_params
+
+INSERT_BATCH_SIZE = 10000
+
+def parse_int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+def load_collection_embeddings(limit=None):
+    """Read post ids and embeddings out of the serving collection"""
+    collection = Collection(settings.milvus_collection_name)
+    collection.load()
+
+    post_ids = []
+    embeddings = []
+    iterator = collection.query_iterator(
+        batch_size=INSERT_BATCH_SIZE,
+        expr="post_id >= 0",
+        output_fields=["post_id", "embedding"]
+    )
+    try:
+        while True:
+            batch = iterator.next()
+            if not batch:
+                break
+            for row in batch:
+                post_ids.append(row["post_id"])
+                embeddings.append(row["embedding"])
+            if limit and len(post_ids) >= limit:
+                break
+    finally:
+        iterator.close()
+
+    post_ids = np.asarray(post_ids[:limit], dtype=np.int64)
+    embeddings = np.asarray(embeddings[:limit], dtype=np.float32)
+    return post_ids, embeddings
+
+def generate_synthetic_embeddings(num_items, dim, num_clusters, rng):
+    """Generate clustered embeddings, which behave more like real item towers than uniform noise"""
+    centers = rng.standard_normal((num_clusters, dim)).astype(np.float32)
+    assignments = rng.integers(0, num_clusters, size=num_items)
+    embeddings = centers[assignments] + 0.3 * rng.standard_normal((num_items, dim)).astype(np.float32)
+    post_ids = np.arange(1, num_items + 1, dtype=np.int64)
+    return post_ids, embeddings
+
+def sample_queries(embeddings, num_queries, rng):
+    """Build query vectors near existing items, the way user embeddings land near liked posts"""
+    rows = rng.integers(0, len(embeddings), size=num_queries)
+    noise = 0.5 * rng.standard_normal((num_queries, embeddings.shape[1])).astype(np.float32)
+    return embeddings[rows] + noise
+
+def brute_force_top_k(post_ids, embeddings, queries, top_k, block_size=256):
+    """Exact inner-product top-k, computed in query blocks to bound memory"""
+    ground_truth = []
+    for start in range(0, len(queries), block_size):
+        scores = queries[start:start + block_size] @ embeddings.T
+        top = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+        ground_truth.extend(set(post_ids[row].tolist()) for row in top)
+    return ground_truth
+
+def build_scratch_collection(name, post_ids, embeddings, index_params):
+    """Create, fill and index a throwaway collection for one index configuration"""
+    if utility.has_collection(name):
+        utility.drop_collection(name)
+
+    fields = [
+        FieldSchema(name="post_id", dtype=DataType.INT64, is_primary=True, auto_id=False),
+        FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=embeddings.shape[1])
+    ]
+    schema = CollectionSchema(fields=fields, description="Recall tuning scratch collection")
+    collection = Collection(name=name, schema=schema)
+
+    for start in range(0, len(post_ids), INSERT_BATCH_SIZE):
+        collection.insert([
+            post_ids[start:start + INSERT_BATCH_SIZE].tolist(),
+            embeddings[start:start + INSERT_BATCH_SIZE].tolist()
+        ])
+    collection.flush()
+
+    build_start = time.perf_counter()
+    collection.create_index(field_name="embedding", index_params=index_params)
+    utility.wait_for_index_building_complete(name)
+    build_seconds = time.perf_counter() - build_start
+
+    collection.load()
+    return collection, build_seconds
+
+def measure(collection, queries, ground_truth, top_k, search_params):
+    """Run every query on its own, as serving does, and collect recall and latency"""
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, ground_truth):
+        start = time.perf_counter()
+        results = collection.search(
+            data=[query.tolist()],
+            anns_field="embedding",
+            param=search_params,
+            limit=top_k,
+            output_fields=["post_id"]
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+        found = {hit.id for hit in results[0]}
+        hits += len(found & expected)
+
+    latencies = np.asarray(latencies)
+    return {
+        "recall": hits / float(top_k * len(queries)),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99))
+    }
+
+def sweep_configurations(args):
+    """Yield (index_type, build overrides, list of search overrides) for the sweep"""
+    for index_type in args.index_types:
+        if index_type == "HNSW":
+            for m in args.hnsw_m:
+                search = [{"ef": ef} for ef in args.hnsw_ef if ef >= args.top_k]
+                yield index_type, {"M": m}, search
+        elif index_type.startswith("IVF"):
+            for nlist in args.nlist:
+                search = [{"nprobe": nprobe} for nprobe in args.nprobe if nprobe <= nlist]
+                yield index_type, {"nlist": nlist}, search
+        else:
+            yield index_type, {}, [{}]
+
+def recommend(rows, target_recall):
+    """Pick the lowest-p99 setting that meets the target recall"""
+    eligible = [row for row in rows if row["recall"] >= target_recall]
+    if not eligible:
+        return None
+    return min(eligible, key=lambda row: (row["p99_ms"], row["p50_ms"]))
+
+def format_params(params):
+    return ",".join(f"{key}={value}" for key, value in params.items()) or "-"
+
+def print_table(rows, top_k):
+    header = f"{'index':<10} {'build':<18} {'search':<12} {'recall@' + str(top_k):>10} {'p50 ms':>9} {'p99 ms':>9} {'build s':>9}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(
+            f"{row['index_type']:<10} {format_params(row['build']):<18} {format_params(row['search']):<12} "
+            f"{row['recall']:>10.4f} {row['p50_ms']:>9.2f} {row['p99_ms']:>9.2f} {row['build_seconds']:>9.1f}"
+        )
+
+def settings_for(row):
+    """Translate a sweep row into the .env keys read by Settings"""
+    values = {"MILVUS_INDEX_TYPE": row["index_type"]}
+    if row["index_type"] == "HNSW":
+        values["MILVUS_HNSW_M"] = row["build"]["M"]
+        values["MILVUS_HNSW_EF"] = row["search"]["ef"]
+    elif row["index_type"].startswith("IVF"):
+        values["MILVUS_NLIST"] = row["build"]["nlist"]
+        values["MILVUS_NPROBE"] = row["search"]["nprobe"]
+    return values
+
+def write_env(path, values):
+    """Update (or append) keys in an .env file, leaving other lines untouched"""
+    lines = []
+    if os.path.exists(path):
+        with open(path) as f:
+            lines = f.read().splitlines()
+
+    remaining = dict(values)
+    for i, line in enumerate(lines):
+        key = line.split("=", 1)[0].strip()
+        if key in remaining:
+            lines[i] = f"{key}={remaining.pop(key)}"
+    lines.extend(f"{key}={value}" for key, value in remaining.items())
+
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark recall@k vs latency for Milvus index settings")
+    parser.add_argument("--source", choices=["collection", "synthetic"], default="synthetic")
+    parser.add_argument("--num-items", type=int, default=100000, help="synthetic set size, or cap on collection rows")
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--num-clusters", type=int, default=256)
+    parser.add_argument("--num-queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--index-types", type=lambda v: [t.upper() for t in v.split(",")], default=["IVF_FLAT", "IVF_SQ8", "HNSW"])
+    parser.add_argument("--nlist", type=parse_int_list, default=[64, 128, 256, 1024])
+    parser.add_argument("--nprobe", type=parse_int_list, default=[1, 4, 8, 16, 32, 64])
+    parser.add_argument("--hnsw-m", type=parse_int_list, default=[8, 16, 32])
+    parser.add_argument("--hnsw-ef", type=parse_int_list, default=[32, 64, 128, 256])
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--write-config", metavar="ENV_FILE", help="write the recommended settings to this .env file")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    unsupported = set(args.index_types) - set(SUPPORTED_INDEX_TYPES)
+    if unsupported:
+        parser.error(f"unsupported index types: {sorted(unsupported)}")
+
+    rng = np.random.default_rng(args.seed)
+    connections.connect(alias="default", host=settings.milvus_host, port=settings.milvus_port)
+
+    if args.source == "collection":
+        post_ids, embeddings = load_collection_embeddings(args.num_items)
+        print(f"Loaded {len(post_ids)} embeddings from '{settings.milvus_collection_name}'")
+    else:
+        post_ids, embeddings = generate_synthetic_embeddings(args.num_items, args.dim, args.num_clusters, rng)
+        print(f"Generated {len(post_ids)} synthetic embeddings (dim={args.dim})")
+
+    if len(post_ids) < args.top_k:
+        print("Not enough embeddings to evaluate recall")
+        sys.exit(1)
+
+    queries = sample_queries(embeddings, args.num_queries, rng)
+    start = time.perf_counter()
+    ground_truth = brute_force_top_k(post_ids, embeddings, queries, args.top_k)
+    print(f"Computed exact top-{args.top_k} for {len(queries)} queries in {time.perf_counter() - start:.1f}s\n")
+
+    scratch_name = f"{settings.milvus_collection_name}_tune"
+    rows = []
+    try:
+        for index_type, build, searches in sweep_configurations(args):
+            index_params = get_index_params(index_type, **build)
+            collection, build_seconds = build_scratch_collection(scratch_name, post_ids, embeddings, index_params)
+            for search in searches:
+                result = measure(collection, queries, ground_truth, args.top_k, get_search_params(index_type, **search))
+                rows.append({
+                    "index_type": index_type,
+                    "build": build,
+                    "search": search,
+                    "build_seconds": build_seconds,
+                    **result
+                })
+            collection.release()
+    finally:
+        if utility.has_collection(scratch_name):
+            utility.drop_collection(scratch_name)
+
+    print_table(rows, args.top_k)
+
+    best = recommend(rows, args.target_recall)
+    if best is None:
+        print(f"\nNo setting reached recall@{args.top_k} >= {args.target_recall}; widen the sweep")
+        sys.exit(1)
+
+    values = settings_for(best)
+    print(f"\nRecommended for recall@{args.top_k} >= {args.target_recall}: "
+          f"{best['index_type']} {format_params(best['build'])} {format_params(best['search'])} "
+          f"(recall {best['recall']:.4f}, p99 {best['p99_ms']:.2f} ms)")
+    for key, value in values.items():
+        print(f"  {key}={value}")
+
+    if args.write_config:
+        write_env(args.write_config, values)
+        print(f"Wrote settings to {args.write_config}; rebuild the index with scripts/populate_milvus.py")
+
+if __name__ == "__main__":
+    main()